@@ -1,5 +1,5 @@
 from .beam_class import Beam
-from .geom_calc import position_geometry, scale_field_area, fetch_hvl, check_new_geometry
+from .geom_calc import position_geometry, scale_field_area, fetch_hvl
 from .parse_data import rdsr_parser, rdsr_normalizer
 from .phantom_class import Phantom
 from .plots import plot_geometry
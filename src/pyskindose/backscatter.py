@@ -0,0 +1,231 @@
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+# Tabulated field side length in cm
+FSL_TAB = np.array([5, 10, 20, 25, 35])
+
+# Field side lengths in cm covered by quantized backscatter lookup tables
+FSL_RANGE = (1.0, 60.0)
+
+# Default field side length step in cm of quantized backscatter lookup tables
+DEFAULT_FSL_STEP = 0.05
+
+# Polynomial coefficents of eq. (8) in doi:10.1088/0031-9155/58/2/247, for
+# each tabulated field side length. Row 3 * i + j is the coefficient of
+# HVL^i * kVp^j.
+COEFFICIENTS = np.array([
+    [+1.00870e+0, +9.29969e-1, +8.65442e-1, +8.58665e-1, +8.57065e-1],
+    [+2.35816e-3, +4.08549e-3, +5.36739e-3, +5.51579e-3, +5.55933e-3],
+    [-9.48937e-6, -1.66271e-5, -2.21494e-5, -2.27532e-5, -2.28004e-5],
+    [+1.03143e-1, +1.53605e-1, +1.72418e-1, +1.70826e-1, +1.66418e-1],
+    [-1.04881e-3, -1.45187e-3, -1.46088e-3, -1.38540e-3, -1.28180e-3],
+    [+3.59731e-6, +5.05312e-6, +5.17430e-6, +4.91192e-6, +4.53036e-6],
+    [-7.31303e-3, -9.32427E-3, -8.30138E-3, -7.64330e-3, -6.81574e-3],
+    [+7.93272E-5, +9.40568E-5, +7.13576E-5, +6.13126e-5, +4.94197e-5],
+    [-2.74296e-7, -3.28449e-7, -2.54885e-7, -2.21399e-7, -1.79074e-7]])
+
+
+def backscatter_factors(kvp: np.array, hvl: np.array) -> np.array:
+    """Calculate the backscatter factors at the tabulated field sizes.
+
+    This is eq. (8) in doi:10.1088/0031-9155/58/2/247, evaluated for all
+    beam qualities at once as a contraction of the coefficient tensor.
+
+    Parameters
+    ----------
+    kvp : np.array
+        Tube peak voltage in kV, of each beam quality.
+    hvl : np.array
+        HVL in mmAl, of each beam quality.
+
+    Returns
+    -------
+    np.array
+        Backscatter factor of each beam quality (rows), at each field side
+        length in FSL_TAB (columns).
+
+    """
+    kvp = np.asarray(kvp, dtype=float)
+    hvl = np.asarray(hvl, dtype=float)
+
+    kvp_powers = np.stack([np.ones_like(kvp), kvp, np.square(kvp)], axis=-1)
+    hvl_powers = np.stack([np.ones_like(hvl), hvl, np.square(hvl)], axis=-1)
+
+    return np.einsum('...i,...j,ijf->...f', hvl_powers, kvp_powers,
+                     COEFFICIENTS.reshape(3, 3, len(FSL_TAB)))
+
+
+class Backscatter:
+    """Backscatter correction of all events in a procedure.
+
+    The backscatter factors are interpolated in field side length with a
+    cubic spline, as in calculate_k_bs, but splines are built only for the
+    unique beam qualities (kVp, HVL) of the procedure, as a single
+    vector-valued spline. The piecewise polynomial is evaluated directly, so
+    that the field sizes of any number of cells and events are corrected in
+    one call.
+
+    Attributes
+    ----------
+    quality : np.array
+        Unique (kVp, HVL) beam qualities.
+    event_quality : np.array
+        Index in quality of each event.
+    breakpoints : np.array
+        Field side lengths of the spline breakpoints, in cm.
+    coefficients : np.array
+        Spline coefficients, of shape (4, intervals, beam qualities), highest
+        degree first.
+
+    """
+
+    def __init__(self, kvp: np.array, hvl: np.array):
+
+        self.quality, self.event_quality = np.unique(
+            np.column_stack([kvp, hvl]).astype(float), axis=0,
+            return_inverse=True)
+        self.event_quality = self.event_quality.ravel()
+
+        spline = CubicSpline(FSL_TAB, backscatter_factors(
+            self.quality[:, 0], self.quality[:, 1]).T, axis=0)
+
+        self.breakpoints = spline.x
+        self.coefficients = spline.c
+
+    def __call__(self, fsl: np.array, event: np.array) -> np.array:
+        """Interpolate the backscatter factor at field side lengths.
+
+        Parameters
+        ----------
+        fsl : np.array
+            Field side length in cm, e.g. of each skin cell.
+        event : np.array
+            Event index, e.g. of each skin cell. fsl and event are broadcast
+            against each other.
+
+        Returns
+        -------
+        np.array
+            Backscatter correction k_bs, in the broadcast shape of fsl and
+            event.
+
+        """
+        fsl, event = np.broadcast_arrays(np.asarray(fsl, dtype=float),
+                                         np.asarray(event))
+
+        return self.evaluate(fsl, self.event_quality[event])
+
+    def evaluate(self, fsl: np.array, quality: np.array) -> np.array:
+        """Interpolate the backscatter factor of beam qualities.
+
+        Parameters
+        ----------
+        fsl : np.array
+            Field side length in cm.
+        quality : np.array
+            Index in quality, of the same shape as fsl.
+
+        Returns
+        -------
+        np.array
+            Backscatter correction k_bs at each field side length.
+
+        """
+        # Spline interval, the end polynomials extrapolate
+        interval = np.clip(np.searchsorted(self.breakpoints, fsl,
+                                           side='right') - 1,
+                           0, len(self.breakpoints) - 2)
+        dx = fsl - self.breakpoints[interval]
+        c = self.coefficients[:, interval, quality]
+
+        return ((c[0] * dx + c[1]) * dx + c[2]) * dx + c[3]
+
+
+class QuantizedBackscatter:
+    """Backscatter correction from field size quantized lookup tables.
+
+    For each beam quality of a Backscatter, the backscatter factor is
+    tabulated over FSL_RANGE at a fixed field side length step. A skin cell
+    is corrected with the tabulated value at the field side length closest
+    to its own, i.e. with an integer index into the lookup table instead of
+    a spline evaluation. Field side lengths outside of FSL_RANGE are
+    evaluated with the spline of the Backscatter.
+
+    The quantization error is at most the change of k_bs over half a step.
+    It is calculated for all beam qualities, at the rounding boundaries
+    between table entries, and stored in max_error. For 50 - 150 kV and
+    HVL 1.5 - 12 mmAl, the error at the default step of 0.05 cm is below
+    2e-3, i.e. 0.2% of k_bs, and largest at the smallest field sizes.
+
+    Attributes
+    ----------
+    backscatter : Backscatter
+        Backscatter correction of the events, with one spline for each beam
+        quality.
+    step : float
+        Field side length step in cm.
+    fsl : np.array
+        Tabulated field side lengths in cm.
+    table : np.array
+        Backscatter factor of each beam quality (rows), at each tabulated
+        field side length (columns).
+    max_error : float
+        Largest absolute error of k_bs from quantization, within FSL_RANGE.
+
+    """
+
+    def __init__(self, backscatter: Backscatter,
+                 step: float = DEFAULT_FSL_STEP):
+
+        if step <= 0:
+            raise ValueError("step must be positive")
+
+        self.backscatter = backscatter
+        self.step = step
+
+        nr_steps = int(np.ceil((FSL_RANGE[1] - FSL_RANGE[0]) / step))
+        self.fsl = FSL_RANGE[0] + step * np.arange(nr_steps + 1)
+
+        quality = np.arange(len(backscatter.quality))[:, np.newaxis]
+        fsl, quality = np.broadcast_arrays(self.fsl, quality)
+        self.table = backscatter.evaluate(fsl, quality)
+
+        # Error at the rounding boundaries, against both neighbouring entries
+        boundary = backscatter.evaluate(fsl[:, :-1] + step / 2,
+                                        quality[:, :-1])
+        self.max_error = float(np.max(np.abs(np.concatenate(
+            [boundary - self.table[:, :-1], boundary - self.table[:, 1:]])),
+            initial=0))
+
+    def __call__(self, fsl: np.array, event: np.array) -> np.array:
+        """Look up the backscatter factor at field side lengths.
+
+        Parameters
+        ----------
+        fsl : np.array
+            Field side length in cm, e.g. of each skin cell.
+        event : np.array
+            Event index, e.g. of each skin cell. fsl and event are broadcast
+            against each other.
+
+        Returns
+        -------
+        np.array
+            Backscatter correction k_bs, in the broadcast shape of fsl and
+            event.
+
+        """
+        fsl, event = np.broadcast_arrays(np.asarray(fsl, dtype=float),
+                                         np.asarray(event))
+        quality = self.backscatter.event_quality[event]
+
+        index = np.rint((fsl - self.fsl[0]) / self.step).astype(int)
+        inside = (fsl >= self.fsl[0]) & (fsl <= self.fsl[-1])
+
+        if np.all(inside):
+            return self.table[quality, index]
+
+        k_bs = self.backscatter.evaluate(fsl, quality)
+        k_bs[inside] = self.table[quality[inside], index[inside]]
+
+        return k_bs
@@ -1,8 +1,30 @@
 import numpy as np
 import pandas as pd
-from typing import List
+from typing import Iterator, List, Optional, Union
 
+from .event_table import EventTable
 from .phantom_class import Phantom
+from .spatial_index import CellGrid
+
+# Default upper limit in bytes of the work arrays of batched beam hit checks
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+
+# Bytes of work arrays for each (beam, skin cell) pair in batched beam hit
+# checks: the vector from the source (3 floats), the distance to each face
+# (4 floats), and boolean masks
+_BYTES_PER_PAIR = 8 * 3 + 8 * 4 + 8
+
+# Vertex index vector of the X-ray beam, for plotly mesh3d plotting
+BEAM_IJK = np.column_stack(([0, 0, 0, 0, 1, 1],
+                            [1, 1, 3, 3, 2, 3],
+                            [2, 4, 2, 4, 3, 4]))
+
+# Beam-detector interception points for a beam of side length 1
+_BEAM_CORNERS = np.array([[+0.5, -1.0, +0.5],
+                          [+0.5, -1.0, -0.5],
+                          [-0.5, -1.0, -0.5],
+                          [-0.5, -1.0, +0.5]])
+
 
 class Beam:
     """A class used to create an X-ray beam and detector.
@@ -36,15 +58,15 @@ class Beam:
 
     """
 
-    def __init__(self, data_norm: pd.DataFrame, event: int = 0,
-                 plot_setup: bool = False) -> None:
+    def __init__(self, data_norm: Union[pd.DataFrame, EventTable],
+                 event: int = 0, plot_setup: bool = False) -> None:
         """Initialize the beam and detector for a specific irradiation event.
 
         Parameters
         ----------
-        data_norm : pd.DataFrame
+        data_norm : Union[pd.DataFrame, EventTable]
             Dicom RDSR information from each irradiation event. See
-            parse_data.py for more information.
+            parse_data.py and event_table.py for more information.
         event : int, optional
             Specifies the index of the irradiation event in the procedure
             (the default is 0, which is the first event).
@@ -87,10 +109,7 @@ class Beam:
         source = np.array([0, data_norm.DSI[event], 0])
 
         # Create beam-detector interception point for a beam of side length 1
-        r = np.array([[+0.5, -1.0, +0.5],
-                      [+0.5, -1.0, -0.5],
-                      [-0.5, -1.0, -0.5],
-                      [-0.5, -1.0, +0.5]])
+        r = _BEAM_CORNERS.copy()
 
         r[:, 0] *= data_norm.FS_long[event]  # Longitudinal collimation
         r[:, 1] *= data_norm.DID[event]  # Set source-detector distance
@@ -104,10 +123,7 @@ class Beam:
         self.r = r
 
         # Manually create vertex index vector for the X-ray beam
-        self.ijk = np.column_stack((
-            [0, 0, 0, 0, 1, 1],
-            [1, 1, 3, 3, 2, 3],
-            [2, 4, 2, 4, 3, 4]))
+        self.ijk = BEAM_IJK
 
         # Create unit vectors from X-ray source to beam verticies
         v = ((self.r[1:] - self.r[0, :]).T /
@@ -148,12 +164,46 @@ class Beam:
             [1, 2, 5, 6, 1, 5, 3, 7, 2, 2, 2, 6],
             [2, 3, 6, 7, 4, 4, 4, 4, 7, 6, 6, 5]))
 
-    def check_hit(self, patient: Phantom) -> List[bool]:
+    @classmethod
+    def from_vertices(cls, r: np.array, N: np.array) -> 'Beam':
+        """Create a beam from its vertices and face normals.
+
+        The detector geometry is not created, i.e. det_r and det_ijk are
+        None, so the beam can be used for dose calculation but not for
+        plotting.
+
+        Parameters
+        ----------
+        r : np.array
+            5*3 array of the X-ray focus and the beam vertices, see r.
+        N : np.array
+            4*3 array of the normal vectors to the beam faces, see N.
+
+        Returns
+        -------
+        Beam
+            X-ray beam without detector.
+
+        """
+        beam = cls.__new__(cls)
+        beam.r = r
+        beam.N = N
+        beam.ijk = BEAM_IJK
+        beam.det_r = None
+        beam.det_ijk = None
+
+        return beam
+
+    def check_hit(self, patient: Phantom) -> np.array:
         """Calculate which patient entrance skin cells are hit by the beam.
 
         A description of this algoritm is presented in the wiki, please visit
         https://dev.azure.com/Sjukhusfysiker/PySkinDose/_wiki
 
+        If the patient phantom has a cell grid, see position_geometry, only
+        the skin cells in grid voxels on the edge of the beam are checked
+        one by one.
+
         Parameters
         ----------
         patient : Phantom
@@ -162,24 +212,260 @@ class Beam:
 
         Returns
         -------
-        List[bool]
-            A boolean list of the same length as the number of patient skin
-            cells. True for all entrance skin cells that are hit by the beam.
+        np.array
+            Index array, in ascending order, of all entrance skin cells that
+            are hit by the beam. It can be used to index any per-cell array,
+            e.g. patient.r[hits].
 
         """
-        # Create vectors from X-ray source to each phantom skin cell
-        v = patient.r - self.r[0, :]
+        source = self.r[0, :]
+        grid = patient.cell_grid
+        offset = None if grid is None else grid.offset(patient.r)
+
+        if offset is None:
+            # Check which skin cells lies within the beam
+            v = patient.r - source
+            hits = np.flatnonzero((v @ self.N.T <= 0).all(axis=1))
+            v = v[hits]
+
+        else:
+            # Skip grid voxels outside the beam, and only check the cells of
+            # voxels on the edge of the beam
+            inside, edge = grid.cull(source, self.N, offset)
+            edge = edge[((patient.r[edge] - source) @ self.N.T <= 0)
+                        .all(axis=1)]
+            hits = np.sort(np.concatenate([inside, edge]))
+            v = patient.r[hits] - source
+
+        # if patient phantom is 3D, remove exit path skin cells, i.e. cells
+        # with normals facing away from the X-ray source
+        if patient.phantom_model != "plane":
+            hits = hits[np.einsum('ij,ij->i', v, patient.n[hits]) <= 0]
+
+        return hits
+
+
+class BeamBatch:
+    """X-ray beams of many irradiation events, as arrays.
+
+    The beam vertices and face normals of all events are calculated at once
+    from the angle, distance and collimation columns of the event data,
+    with the same geometry as Beam. No detector geometry is created.
+
+    Attributes
+    ----------
+    r : np.array
+        E*5*3 array, the X-ray focus and beam vertices of each event, see
+        Beam.r.
+    N : np.array
+        E*4*3 array, the normal vectors to the beam faces of each event, see
+        Beam.N.
+    displacement : np.array
+        E*3 array, the table displacement of each event, by which the
+        phantoms are translated in Phantom.position.
+    r_ref : np.array
+        E*5*3 array, r relative to the phantoms in their reference position,
+        i.e. translated by the inverse table displacement. The face normals
+        are the same in both frames.
+
+    Methods
+    -------
+    beam(event)
+        Beam of one event.
+    check_hit(patient, events, max_bytes)
+        Calculates which of the patient phantom's entrance skin cells are hit
+        by the X-ray beam of each event.
+    iter_hits(patient, events, max_bytes)
+        Same as check_hit, calculated chunk by chunk while iterating.
+
+    """
+
+    def __init__(self, data_norm: Union[pd.DataFrame, EventTable]) -> None:
+        """Calculate the beams of all events.
+
+        Parameters
+        ----------
+        data_norm : Union[pd.DataFrame, EventTable]
+            Dicom RDSR information from each irradiation event. See
+            parse_data.py and event_table.py for more information.
+
+        """
+        # Positioner isocenter primary and secondary angle (Ap1, Ap2). Ap3
+        # rotation is not yet supported.
+        ap1 = np.deg2rad(np.asarray(data_norm.PPA, dtype=float))
+        ap2 = np.deg2rad(np.asarray(data_norm.PSA, dtype=float))
+        zero = np.zeros_like(ap1)
+        one = np.ones_like(ap1)
+
+        # Rotation matrices about Ap1 and Ap2 of each event
+        R1 = np.stack([np.stack([+np.cos(ap1), +np.sin(ap1), zero], -1),
+                       np.stack([-np.sin(ap1), +np.cos(ap1), zero], -1),
+                       np.stack([zero, zero, one], -1)], axis=-2)
+        R2 = np.stack([np.stack([one, zero, zero], -1),
+                       np.stack([zero, +np.cos(ap2), -np.sin(ap2)], -1),
+                       np.stack([zero, +np.sin(ap2), +np.cos(ap2)], -1)],
+                      axis=-2)
+
+        # X-ray source and beam-detector interception points, with
+        # longitudinal collimation, source-detector distance and lateral
+        # collimation
+        source = np.stack(
+            [zero, np.asarray(data_norm.DSI, dtype=float), zero], -1)
+        corners = _BEAM_CORNERS * np.stack(
+            [np.asarray(data_norm.FS_long, dtype=float),
+             np.asarray(data_norm.DID, dtype=float),
+             np.asarray(data_norm.FS_lat, dtype=float)], -1)[:, np.newaxis]
+
+        # Rotate beam about ap1 and ap2, i.e. r (R2 R1) for each row r
+        r = np.concatenate([source[:, np.newaxis], corners], axis=1)
+        self.r = np.matmul(r, np.matmul(R2, R1))
+
+        # Unit vectors from X-ray source to beam vertices, and the normal
+        # vectors to the faces of the beam
+        v = self.r[:, 1:] - self.r[:, :1]
+        v /= np.linalg.norm(v, axis=-1, keepdims=True)
+        self.N = np.cross(v, np.roll(v, -1, axis=1))
+
+        self.displacement = np.stack(
+            [np.asarray(data_norm.dLONG, dtype=float),
+             np.asarray(data_norm.dVERT, dtype=float),
+             np.asarray(data_norm.dLAT, dtype=float)], -1)
+
+        # Moving the beam by the inverse table displacement is the same as
+        # moving the phantoms by the table displacement
+        self.r_ref = self.r - self.displacement[:, np.newaxis]
+
+    def __len__(self) -> int:
+        return len(self.r)
+
+    def beam(self, event: int, reference: bool = False) -> Beam:
+        """Beam of one event, without detector, see Beam.from_vertices.
+
+        Parameters
+        ----------
+        event : int
+            Irradiation event index.
+        reference : bool, optional
+            Set to True for the beam relative to the phantoms in their
+            reference position, i.e. r_ref, default is False.
+
+        Returns
+        -------
+        Beam
+            X-ray beam without detector.
+
+        """
+        r = self.r_ref if reference else self.r
+        return Beam.from_vertices(r[event], self.N[event])
+
+    def check_hit(self, patient: Phantom, events: Optional[np.array] = None,
+                  max_bytes: int = DEFAULT_MAX_BYTES) -> List[np.array]:
+        """Calculate which patient entrance skin cells are hit by each beam.
+
+        The hits are the same as of Beam.check_hit, with the patient
+        phantom positioned for each event. Instead of positioning the
+        phantom, the beams are moved relative to the reference position of
+        the skin cells, see r_ref, and as many beams as fit within max_bytes
+        of work arrays are checked in one broadcast operation. If the
+        patient phantom has a cell grid, only the skin cells in grid voxels
+        on the edge of each beam are checked.
+
+        Parameters
+        ----------
+        patient : Phantom
+            Patient phantom, either of type plane, cylinder or human, i.e.
+            instance of class Phantom, positioned with position_geometry.
+        events : np.array, optional
+            Indices of the events to check, by default all events.
+        max_bytes : int, optional
+            Upper limit of the work array memory, by default 64 MiB. At
+            least one beam is checked at a time.
+
+        Returns
+        -------
+        List[np.array]
+            Index array of the hit entrance skin cells, see Beam.check_hit,
+            of each event in events.
+
+        """
+        return list(self.iter_hits(patient, events, max_bytes))
+
+    def iter_hits(self, patient: Phantom, events: Optional[np.array] = None,
+                  max_bytes: int = DEFAULT_MAX_BYTES) -> Iterator[np.array]:
+        """Iterate the hit skin cells of each beam, one chunk at a time.
+
+        See check_hit. The beams are checked chunk by chunk as the hits are
+        consumed, so that only the hits of one chunk are held at a time.
+
+        """
+        if events is None:
+            events = np.arange(len(self))
+        events = np.asarray(events, dtype=int)
+
+        # The cell grid must index the reference position of the skin cells
+        grid = patient.cell_grid
+        if grid is not None and grid.offset(patient.r_ref) is None:
+            grid = None
+
+        chunk = max(1, int(max_bytes // (_BYTES_PER_PAIR *
+                                         max(1, len(patient.r_ref)))))
+
+        for start in range(0, len(events), chunk):
+            ind = events[start:start + chunk]
+            if grid is None:
+                yield from self._check_all_cells(patient, ind)
+            else:
+                yield from self._check_grid_cells(patient, grid, ind)
+
+    def _check_all_cells(self, patient: Phantom,
+                         ind: np.array) -> List[np.array]:
+        """Check all skin cells against the beams of events ind."""
+        # Vector from the X-ray source to each skin cell, for each beam
+        v = patient.r_ref - self.r_ref[ind, np.newaxis, 0]
+
+        # Check which skin cells lies within each beam
+        inside = (np.matmul(v, self.N[ind].transpose(0, 2, 1)) <= 0)\
+            .all(axis=-1)
+
+        # if patient phantom is 3D, remove exit path skin cells
+        if patient.phantom_model != "plane":
+            inside &= np.einsum('eij,ij->ei', v, patient.n) <= 0
+
+        return [np.flatnonzero(row) for row in inside]
+
+    def _check_grid_cells(self, patient: Phantom, grid: CellGrid,
+                          ind: np.array) -> List[np.array]:
+        """Check the skin cells of grid voxels on the edge of the beams."""
+        culled = grid.cull_beams(self.r_ref[ind, 0], self.N[ind],
+                                 np.zeros((len(ind), 3)))
+
+        # Skin cells of voxels on the edge of any beam, all checked at once,
+        # with the position in ind of the beam of each (beam, cell) pair
+        edge = [cells for _, cells in culled]
+        pair = np.repeat(np.arange(len(ind)), [len(cells) for cells in edge])
+        edge = np.concatenate(edge)
+
+        v = patient.r_ref[edge] - self.r_ref[ind[pair], 0]
+        inside = (np.einsum('pk,pfk->pf', v, self.N[ind[pair]]) <= 0)\
+            .all(axis=-1)
+        edge_hits = _split(edge[inside], pair[inside], len(ind))
+
+        hits = [np.sort(np.concatenate([accepted, cells]))
+                for (accepted, _), cells in zip(culled, edge_hits)]
 
-        # Check which skin cells lies within the beam
-        hits = (np.dot(v, self.N.T) <= 0).all(axis=1)
         # if patient phantom is 3D, remove exit path skin cells
         if patient.phantom_model != "plane":
-            temp1 = v[hits]
-            temp2 = patient.n[hits]
+            pair = np.repeat(np.arange(len(ind)),
+                             [len(cells) for cells in hits])
+            cells = np.concatenate(hits)
+            v = patient.r_ref[cells] - self.r_ref[ind[pair], 0]
+            entrance = np.einsum('ij,ij->i', v, patient.n[cells]) <= 0
+            hits = _split(cells[entrance], pair[entrance], len(ind))
 
-            bool_entrance = [np.dot(temp1[i], temp2[i]) <= 0
-                             for i in range(len(temp1))]
+        return hits
 
-            hits[np.where(hits)] = bool_entrance
 
-        return hits.tolist()
+def _split(cells: np.array, pair: np.array, nr_beams: int) -> List[np.array]:
+    """Split (beam, cell) pairs, ordered by beam, into the cells of each."""
+    return np.split(cells, np.cumsum(np.bincount(pair, minlength=nr_beams))
+                    [:-1])
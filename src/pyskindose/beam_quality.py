@@ -0,0 +1,319 @@
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Union
+import threading
+import numpy as np
+import pandas as pd
+from scipy.interpolate import CubicSpline
+
+from .backscatter import FSL_TAB, backscatter_factors
+from .correction_store import CorrectionStore, get_correction_store
+from .event_table import EventTable
+
+# Default upper limit of the number of memoized beam qualities
+DEFAULT_MEMO_SIZE = 256
+
+# Normalized RDSR columns of the fields of BeamQuality
+QUALITY_COLUMNS = ['model', 'acquisition_plane', 'kVp', 'filter_thickness_Cu',
+                   'filter_thickness_Al']
+
+_default_memo: Optional['CorrectionMemo'] = None
+_default_memo_lock = threading.Lock()
+
+
+class BeamQuality(NamedTuple):
+    """Beam quality of an irradiation event, key of all correction factors.
+
+    The kVp is kept as reported, rather than rounded, since the HVL is
+    interpolated in kVp, and backscatter and medium corrections depend on
+    the actual kVp. Consecutive events of a fluoroscopy run report
+    identical values, and share one key.
+
+    """
+
+    model: str
+    plane: str
+    kvp: float
+    cu: float
+    al: float
+
+    @classmethod
+    def of_events(cls, data_norm: Union[pd.DataFrame, EventTable]
+                  ) -> List['BeamQuality']:
+        """Beam quality of each event.
+
+        Parameters
+        ----------
+        data_norm : Union[pd.DataFrame, EventTable]
+            RDSR data, normalized for compliance with PySkinDose, or an
+            EventTable of it.
+
+        Returns
+        -------
+        List[BeamQuality]
+            Beam quality of each event.
+
+        """
+        return [cls(*values) for values in zip(
+            *[np.asarray(data_norm[column]).tolist()
+              for column in QUALITY_COLUMNS])]
+
+    @classmethod
+    def of_event(cls, data_norm: Union[pd.DataFrame, EventTable],
+                 event: int) -> 'BeamQuality':
+        """Beam quality of one event, see of_events."""
+        return cls(*[data_norm[column][event] for column in QUALITY_COLUMNS])
+
+
+def has_beam_quality(data_norm: Union[pd.DataFrame, EventTable]) -> bool:
+    """Check if event data holds all columns of the beam quality.
+
+    Parameters
+    ----------
+    data_norm : Union[pd.DataFrame, EventTable]
+        RDSR data, normalized for compliance with PySkinDose, or an
+        EventTable of it.
+
+    Returns
+    -------
+    bool
+        True if data_norm holds all QUALITY_COLUMNS.
+
+    """
+    return all(column in data_norm for column in QUALITY_COLUMNS)
+
+
+class QualityCorrections(NamedTuple):
+    """Correction factors of one beam quality.
+
+    Attributes
+    ----------
+    hvl : float
+        HVL in mmAl.
+    k_tab : float
+        Patient support table transmission, or None if not tabulated.
+    k_bs : CubicSpline
+        Backscatter correction as a function of field side length in cm.
+    k_med : np.array
+        Medium correction at each tabulated field side length of the KS
+        table, see CorrectionStore.nearest_fsl.
+
+    """
+
+    hvl: float
+    k_tab: Optional[float]
+    k_bs: CubicSpline
+    k_med: np.array
+
+
+class CorrectionMemo:
+    """Bounded LRU memo of the correction factors of each beam quality.
+
+    The correction factors of a beam quality are looked up in the
+    correction store the first time the quality is requested, and returned
+    from the memo for all following events with the same quality. The least
+    recently used qualities are dropped when more than maxsize are held.
+
+    The memo is thread-safe: the memoized qualities and the counters are
+    guarded by a lock, while correction factors are looked up outside of
+    it. Memoized correction factors are shared between threads, and their
+    arrays are read-only.
+
+    Attributes
+    ----------
+    store : CorrectionStore
+        Correction tables.
+    maxsize : int
+        Upper limit of the number of memoized beam qualities.
+    hits : int
+        Number of requests returned from the memo.
+    misses : int
+        Number of requests looked up in the correction store.
+
+    Methods
+    -------
+    get(quality)
+        Correction factors of a beam quality.
+    events(data_norm)
+        Correction factors of each event.
+    k_med(corrections, fsl)
+        Medium correction at field side lengths.
+    clear()
+        Drop all memoized qualities and reset the counters.
+
+    """
+
+    def __init__(self, store: Optional[CorrectionStore] = None,
+                 maxsize: int = DEFAULT_MEMO_SIZE):
+
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.store = get_correction_store() if store is None else store
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._memo: 'OrderedDict[BeamQuality, QualityCorrections]' = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memo)
+
+    def get(self, quality: BeamQuality) -> QualityCorrections:
+        """Fetch the correction factors of a beam quality.
+
+        Parameters
+        ----------
+        quality : BeamQuality
+            Beam quality.
+
+        Returns
+        -------
+        QualityCorrections
+            Correction factors of the beam quality.
+
+        Raises
+        ------
+        ValueError
+            If no HVL is tabulated for the beam quality.
+
+        """
+        with self._lock:
+            corrections = self._memo.get(quality)
+
+            if corrections is not None:
+                self.hits += 1
+                self._memo.move_to_end(quality)
+                return corrections
+
+        return self._add(quality, self._calculate([quality])[0])
+
+    def events(self, data_norm: Union[pd.DataFrame, EventTable]
+               ) -> List[QualityCorrections]:
+        """Fetch the correction factors of each event.
+
+        The beam qualities that are not memoized are looked up in the
+        correction store together, in one vectorized lookup.
+
+        Parameters
+        ----------
+        data_norm : Union[pd.DataFrame, EventTable]
+            RDSR data, normalized for compliance with PySkinDose, or an
+            EventTable of it.
+
+        Returns
+        -------
+        List[QualityCorrections]
+            Correction factors of each event.
+
+        Raises
+        ------
+        ValueError
+            If no HVL is tabulated for the beam quality of an event.
+
+        """
+        qualities = BeamQuality.of_events(data_norm)
+
+        with self._lock:
+            missing = [quality for quality in dict.fromkeys(qualities)
+                       if quality not in self._memo]
+        calculated = dict(zip(missing, self._calculate(missing)))
+
+        return [self._add(quality, calculated.pop(quality))
+                if quality in calculated else self.get(quality)
+                for quality in qualities]
+
+    def k_med(self, corrections: QualityCorrections,
+              fsl: np.array) -> np.array:
+        """Medium correction of a beam quality at field side lengths.
+
+        Parameters
+        ----------
+        corrections : QualityCorrections
+            Correction factors of the beam quality.
+        fsl : np.array
+            Field side length in cm, e.g. of each skin cell.
+
+        Returns
+        -------
+        np.array
+            Medium correction k_med at each field side length.
+
+        """
+        return corrections.k_med[self.store.nearest_fsl(fsl)]
+
+    def clear(self) -> None:
+        """Drop all memoized beam qualities and reset the counters."""
+        with self._lock:
+            self._memo.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _add(self, quality: BeamQuality,
+             corrections: QualityCorrections) -> QualityCorrections:
+        """Memoize the correction factors of a looked up beam quality."""
+        with self._lock:
+            self.misses += 1
+
+            # Keep the factors of another thread that looked up the same
+            # quality, so that all threads share one copy
+            if quality in self._memo:
+                self._memo.move_to_end(quality)
+                return self._memo[quality]
+
+            self._memo[quality] = corrections
+            if len(self._memo) > self.maxsize:
+                self._memo.popitem(last=False)
+
+        return corrections
+
+    def _calculate(self, qualities: List[BeamQuality]
+                   ) -> List[QualityCorrections]:
+        """Look up the correction factors of beam qualities in the store."""
+        if not qualities:
+            return []
+
+        model, plane, kvp, cu, al = [np.array(values) for values in
+                                     zip(*qualities)]
+        params = dict(model=model, plane=plane, kvp=kvp, cu=cu, al=al)
+
+        hvl = self.store.hvl(**params)
+
+        # Table transmission is not needed with estimated table correction
+        k_tab = self.store.k_tab(**params, errors='coerce')
+
+        # Backscatter factors and k_med at the tabulated field side lengths
+        k_bs = backscatter_factors(kvp, hvl)
+        k_med = self.store.k_med(kvp[:, np.newaxis], hvl[:, np.newaxis],
+                                 self.store.ks_fsl.values)
+        k_med.flags.writeable = False
+
+        corrections = []
+        for ind in range(len(qualities)):
+            corrections.append(QualityCorrections(
+                hvl=float(hvl[ind]),
+                k_tab=None if np.isnan(k_tab[ind]) else float(k_tab[ind]),
+                k_bs=CubicSpline(FSL_TAB, k_bs[ind]), k_med=k_med[ind]))
+
+        return corrections
+
+
+def get_correction_memo() -> CorrectionMemo:
+    """Fetch the default correction memo, of the default correction store.
+
+    Returns
+    -------
+    CorrectionMemo
+        Memo of DEFAULT_MEMO_SIZE beam qualities, shared by all threads.
+
+    """
+    global _default_memo
+
+    if _default_memo is None:
+        with _default_memo_lock:
+            # Created by another thread while waiting for the lock
+            if _default_memo is None:
+                _default_memo = CorrectionMemo()
+
+    return _default_memo
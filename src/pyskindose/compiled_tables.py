@@ -0,0 +1,203 @@
+import glob
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from .rdsr_cache import hash_file
+
+# Version of the compiled table layout. Increment when compile_table changes,
+# in order to invalidate compiled artifacts.
+ARTIFACT_VERSION = 1
+
+TABLE_DATA_DIR = os.path.join(os.path.dirname(__file__), 'table_data')
+
+# Source CSV file of each correction table
+TABLE_FILES = {'HVL_simulated': 'HVL_simulated.csv',
+               'KS_table_concatenated': 'KS_table_concatenated.csv',
+               'table_transmission': 'table_transmission.csv',
+               'device_info': 'device_info.csv'}
+
+# Compiled rows are sorted on these columns, so that each lookup group is a
+# contiguous run of kVp-sorted rows. Sorting is stable, so rows with equal
+# keys keep their order in the CSV file.
+SORT_COLUMNS = {'HVL_simulated': ['DeviceModel', 'AcquisitionPlane',
+                                  'AddedFiltration_mmCu',
+                                  'AddedFiltration_mmAl', 'kVp_kV'],
+                'KS_table_concatenated': ['field_side_length_cm', 'kvp_kV'],
+                'table_transmission': ['DeviceModel', 'AcquisitionPlane',
+                                       'AddedFiltration_mmCu',
+                                       'AddedFiltration_mmAl', 'kVp_kV']}
+
+
+def artifact_dirs() -> List[str]:
+    """Directories searched for compiled tables, in order of preference.
+
+    Compiled tables are stored next to the CSV files in the package, and in
+    the user cache directory if the package directory is not writable.
+
+    Returns
+    -------
+    List[str]
+        Package directory and user cache directory for compiled tables.
+
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache'))
+
+    return [os.path.join(TABLE_DATA_DIR, 'compiled'),
+            os.path.join(cache_home, 'pyskindose', 'compiled')]
+
+
+def compile_table(csv_path: str, name: str) -> np.ndarray:
+    """Compile a correction table CSV file into a structured array.
+
+    Numeric columns keep their dtype, other columns are stored as fixed-width
+    unicode strings (missing values as ''), so that the array can be saved
+    and memory-mapped without pickle.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path to the CSV file.
+    name : str
+        Name of the table, see TABLE_FILES.
+
+    Returns
+    -------
+    np.ndarray
+        Structured array with one record per row, sorted on SORT_COLUMNS.
+
+    """
+    table = pd.read_csv(csv_path)
+
+    if name in SORT_COLUMNS:
+        table = table.sort_values(SORT_COLUMNS[name], kind='stable')
+
+    fields = []
+    for column in table.columns:
+        values = table[column]
+
+        if values.dtype.kind not in 'biuf':
+            values = values.fillna('').astype(str).to_numpy(dtype=str)
+        else:
+            values = values.to_numpy()
+
+        fields.append((column, values))
+
+    records = np.empty(len(table), dtype=[(column, values.dtype)
+                                          for column, values in fields])
+    for column, values in fields:
+        records[column] = values
+
+    return records
+
+
+def load_table(name: str, csv_path: Optional[str] = None,
+               dirs: Optional[List[str]] = None) -> np.ndarray:
+    """Load a compiled correction table, memory-mapped read-only.
+
+    The compiled artifact is named after the table, ARTIFACT_VERSION and the
+    checksum of the CSV file. If no artifact matches, the CSV file is
+    compiled and written to the first writable directory. The artifact is
+    written to a temporary file that replaces the target atomically, so that
+    concurrent processes never load a partially written artifact. Artifacts
+    of earlier checksums or versions are removed.
+
+    Parameters
+    ----------
+    name : str
+        Name of the table, see TABLE_FILES.
+    csv_path : str, optional
+        Path to the CSV file, by default the file of the table in table_data.
+    dirs : List[str], optional
+        Directories to search and store artifacts in, by default
+        artifact_dirs().
+
+    Returns
+    -------
+    np.ndarray
+        Read-only, memory-mapped structured array of the table.
+
+    Raises
+    ------
+    OSError
+        If the table can not be compiled to any of the directories.
+
+    """
+    if csv_path is None:
+        csv_path = os.path.join(TABLE_DATA_DIR, TABLE_FILES[name])
+    if dirs is None:
+        dirs = artifact_dirs()
+
+    artifact = f"{name}_v{ARTIFACT_VERSION}_{hash_file(csv_path)[:16]}.npy"
+
+    for directory in dirs:
+        path = os.path.join(directory, artifact)
+        if os.path.exists(path):
+            try:
+                return np.load(path, mmap_mode='r', allow_pickle=False)
+            except (OSError, ValueError):
+                # Corrupted artifact, rebuilt below
+                pass
+
+    records = compile_table(csv_path, name)
+    error = None
+
+    for directory in dirs:
+        path = os.path.join(directory, artifact)
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fp:
+                np.save(fp, records, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            error = err
+            # Remove the temporary file, unless it was never created
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            continue
+
+        _remove_stale(directory, name, artifact)
+
+        return np.load(path, mmap_mode='r', allow_pickle=False)
+
+    raise OSError(f"Could not store compiled table {name} in any of "
+                  f"{dirs}") from error
+
+
+def load_tables(dirs: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """Load all compiled correction tables, see load_table.
+
+    Parameters
+    ----------
+    dirs : List[str], optional
+        Directories to search and store artifacts in, by default
+        artifact_dirs().
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Read-only, memory-mapped structured array of each table in
+        TABLE_FILES.
+
+    """
+    return {name: load_table(name, dirs=dirs) for name in TABLE_FILES}
+
+
+def _remove_stale(directory: str, name: str, artifact: str) -> None:
+    """Remove artifacts of a table, except the current one."""
+    for path in glob.glob(os.path.join(directory, f"{name}_v*.npy")):
+        if os.path.basename(path) != artifact:
+            try:
+                os.remove(path)
+            except OSError:
+                # In use, or removed by another process
+                pass
@@ -0,0 +1,502 @@
+from typing import List, Optional, Tuple, Union
+import threading
+import numpy as np
+import pandas as pd
+
+from .compiled_tables import load_table
+from .db_connect import DEFAULT_DB, db_connect
+
+# Correction table, as a DataFrame or a compiled structured array
+Table = Union[pd.DataFrame, np.ndarray]
+
+# Columns that identify a beam quality group in the HVL and table
+# transmission tables: device model, acquisition plane and added filtration
+GROUP_COLUMNS = ['DeviceModel', 'AcquisitionPlane', 'AddedFiltration_mmCu',
+                 'AddedFiltration_mmAl']
+
+_default_store: Optional['CorrectionStore'] = None
+_default_store_lock = threading.Lock()
+
+
+class CorrectionStore:
+    """Correction factor tables, loaded once and indexed in memory.
+
+    The HVL and table transmission tables are grouped on device model,
+    acquisition plane and added filtration (Cu and Al), each group holding a
+    kVp-sorted NumPy array of values. The KS table is indexed on field side
+    length, kVp and HVL, as sorted grids for nearest neighbour search. All
+    lookups are array searches, without database queries. The tables are
+    DataFrames or compiled structured arrays, see compiled_tables.
+
+    All arrays of the store are read-only, and lookups do not modify the
+    store, so that one store can be shared by all threads of a process.
+
+    Attributes
+    ----------
+    hvl_table : GroupedTable
+        HVL in mmAl, in groups of GROUP_COLUMNS.
+    k_tab_table : GroupedTable
+        Patient support table transmission, in groups of GROUP_COLUMNS.
+    ks_fsl : SortedSegments
+        Tabulated field side lengths in cm.
+    ks_kvp : SortedSegments
+        Tabulated kVp, one segment for each field side length.
+    ks_hvl : SortedSegments
+        Tabulated HVL in mmAl, one segment for each (field side length, kVp).
+    mu_en_quotient : np.array
+        Tabulated mu_en quotient of each entry in ks_hvl.
+
+    Methods
+    -------
+    from_database(db_name)
+        Load all tables from the corrections database.
+    from_compiled(dirs)
+        Load all tables from compiled, memory-mapped artifacts.
+    hvl(model, plane, kvp, cu, al)
+        HVL in mmAl for each event.
+    k_tab(model, plane, kvp, cu, al)
+        Patient support table transmission for each event.
+    k_med(kvp, hvl, fsl)
+        Medium correction for each skin cell.
+    nearest_fsl(fsl)
+        Index of the closest tabulated field side length.
+
+    """
+
+    def __init__(self, hvl_table: Table, ks_table: Table,
+                 table_transmission: Table):
+
+        self.hvl_table = GroupedTable(hvl_table, 'HVL_mmAl')
+        self.k_tab_table = GroupedTable(table_transmission,
+                                        'k_patient_support')
+
+        fsl = np.asarray(ks_table['field_side_length_cm'])
+        kvp = np.asarray(ks_table['kvp_kV'])
+        hvl = np.asarray(ks_table['hvl_mmAl'])
+        order = np.lexsort([hvl, kvp, fsl])
+        fsl, kvp = fsl[order], kvp[order]
+
+        # First entry of each (field side length, kVp)
+        first = np.flatnonzero(np.append(True, (fsl[1:] != fsl[:-1]) |
+                                         (kvp[1:] != kvp[:-1])))
+        fsl_tab, kvp_counts = np.unique(fsl[first], return_counts=True)
+
+        self.ks_fsl = SortedSegments(fsl_tab, [len(fsl_tab)])
+        self.ks_kvp = SortedSegments(kvp[first], kvp_counts)
+        self.ks_hvl = SortedSegments(hvl[order],
+                                     np.diff(np.append(first, len(fsl))))
+        self.mu_en_quotient = _read_only(
+            np.asarray(ks_table['mu_en_quotient'])[order])
+
+    @classmethod
+    def from_database(cls, db_name: str = DEFAULT_DB
+                      ) -> 'CorrectionStore':
+        """Load the correction tables from the corrections database.
+
+        Parameters
+        ----------
+        db_name : str, optional
+            Path to the sqlite3 database, see db_connect.
+
+        Returns
+        -------
+        CorrectionStore
+            Store holding the HVL, KS and table transmission tables.
+
+        """
+        conn = db_connect(db_name)[0]
+
+        tables = [pd.read_sql_query(f"SELECT * FROM {table}", conn)
+                  for table in ['HVL_simulated', 'KS_table_concatenated',
+                                'table_transmission']]
+        conn.close()
+
+        return cls(*tables)
+
+    @classmethod
+    def from_compiled(cls, dirs: Optional[List[str]] = None
+                      ) -> 'CorrectionStore':
+        """Load the correction tables from compiled, memory-mapped artifacts.
+
+        Parameters
+        ----------
+        dirs : List[str], optional
+            Directories of compiled tables, see compiled_tables.load_table.
+
+        Returns
+        -------
+        CorrectionStore
+            Store holding the HVL, KS and table transmission tables. Groups
+            are read-only views of the memory-mapped tables.
+
+        """
+        return cls(*[load_table(name, dirs=dirs)
+                     for name in ['HVL_simulated', 'KS_table_concatenated',
+                                  'table_transmission']])
+
+    def hvl(self, model: np.array, plane: np.array, kvp: np.array,
+            cu: np.array, al: np.array, errors: str = 'raise') -> np.array:
+        """Look up the HVL of each event.
+
+        The HVL is interpolated linearly in kVp, between the tabulated kVp of
+        the device model, acquisition plane and filtration of each event.
+
+        Parameters
+        ----------
+        model : np.array
+            Device model of each event.
+        plane : np.array
+            Acquisition plane of each event.
+        kvp : np.array
+            Tube peak voltage of each event.
+        cu : np.array
+            Added copper filtration in mm of each event.
+        al : np.array
+            Added aluminum filtration in mm of each event.
+        errors : str, optional
+            If 'raise' (default), events without tabulated HVL raise an
+            error. If 'coerce', their HVL is NaN.
+
+        Returns
+        -------
+        np.array
+            HVL in mmAl of each event.
+
+        Raises
+        ------
+        ValueError
+            If errors is 'raise', and the filtration of an event is not
+            tabulated, or its kVp is outside of the tabulated range.
+
+        """
+        return self.hvl_table.lookup(model, plane, kvp, cu, al,
+                                     interpolate=True, errors=errors)
+
+    def k_tab(self, model: np.array, plane: np.array, kvp: np.array,
+              cu: np.array, al: np.array, errors: str = 'raise') -> np.array:
+        """Look up the patient support table transmission of each event.
+
+        The table transmission is looked up at the kVp of each event, rounded
+        to the nearest integer. See hvl for a description of the parameters.
+
+        Returns
+        -------
+        np.array
+            Table correction factor of each event.
+
+        Raises
+        ------
+        ValueError
+            If errors is 'raise', and no table transmission is tabulated for
+            an event.
+
+        """
+        return self.k_tab_table.lookup(model, plane, kvp, cu, al,
+                                       interpolate=False, errors=errors)
+
+    def k_med(self, kvp: np.array, hvl: np.array, fsl: np.array
+              ) -> np.array:
+        """Look up the medium correction (air -> water) of skin cells.
+
+        The closest tabulated field side length is selected first, then the
+        closest tabulated kVp and last the closest tabulated HVL, in order
+        of decreasing dependence. Ties select the lower tabulated value. The
+        parameters are broadcast against each other, so that e.g. the kVp
+        and HVL of one event can be given with the field side length of each
+        skin cell.
+
+        Parameters
+        ----------
+        kvp : np.array
+            Tube peak voltage in kV.
+        hvl : np.array
+            HVL in mmAl.
+        fsl : np.array
+            Field side length in cm.
+
+        Returns
+        -------
+        np.array
+            Medium correction k_med, in the broadcast shape of the
+            parameters.
+
+        """
+        kvp, hvl, fsl = np.broadcast_arrays(*[
+            np.asarray(values, dtype=float) for values in [kvp, hvl, fsl]])
+
+        kvp_ind = self.ks_kvp.nearest(self.nearest_fsl(fsl), kvp)
+
+        return self.mu_en_quotient[self.ks_hvl.nearest(kvp_ind, hvl)]
+
+    def nearest_fsl(self, fsl: np.array) -> np.array:
+        """Index of the closest tabulated field side length of the KS table.
+
+        Parameters
+        ----------
+        fsl : np.array
+            Field side length in cm.
+
+        Returns
+        -------
+        np.array
+            Index in ks_fsl.values, ties select the lower value.
+
+        """
+        fsl = np.asarray(fsl, dtype=float)
+
+        return self.ks_fsl.nearest(np.zeros(fsl.shape, dtype=int), fsl)
+
+
+class GroupedTable:
+    """Correction table in kVp-sorted groups of GROUP_COLUMNS.
+
+    Events are joined onto the groups of the table on device model,
+    acquisition plane and filtration, and their kVp is searched for within
+    the group, for all events in one vectorized pass.
+
+    Attributes
+    ----------
+    name : str
+        Name of the tabulated value, e.g. 'HVL_mmAl'.
+    groups : pd.MultiIndex
+        Device model, acquisition plane, Cu and Al filtration of each group.
+    kvp : SortedSegments
+        Tabulated kVp, one segment for each group.
+    values : np.array
+        Tabulated value of each entry in kvp.
+
+    """
+
+    def __init__(self, table: Table, value: str):
+
+        self.name = value
+
+        keys = [_column(table, column) for column in GROUP_COLUMNS]
+        kvp = np.asarray(table['kVp_kV'])
+        values = np.asarray(table[value])
+
+        # Sort on group and kVp. Compiled tables are already sorted, and
+        # their values are then a view of the memory-mapped table.
+        order = np.lexsort([kvp] + keys[::-1])
+        if np.any(order != np.arange(len(order))):
+            keys = [key[order] for key in keys]
+            kvp = kvp[order]
+            values = values[order]
+
+        # First row of each group
+        start = np.zeros(len(kvp), dtype=bool)
+        start[:1] = True
+        for key in keys:
+            start[1:] |= key[1:] != key[:-1]
+        first = np.flatnonzero(start)
+
+        self.groups = _group_index(*[key[first] for key in keys])
+        self.kvp = SortedSegments(kvp, np.diff(np.append(first, len(kvp))))
+        self.values = _read_only(values)
+
+    def lookup(self, model: np.array, plane: np.array, kvp: np.array,
+               cu: np.array, al: np.array, interpolate: bool,
+               errors: str = 'raise') -> np.array:
+        """Look up the tabulated value of each event.
+
+        Parameters
+        ----------
+        model, plane, kvp, cu, al : np.array
+            Device model, acquisition plane, kVp, and Cu and Al filtration in
+            mm of each event.
+        interpolate : bool
+            If True, interpolate linearly in kVp. Otherwise, the kVp is
+            rounded to the nearest integer and must be tabulated.
+        errors : str, optional
+            If 'raise' (default), events without tabulated value raise an
+            error. If 'coerce', their value is NaN.
+
+        Returns
+        -------
+        np.array
+            Tabulated value of each event.
+
+        Raises
+        ------
+        ValueError
+            If errors is 'raise', and an event has no tabulated value.
+
+        """
+        if errors not in ('raise', 'coerce'):
+            raise ValueError(f"errors must be 'raise' or 'coerce', not "
+                             f"{errors}")
+
+        kvp = np.asarray(kvp, dtype=float)
+
+        # Join the events onto the table groups
+        segment = self.groups.get_indexer(_group_index(model, plane, cu, al))
+        found = segment >= 0
+        segment = np.maximum(segment, 0)
+
+        if interpolate:
+            lower, upper, weight, inside = self.kvp.bracket(segment, kvp)
+            output = (1 - weight) * self.values[lower] + \
+                weight * self.values[upper]
+        else:
+            kvp = np.round(kvp)
+            ind = self.kvp.nearest(segment, kvp)
+            inside = self.kvp.values[ind] == kvp
+            output = self.values[ind].astype(float)
+
+        found &= inside
+        if np.all(found):
+            return output
+
+        if errors == 'coerce':
+            return np.where(found, output, np.nan)
+
+        event = np.flatnonzero(~found)[0]
+        raise ValueError(
+            f"No tabulated {self.name} for device model "
+            f"{np.asarray(model)[event]}, {np.asarray(plane)[event]}, "
+            f"{np.asarray(cu)[event]} mmCu and {np.asarray(al)[event]} mmAl "
+            f"at {kvp[event]} kV")
+
+
+class SortedSegments:
+    """Sorted segments of tabulated values, for nearest neighbour search.
+
+    A tabulated dependent variable, e.g. HVL in the KS table, is sorted
+    within each segment of the independent variables, e.g. each (field side
+    length, kVp). Each segment is shifted past all earlier segments, so that
+    a single searchsorted over all tabulated values finds the nearest value
+    within the segment of each query.
+
+    Attributes
+    ----------
+    values : np.array
+        Tabulated values, sorted within each segment.
+    start : np.array
+        Index of the first value of each segment.
+    end : np.array
+        Index past the last value of each segment.
+
+    """
+
+    def __init__(self, values: np.array, counts: np.array):
+
+        counts = np.asarray(counts)
+
+        self.values = _read_only(np.asarray(values, dtype=float))
+        self.end = _read_only(np.cumsum(counts))
+        self.start = _read_only(self.end - counts)
+
+        self._low = self.values.min()
+        self._span = self.values.max() - self._low + 1
+        self._keys = _read_only(self.values - self._low + np.repeat(
+            np.arange(len(counts)), counts) * self._span)
+
+    def _search(self, segment: np.array, x: np.array, side: str
+                ) -> Tuple[np.array, np.array]:
+        """Indices below and above x, clipped to the segment of each x."""
+        x = np.clip(x, self._low, self._low + self._span - 1)
+        pos = np.searchsorted(self._keys, x - self._low + segment * self._span,
+                              side=side)
+
+        first = self.start[segment]
+        last = self.end[segment] - 1
+
+        return np.clip(pos - 1, first, last), np.clip(pos, first, last)
+
+    def nearest(self, segment: np.array, x: np.array) -> np.array:
+        """Index of the value nearest to x, within the segment of each x.
+
+        Parameters
+        ----------
+        segment : np.array
+            Segment of each query.
+        x : np.array
+            Query values.
+
+        Returns
+        -------
+        np.array
+            Index in values, ties select the lower value.
+
+        """
+        lower, upper = self._search(segment, x, side='left')
+
+        return np.where(np.abs(self.values[upper] - x) <
+                        np.abs(self.values[lower] - x), upper, lower)
+
+    def bracket(self, segment: np.array, x: np.array
+                ) -> Tuple[np.array, np.array, np.array, np.array]:
+        """Values around x within the segment of each x, for interpolation.
+
+        Parameters
+        ----------
+        segment : np.array
+            Segment of each query.
+        x : np.array
+            Query values.
+
+        Returns
+        -------
+        lower : np.array
+            Index in values of the largest value <= x.
+        upper : np.array
+            Index in values of the smallest value > x, or lower if x is the
+            last value of the segment.
+        weight : np.array
+            Linear interpolation weight of upper.
+        inside : np.array
+            True where x is within the range of the segment.
+
+        """
+        lower, upper = self._search(segment, x, side='right')
+
+        low = self.values[lower]
+        step = self.values[upper] - low
+        weight = np.divide(x - low, step, out=np.zeros(np.shape(x)),
+                           where=step > 0)
+        inside = (x >= self.values[self.start[segment]]) & \
+            (x <= self.values[self.end[segment] - 1])
+
+        return lower, upper, weight, inside
+
+
+def get_correction_store() -> CorrectionStore:
+    """Fetch the default correction store, loaded on first use.
+
+    Returns
+    -------
+    CorrectionStore
+        Store loaded from the compiled correction tables, shared by all
+        threads.
+
+    """
+    global _default_store
+
+    if _default_store is None:
+        with _default_store_lock:
+            # Loaded by another thread while waiting for the lock
+            if _default_store is None:
+                _default_store = CorrectionStore.from_compiled()
+
+    return _default_store
+
+
+def _read_only(values: np.array) -> np.array:
+    """Read-only array of values, copied unless it owns its memory."""
+    if values.flags.writeable and values.base is not None:
+        values = values.copy()
+    values.flags.writeable = False
+    return values
+
+
+def _column(table: Table, column: str) -> np.array:
+    values = np.asarray(table[column])
+    # String columns of DataFrames are object arrays, which can not be sorted
+    return values.astype(str) if values.dtype == object else values
+
+
+def _group_index(model: np.array, plane: np.array, cu: np.array,
+                 al: np.array) -> pd.MultiIndex:
+    return pd.MultiIndex.from_arrays([
+        np.asarray(model).astype(str), np.asarray(plane).astype(str),
+        np.asarray(cu, dtype=float), np.asarray(al, dtype=float)])
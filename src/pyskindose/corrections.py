@@ -2,9 +2,13 @@ import numpy as np
 import pandas as pd
 from scipy.interpolate import CubicSpline
 import scipy.interpolate
-from typing import List
+from typing import List, Optional, Union
 
-from .db_connect import db_connect
+from .backscatter import FSL_TAB, backscatter_factors
+from .beam_quality import BeamQuality, CorrectionMemo, get_correction_memo
+from .beam_quality import has_beam_quality
+from .correction_store import CorrectionStore, get_correction_store
+from .event_table import EventTable
 
 
 def calculate_k_isq(source: np.array, cells: np.array, dref: float
@@ -37,7 +41,9 @@ def calculate_k_isq(source: np.array, cells: np.array, dref: float
     return np.square(dref / np.linalg.norm(cells - source, axis=0))
 
 
-def calculate_k_bs(data_norm: pd.DataFrame) -> List[CubicSpline]:
+def calculate_k_bs(data_norm: Union[pd.DataFrame, EventTable],
+                   memo: Optional[CorrectionMemo] = None
+                   ) -> List[CubicSpline]:
     """Calculate backscatter correction.
 
     This function calculates the backscatter correction factor
@@ -45,12 +51,22 @@ def calculate_k_bs(data_norm: pd.DataFrame) -> List[CubicSpline]:
     The function uses the non-linear interpolation method presented by
     Benmakhlouf et al. in the article "Influence of phantom thickness and
     material on the backscatter factors for diagnostic x-ray beam dosimetry",
-    [doi:10.1088/0031-9155/58/2/247]
+    [doi:10.1088/0031-9155/58/2/247]. See backscatter.Backscatter for
+    evaluation of many events at once.
+
+    If data_norm holds the beam quality columns, see
+    beam_quality.QUALITY_COLUMNS, events of the same beam quality share one
+    interpolation object from the correction memo. Otherwise, they are
+    calculated from kVp and HVL of each event.
 
     Parameters
     ----------
-    data_norm : pd.DataFrame
-        RDSR data, normalized for compliance with PySkinDose.
+    data_norm : Union[pd.DataFrame, EventTable]
+        RDSR data, normalized for compliance with PySkinDose, or an
+        EventTable of it.
+    memo : CorrectionMemo, optional
+        Correction factors of each beam quality, by default the memo of the
+        default correction store.
 
     Returns
     -------
@@ -58,43 +74,25 @@ def calculate_k_bs(data_norm: pd.DataFrame) -> List[CubicSpline]:
         List of scipy cubic spline interpolation object for all events.
 
     """
-    # Tabulated field side length in cm
-    fsl_tab = [5, 10, 20, 25, 35]
-
-    # polynomial coefficents
-    c = np.array([
-        [+1.00870e+0, +9.29969e-1, +8.65442e-1, +8.58665e-1, +8.57065e-1],
-        [+2.35816e-3, +4.08549e-3, +5.36739e-3, +5.51579e-3, +5.55933e-3],
-        [-9.48937e-6, -1.66271e-5, -2.21494e-5, -2.27532e-5, -2.28004e-5],
-        [+1.03143e-1, +1.53605e-1, +1.72418e-1, +1.70826e-1, +1.66418e-1],
-        [-1.04881e-3, -1.45187e-3, -1.46088e-3, -1.38540e-3, -1.28180e-3],
-        [+3.59731e-6, +5.05312e-6, +5.17430e-6, +4.91192e-6, +4.53036e-6],
-        [-7.31303e-3, -9.32427E-3, -8.30138E-3, -7.64330e-3, -6.81574e-3],
-        [+7.93272E-5, +9.40568E-5, +7.13576E-5, +6.13126e-5, +4.94197e-5],
-        [-2.74296e-7, -3.28449e-7, -2.54885e-7, -2.21399e-7, -1.79074e-7]])
-
-    # Fetch kVp and HVL from data_norm
-    kvp = data_norm.kVp
-    hvl = data_norm.HVL
+    if has_beam_quality(data_norm):
+        if memo is None:
+            memo = get_correction_memo()
+        return [corrections.k_bs for corrections in memo.events(data_norm)]
 
     # Calculate k_bs for field side length [5, 10, 20, 25, 35] cm
     # This is eq. (8) in doi:10.1088/0031-9155/58/2/247.
-    bs_corr = (
-        [(c[0, :] + c[1, :] * kvp[event] + c[2, :] * np.square(kvp[event])) +
-         (c[3, :] + c[4, :] * kvp[event] + c[5, :] * np.square(kvp[event])) *
-         hvl[event] + (c[6, :] + c[7, :] * kvp[event] + c[8, :] *
-                       np.square(kvp[event])) * np.square(hvl[event])
-         for event in range(len(kvp))])
+    bs_corr = backscatter_factors(kvp=data_norm.kVp, hvl=data_norm.HVL)
 
     # Create interpolation object for bs_corr
-    bs_interp = [scipy.interpolate.CubicSpline(fsl_tab, bs_corr[event])
-                 for event in range(len(kvp))]
+    bs_interp = [scipy.interpolate.CubicSpline(FSL_TAB, bs_corr[event])
+                 for event in range(len(bs_corr))]
 
     return bs_interp
 
 
-def calculate_k_med(data_norm: pd.DataFrame, field_area: List[float],
-                    event: int) -> float:
+def calculate_k_med(data_norm: Union[pd.DataFrame, EventTable],
+                    field_area: List[float], event: int,
+                    memo: Optional[CorrectionMemo] = None) -> np.array:
     """Calculate medium correction.
 
     This function calculates and appends the medium correction factor
@@ -103,72 +101,85 @@ def calculate_k_med(data_norm: pd.DataFrame, field_area: List[float],
     energy-absorption coefficient ratios for surface dose determination in
     diagnostic radiology".
 
+    If data_norm holds the beam quality columns, see
+    beam_quality.QUALITY_COLUMNS, the tabulated k_med of the beam quality is
+    fetched from the correction memo. Otherwise, it is looked up from the
+    kVp and HVL of the event.
+
     Parameters
     ----------
-    data_norm : pd.DataFrame
-        RDSR data, normalized for compliance with PySkinDose.
+    data_norm : Union[pd.DataFrame, EventTable]
+        RDSR data, normalized for compliance with PySkinDose, or an
+        EventTable of it.
     field_area : List[float]
         X-ray field area in (cm^2) for each phantom skin cell that are hit by
         X-ray the beam.
     event : int
         Irradiation event index.
+    memo : CorrectionMemo, optional
+        Correction factors of each beam quality, by default the memo of the
+        default correction store.
 
     Returns
     -------
-    float
+    np.array
         Medium correction k_med for all cells that are hit by the beam.
 
     """
-    # Tabulated field side length in cm
-    fsl_tab = [5, 10, 20, 25, 35]
-
-    # Fetch kVp and HVL from data_norm
-    kvp = data_norm.kVp[event]
-    hvl = data_norm.HVL[event]
+    if not has_beam_quality(data_norm):
+        return calculate_k_med_batch(kvp=data_norm.kVp[event],
+                                     hvl=data_norm.HVL[event],
+                                     field_area=field_area)
 
-    # Calculate mean side length for all cells that are hit by the beam.
-    # This field size dependance of k_med is negligible (<= 1%), therefore,
-    # independep field size resolution is omitted for computational speed.
-    fsl_mean = np.mean(np.sqrt(field_area))
+    if memo is None:
+        memo = get_correction_memo()
 
-    # Select the closest available tabulated field size length.
-    fsl = min(fsl_tab, key=lambda x: abs(x - fsl_mean))
+    corrections = memo.get(BeamQuality.of_event(data_norm, event))
 
-    # Connect to database
-    conn = db_connect()[0]
+    return memo.k_med(corrections, np.sqrt(field_area))
 
-    # Fetch k_med = f(kVp, HVL) from database. This is table 2 in
-    # [doi:10.1088/0031-9155/58/2/247]
-    df = pd.read_sql_query("""SELECT kvp_kV, hvl_mmAl, field_side_length_cm,
-                           mu_en_quotient FROM ks_table_concatenated""", conn)
 
-    conn.commit()
-    conn.close()
+def calculate_k_med_batch(kvp: np.array, hvl: np.array,
+                          field_area: np.array,
+                          store: Optional[CorrectionStore] = None
+                          ) -> np.array:
+    """Calculate medium correction for skin cells of any number of events.
 
-    # Fetch kVp entries from table
-    kvp_data = df.loc[(df['field_side_length_cm'] == fsl), "kvp_kV"]
-    # Select closest tabulated kVp (strongest dependence for k_med)
-    kvp_round = min(kvp_data, key=lambda x: abs(x - kvp))
+    The medium correction of each skin cell is the tabulated entry nearest
+    to the kVp, HVL and field side length at the cell, see
+    CorrectionStore.k_med. The parameters are broadcast against each other,
+    so that the cells of several events can be corrected in one call by
+    repeating the kVp and HVL of each event for its cells.
 
-    # Fetch HVL entries from table
-    hvl_data = df.loc[
-        (df['field_side_length_cm'] == fsl) & (df['kvp_kV'] == kvp_round),
-        "hvl_mmAl"]
+    Parameters
+    ----------
+    kvp : np.array
+        Tube peak voltage in kV, of the event of each cell.
+    hvl : np.array
+        HVL in mmAl, of the event of each cell.
+    field_area : np.array
+        X-ray field area in (cm^2) at each skin cell.
+    store : CorrectionStore, optional
+        Correction tables, by default the store of the corrections database.
 
-    # Select closest tabulated HVL (second strongest dependence for k_med)
-    hvl_round = min(hvl_data, key=lambda x: abs(x - hvl))
+    Returns
+    -------
+    np.array
+        Medium correction k_med for each skin cell.
 
-    # Fetch corresponding k_med
-    k_med = float(
-        df.loc[(df['hvl_mmAl'] == hvl_round) & (df['kvp_kV'] == kvp_round) &
-               (df['field_side_length_cm'] == fsl), "mu_en_quotient"])
+    """
+    if store is None:
+        store = get_correction_store()
 
-    return k_med
+    # Fetch k_med = f(kVp, HVL, field side length) from the KS table. This is
+    # table 2 in [doi:10.1088/0031-9155/58/2/247]
+    return store.k_med(kvp=kvp, hvl=hvl, fsl=np.sqrt(field_area))
 
 
 def calculate_k_tab(data_norm: pd.DataFrame,
                     estimate_k_tab: bool = False,
-                    k_tab_val: float = 0.8) -> List[float]:
+                    k_tab_val: float = 0.8,
+                    memo: Optional[CorrectionMemo] = None) -> List[float]:
     """Fetches table correction factor from database.
 
     This function fetches measured table correction factor as a function of
@@ -183,40 +194,38 @@ def calculate_k_tab(data_norm: pd.DataFrame,
         Set to True to use estimated table correction, default is False.
     k_tab_val: float
         Value of estimated table corrections, must be in range (0, 1).
+    memo : CorrectionMemo, optional
+        Correction factors of each beam quality, by default the memo of the
+        default correction store.
 
     Returns
     -------
     List[float]
         List of table correction factor for all events in procedure.
+
+    Raises
+    ------
+    ValueError
+        If no table transmission is tabulated for the device model, plane,
+        filtration or kVp of an event.
+
     """
 
     if estimate_k_tab:
         return [k_tab_val] * len(data_norm)
 
-    # Connect to database
-    [conn, c] = db_connect()
-
-    k_tab = [1.0] * len(data_norm)
-
-    # For every irradiation event
-    for event in range(len(data_norm)):
-
-        # Set paramets for fetching table transmission correction factor.
-        params = (round(data_norm.kVp[event]),  # kVp, rounded to nearest integer
-                  data_norm.filter_thickness_Cu[event],  # Filter thickness Cu
-                  data_norm.filter_thickness_Al[event],  # Filter thicknes Al
-                  data_norm.model[event],  # device model
-                  data_norm.acquisition_plane[event],)  # acquisition plane
-
-        # Fetch k_tab
-        c.execute('SELECT k_patient_support FROM table_transmission WHERE \
-                   kVp_kV=? AND AddedFiltration_mmCu=? AND \
-                   AddedFiltration_mmAl=? AND DeviceModel=? AND \
-                   AcquisitionPlane=?', params)
+    if memo is None:
+        memo = get_correction_memo()
 
-        k_tab[event] = c.fetchone()[0]
+    # Table transmission as a function of kVp (rounded to nearest integer),
+    # filtration, device model and acquisition plane, for all events
+    k_tab = [corrections.k_tab for corrections in memo.events(data_norm)]
 
-    conn.commit()
-    conn.close()
+    if None in k_tab:
+        # Look up the events again, to raise an error naming the beam quality
+        memo.store.k_tab(model=data_norm.model,
+                         plane=data_norm.acquisition_plane, kvp=data_norm.kVp,
+                         cu=data_norm.filter_thickness_Cu,
+                         al=data_norm.filter_thickness_Al)
 
     return k_tab
@@ -2,15 +2,19 @@ import os
 import sqlite3
 import pandas as pd
 
+# Default database, next to the package rather than in the working directory
+DEFAULT_DB = os.path.join(os.path.dirname(__file__), 'corrections.db')
 
-def db_connect(db_name: str = 'corrections.db'):
+
+def db_connect(db_name: str = DEFAULT_DB):
     """Set up the database connection with tables needed for PSD calculations.
 
     Parameters
     ----------
     db_name : str, optional
         The name of/path to the sqlite3 database to connect to
-        and if it doesn't exist, create, by default 'corrections.db'
+        and if it doesn't exist, create, by default corrections.db in the
+        package directory
 
     Returns
     -------
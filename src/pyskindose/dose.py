@@ -3,9 +3,9 @@ from datetime import datetime as dt
 import logging
 import os
 import pandas as pd
-import pydicom as dicom
 
 from . import settings
+from .parse_data import read_rdsr
 
 
 def skin_dose(file_path: str, print_result: bool=False, verbose: bool=False, save2db: bool=False):
@@ -26,7 +26,7 @@ def skin_dose(file_path: str, print_result: bool=False, verbose: bool=False, sav
 
     # Import DICOM file
     log.debug('Import DICOM file')
-    ds = dicom.read_file(file_path)
+    ds = read_rdsr(file_path)
 
     # parse RDSR data in DICOM file ds, return PE (=Parsed Data) in pandas DataFrame.
     # Return device name as a string in model
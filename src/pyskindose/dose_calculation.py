@@ -0,0 +1,251 @@
+from functools import partial
+import numpy as np
+import pandas as pd
+from typing import Iterable, Optional
+
+from .backscatter import Backscatter
+from .backscatter import QuantizedBackscatter
+from .beam_class import Beam
+from .beam_class import BeamBatch
+from .beam_quality import CorrectionMemo, get_correction_memo
+from .corrections import calculate_k_med
+from .corrections import calculate_k_tab
+from .event_table import EventTable
+from .geom_calc import cell_geometry
+from .geom_calc import check_table_hits
+from .geom_calc import fetch_hvl
+from .geom_calc import slab_thickness
+from .geometry_cache import EventGeometry
+from .geometry_cache import GeometryCache
+from .phantom_class import Phantom
+from .rotational_dose import DEFAULT_ROTATION_TOLERANCE
+from .rotational_dose import calculate_rotational_dose
+
+
+def calculate_dose(events: Iterable[pd.DataFrame], patient: Phantom,
+                   table: Phantom, pad: Phantom, estimate_k_tab: bool = False,
+                   k_tab_val: float = 0.8,
+                   rotation_tolerance: float = DEFAULT_ROTATION_TOLERANCE,
+                   k_bs_step: Optional[float] = None,
+                   geometry_tolerance: Optional[float] = None,
+                   geometry_angle_tolerance: Optional[float] = None,
+                   memo: Optional[CorrectionMemo] = None,
+                   verbose: bool = True) -> np.array:
+    """Calculate the skin dose map of a procedure.
+
+    The irradiation events are consumed batch by batch, so that events can
+    be streamed directly from iter_rdsr_events. A fully normalized procedure
+    can be passed as a single batch, i.e. events=[data_norm]. Only the dose
+    map and a bounded cache of the hit skin cells and geometry corrections
+    of each beam geometry are kept between events, so memory use does not
+    grow with the number of events. Repeated geometries are calculated once,
+    also when other projections are used in between.
+
+    Rotational acquisitions that have not been split into stationary
+    sub-events, i.e. that are normalized with split_rotations=False, are
+    calculated as a continuous beam sweep with calculate_rotational_dose.
+
+    The table correction k_tab is the transmission of table and pad at
+    normal incidence. For each skin cell behind the table, it is raised to
+    the path length of the beam through table and pad relative to their
+    thickness, i.e. k_tab ** (L / t), so that oblique beams are attenuated
+    more.
+
+    Parameters
+    ----------
+    events : Iterable[pd.DataFrame]
+        Batches of RDSR data, normalized for compliance with PySkinDose, each
+        indexed from 0.
+    patient : Phantom
+        Patient phantom, positioned with position_geometry.
+    table : Phantom
+        Table phantom, positioned with position_geometry.
+    pad : Phantom
+        Pad phantom, positioned with position_geometry.
+    estimate_k_tab : bool, optional
+        Set to True to use estimated table correction, default is False.
+    k_tab_val : float, optional
+        Value of estimated table corrections, must be in range (0, 1).
+    rotation_tolerance : float, optional
+        Relative error bound of the beam sweep integration of unsplit
+        rotational acquisitions, by default 1e-3.
+    k_bs_step : float, optional
+        Field side length step in cm of quantized backscatter lookup tables,
+        see QuantizedBackscatter. By default, the backscatter correction of
+        each skin cell is interpolated with a spline.
+    geometry_tolerance : float, optional
+        Quantization step in cm of the table displacements, field sizes and
+        source distances, so that events with nearly identical geometry
+        share the hit skin cells and geometry corrections of the first of
+        them, see GeometryCache. The dose error of shared geometries is not
+        bounded, so the default, exact matching, is the only safe choice.
+    geometry_angle_tolerance : float, optional
+        Quantization step in degrees of the angles PPA and PSA, see
+        geometry_tolerance. By default, angles are matched exactly.
+    memo : CorrectionMemo, optional
+        Correction factors of each beam quality, by default the memo of the
+        default correction store. The memo is thread-safe, so that dose
+        calculations in several threads, each with its own phantoms, can
+        share one memo.
+    verbose : bool, optional
+        Print the index of each calculated event, default is True.
+
+    Returns
+    -------
+    np.array
+        Skin dose in mGy, for each of the patient phantom skin cells.
+
+    """
+    dose_map = np.zeros(len(patient.r))
+    event_nr = 0
+
+    # Hit skin cells and geometry dependent corrections of each geometry,
+    # shared by all batches
+    geometry_cache = GeometryCache(tolerance=geometry_tolerance,
+                                   angle_tolerance=geometry_angle_tolerance)
+
+    # Thickness of table and pad, i.e. path length at normal incidence
+    normal_thickness = slab_thickness(table) + slab_thickness(pad)
+
+    if verbose:
+        print('Calculating event: ')
+
+    # Correction factors of each beam quality, shared by all batches
+    if memo is None:
+        memo = get_correction_memo()
+
+    for data_norm in events:
+
+        # Append HVL for all events to data_norm
+        fetch_hvl(data_norm, memo=memo)
+        # Compact copy of the batch, for fast access to single values in the
+        # event loop
+        event_table = EventTable(data_norm)
+        # Backscatter correction k_bs=f(field_size) for all events, with one
+        # spline per unique beam quality
+        backscatter = Backscatter(kvp=event_table.kVp, hvl=event_table.HVL)
+        if k_bs_step is not None:
+            backscatter = QuantizedBackscatter(backscatter, step=k_bs_step)
+        # Calculate table correction factors
+        k_tab = calculate_k_tab(data_norm, estimate_k_tab=estimate_k_tab,
+                                k_tab_val=k_tab_val, memo=memo)
+        # Unsplit rotational acquisitions, calculated as a beam sweep
+        sweep = _is_sweep(data_norm)
+
+        # Geometry key of each event, and the first stationary event of each
+        # geometry that is not cached
+        keys = geometry_cache.keys(event_table)
+        first = {}
+        for event in np.flatnonzero(~sweep):
+            if keys[event] not in geometry_cache:
+                first.setdefault(keys[event], event)
+        first = np.array(list(first.values()), dtype=int)
+        first_events = set(first.tolist())
+
+        # Beams of all events, and the skin cells hit by the beam of each
+        # first event, checked chunk by chunk as the events are calculated
+        beams = BeamBatch(event_table)
+        first_hits = beams.iter_hits(patient, events=first)
+
+        # For each irradiation event
+        for event in range(0, len(event_table)):
+            event_nr += 1
+            if verbose:
+                print(event_nr)
+
+            if sweep[event]:
+                sweep_hits, sweep_dose, sweep_area = \
+                    calculate_rotational_dose(
+                        event_table, event, patient=patient, table=table,
+                        bs_interp=partial(backscatter, event=event),
+                        k_tab=k_tab[event],
+                        tolerance=rotation_tolerance, pad=pad)
+
+                if len(sweep_hits):
+                    # Calculate medium correction, at the mean field area
+                    # of each cell during the sweep
+                    k_med = calculate_k_med(event_table, sweep_area, event,
+                                            memo=memo)
+                    dose_map[sweep_hits] += sweep_dose * k_med
+                continue
+
+            # Calculate the geometry, unless an event with the same geometry
+            # parameters has been calculated before
+            geometry = geometry_cache.get(keys[event])
+            if geometry is None:
+                # Hits of a geometry dropped from the cache are rechecked
+                hits = next(first_hits) if event in first_events else \
+                    beams.check_hit(patient, events=[event])[0]
+                geometry = geometry_cache.add(keys[event], _event_geometry(
+                    event_table, event, beam=beams.beam(event, reference=True),
+                    hits=hits, patient=patient, table=table, pad=pad,
+                    normal_thickness=normal_thickness))
+
+            if not len(geometry.hits):
+                continue
+
+            # Interpolate backscatter factor to actual cell field sizes
+            k_bs = backscatter(geometry.fsl, event)
+
+            # Calculate reference point medium correction (air -> water)
+            k_med = calculate_k_med(event_table, geometry.field_area, event,
+                                    memo=memo)
+
+            # Calculate event skin dose by appending each of the correction
+            # factors to the reference point air kerma.
+            event_dose = event_table.K_IRP[event] * geometry.k_isq * k_med * \
+                k_bs
+
+            # Table and pad transmission, attenuated along the oblique path
+            # of each beam through the slabs
+            table_hits = geometry.table_hits
+            temp = np.ones(len(table_hits))
+            temp[table_hits] = k_tab[event] ** geometry.table_path[table_hits]
+            event_dose *= temp
+
+            # Add event dose to procedure dosemap
+            dose_map[geometry.hits] += event_dose
+
+    return dose_map
+
+
+def _event_geometry(event_table: EventTable, event: int, beam: Beam,
+                    hits: np.array, patient: Phantom, table: Phantom,
+                    pad: Phantom, normal_thickness: float) -> EventGeometry:
+    """Calculate the geometry dependent quantities of the hit skin cells.
+
+    The beam is given relative to the phantoms in their reference position,
+    see BeamBatch.beam, so that the phantoms are never moved.
+    """
+    cells = patient.r_ref[hits]
+
+    # Check which skin cells need table correction, and the path length
+    # through table and pad of their beams
+    table_hits, table_path = check_table_hits(
+        source=beam.r[0, :], table=table, beam=beam, cells=cells, pad=pad,
+        path_length=True, table_offset=np.zeros(3))
+
+    # Path length relative to normal incidence, at which the table
+    # transmission is measured
+    if normal_thickness > 0:
+        table_path /= normal_thickness
+
+    # Calculate inverse-square law fluence correction, and X-ray field area
+    # and side length at the location of each skin cell
+    k_isq, field_area, fsl = cell_geometry(
+        source=beam.r[0, :], cells=cells, dref=event_table.DSIRP[event],
+        d_detector=event_table.DSD[event],
+        field_area_ref=event_table.FS_lat[event] * event_table.FS_long[event])
+
+    return EventGeometry(hits=hits, table_hits=table_hits,
+                         table_path=table_path, k_isq=k_isq,
+                         field_area=field_area, fsl=fsl)
+
+
+def _is_sweep(data_norm: pd.DataFrame) -> np.array:
+    """Find rotational acquisitions that are not split into sub-events."""
+    if "PPA_end" not in data_norm.columns:
+        return np.zeros(len(data_norm), dtype=bool)
+
+    return ((data_norm.acquisition_type == "Rotational Acquisition") &
+            data_norm.PPA_end.notna()).to_numpy()
@@ -0,0 +1,65 @@
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+
+
+class EventTable:
+    """Compact, read-only table of normalized irradiation events.
+
+    Indexing a pandas Series for a single value, e.g. data_norm.DSI[event],
+    costs tens of microseconds, which adds up to more than the geometry
+    calculations for procedures with many short fluoroscopy events. The
+    EventTable holds all numeric columns of data_norm in one NumPy structured
+    array of float fields, with one record per event, and exposes each field
+    as an attribute. Column access follows data_norm, so that
+    table.DSI[event] and table["DSI"][event] can be used wherever
+    data_norm.DSI[event] is used, at the cost of an array lookup.
+
+    Non-numeric columns, e.g. model and acquisition_type, are kept as object
+    arrays.
+
+    Attributes
+    ----------
+    records : np.array
+        Structured array with one float64 field per numeric column.
+    columns : List[str]
+        Column names, in the order of data_norm.
+
+    """
+
+    def __init__(self, data_norm: pd.DataFrame):
+
+        self.columns: List[str] = list(data_norm.columns)
+        self._arrays: Dict[str, np.array] = dict()
+
+        numeric = [column for column in self.columns
+                   if data_norm[column].dtype.kind in 'biuf']
+
+        self.records = np.empty(len(data_norm), dtype=[
+            (column, np.float64) for column in numeric])
+
+        for column in self.columns:
+            if column in numeric:
+                self.records[column] = data_norm[column].to_numpy()
+                values = self.records[column]
+            else:
+                values = data_norm[column].to_numpy(dtype=object, copy=True)
+
+            values.flags.writeable = False
+            self._arrays[column] = values
+
+        self.records.flags.writeable = False
+
+        # Columns as plain instance attributes, for the fastest lookup
+        for column, values in self._arrays.items():
+            if column not in vars(self):
+                setattr(self, column, values)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, column: str) -> np.array:
+        return self._arrays[column]
+
+    def __contains__(self, column: Any) -> bool:
+        return column in self._arrays
@@ -1,9 +1,15 @@
 import numpy as np
 import pandas as pd
-from typing import List, Any
+from typing import List, Any, Optional, Tuple, Union
 
-from .db_connect import db_connect
+from .beam_quality import CorrectionMemo, get_correction_memo
+from .event_table import EventTable
 from .phantom_class import Phantom
+from .spatial_index import CellGrid
+
+# RDSR parameters that defines the irradiation geometry of an event
+GEOMETRY_PARAMETERS = ['dLAT', 'dLONG', 'dVERT', 'FS_lat', 'FS_long', 'PPA',
+                       'PSA']
 
 
 def position_geometry(patient: Phantom, table: Phantom, pad: Phantom,
@@ -53,6 +59,10 @@ def position_geometry(patient: Phantom, table: Phantom, pad: Phantom,
     pad.save_position()
     patient.save_position()
 
+    # Index the skin cells at the reference position, the beam hit checks
+    # account for the table displacement of each event
+    patient.cell_grid = CellGrid(patient.r_ref)
+
 
 def vector(start: np.array, stop: np.array, normalization=False) -> np.array:
     """Create a vector between two points in carthesian space.
@@ -90,8 +100,9 @@ def vector(start: np.array, stop: np.array, normalization=False) -> np.array:
     return vec
 
 
-def scale_field_area(data_norm: pd.DataFrame, event: int, patient: Phantom,
-                     hits: List[bool], source: np.array) -> List[float]:
+def scale_field_area(data_norm: Union[pd.DataFrame, EventTable], event: int,
+                     patient: Phantom, hits: np.array,
+                     source: np.array) -> np.array:
     """Scale X-ray field area from image detector, to phantom skin cells.
 
     This function scales the X-ray field size from the point where it is stated
@@ -103,116 +114,142 @@ def scale_field_area(data_norm: pd.DataFrame, event: int, patient: Phantom,
 
     Parameters
     ----------
-    data_norm : pd.DataFrame
-        RDSR data, normalized for compliance with PySkinDose.
+    data_norm : Union[pd.DataFrame, EventTable]
+        RDSR data, normalized for compliance with PySkinDose, or an
+        EventTable of it.
     event : int
         Irradiation event index.
     patient : Phantom
         Patient phantom, i.e. instance of class Phantom.
-    hits : List[bool]
-        A boolean list of the same length as the number of patient skin
-        cells. True for all entrance skin cells that are hit by the beam for a
-        specific irradiation event.
+    hits : np.array
+        Index array of all entrance skin cells that are hit by the beam for a
+        specific irradiation event, see Beam.check_hit. A boolean mask over
+        all patient skin cells works as well.
     source : np.array
         (x,y,z) coordinates to the X-ray source
 
     Returns
     -------
-    List[float]
+    np.array
         X-ray field area in (cm^2) for each phantom skin cell that are hit by
         X-ray the beam
 
     """
-    # Fetch reference distance for field size scaling,
-    # i.e. distance source to detector
-    d_ref = data_norm.DSD[event]
-
-    cells = patient.r[hits]
-
-    # Calculate distance scale factor
-    scale_factor = [np.linalg.norm(cell - source) / d_ref for cell in cells]
-
-    # Fetch field side lenth lateral and longitudinal at detector plane
     # Fetch field area at image detector plane
     field_area_ref = data_norm.FS_lat[event] * data_norm.FS_long[event]
 
-    # Calculate field area at distance source to skin cell for all cells
-    # that are hit by the beam.
-    field_area = [round(field_area_ref * np.square(scale), 1)
-                  for scale in scale_factor]
+    # Field area at the distance source to skin cell for all cells that are
+    # hit by the beam, scaled from the distance source to detector
+    _, field_area, _ = cell_geometry(
+        source=source, cells=patient.r[hits], dref=data_norm.DSIRP[event],
+        d_detector=data_norm.DSD[event], field_area_ref=field_area_ref)
 
     return field_area
 
 
-def fetch_hvl(data_norm: pd.DataFrame) -> None:
-    """Add event HVL to RDSR event data from database.
+def cell_geometry(source: np.array, cells: np.array, dref: float,
+                  d_detector: float, field_area_ref: float,
+                  out: Optional[Tuple[np.array, np.array, np.array]] = None
+                  ) -> Tuple[np.array, np.array, np.array]:
+    """Calculate the geometry dependent quantities of all hit skin cells.
+
+    The distance from the X-ray source to each skin cell is calculated once,
+    and the inverse-square law correction, see calculate_k_isq, and the
+    X-ray field area and side length at the skin cell, see
+    scale_field_area, are derived from it. All arithmetic is done in place
+    in the output arrays, so that no temporary arrays are allocated when
+    out is given.
 
     Parameters
     ----------
-    data_norm : pd.DataFrame
-        RDSR data, normalized for compliance with PySkinDose.
+    source : np.array
+        (x,y,z) coordinates to the X-ray source.
+    cells : np.array
+        (x,y,z) coordinates of each skin cell that is hit by the beam, of
+        shape (cells, 3).
+    dref : float
+        Reference distance source to IRP, i.e. the distance at which the IRP
+        air kerma is stated.
+    d_detector : float
+        Distance source to image detector, i.e. the distance at which the
+        field area is stated.
+    field_area_ref : float
+        X-ray field area in (cm^2) at the image detector plane.
+    out : Tuple[np.array, np.array, np.array], optional
+        Arrays of shape (cells,) to store k_isq, field area and field side
+        length in, e.g. views of buffers that are reused between events.
 
     Returns
     -------
-    None
-        This function appends event specific HVL (mmAl) as a function of device
-        model, kVp, and copper- and aluminum filtration to the normalized RDSR
-        data in data_norm.
+    Tuple[np.array, np.array, np.array]
+        Inverse-square law correction k_isq, field area in (cm^2), rounded
+        to 0.1 cm^2, and field side length in cm, of each skin cell.
+
+    Raises
+    ------
+    ValueError
+        If the arrays in out are not of shape (cells,).
 
     """
-    # Open connection to database
-    conn = db_connect()[0]
+    if out is None:
+        out = tuple(np.empty(len(cells)) for _ in range(3))
+    elif any(np.shape(array) != (len(cells),) for array in out):
+        raise ValueError("out must hold three arrays of shape (cells,)")
 
-    # Fetch entire HVL table
-    hvl_data = pd.read_sql_query("SELECT * FROM HVL_simulated", conn)
+    k_isq, field_area, fsl = out
 
-    hvl = [float(hvl_data.loc[
-        (hvl_data['DeviceModel'] == data_norm.model[event]) &
-        (hvl_data['kVp_kV'] == round(data_norm.kVp[event])) &
-        (hvl_data['AddedFiltration_mmCu'] ==
-         data_norm.filter_thickness_Cu[event]), "HVL_mmAl"])
-           for event in range(len(data_norm))]
+    # Squared distance source to skin cell, summed over the coordinate axes
+    # in field_area, with fsl as work array
+    np.subtract(cells[:, 0], source[0], out=field_area)
+    np.square(field_area, out=field_area)
+    for axis in (1, 2):
+        np.subtract(cells[:, axis], source[axis], out=fsl)
+        np.square(fsl, out=fsl)
+        field_area += fsl
 
-    # Append HVL data to data_norm
-    data_norm["HVL"] = hvl
+    # Inverse-square law correction from the IRP to the skin cell
+    np.divide(dref ** 2, field_area, out=k_isq)
 
-    # close database connection
-    conn.commit()
-    conn.close()
+    # Field area scales with the squared distance from the source
+    field_area *= field_area_ref / d_detector ** 2
+    np.round(field_area, 1, out=field_area)
+    np.sqrt(field_area, out=fsl)
 
+    return k_isq, field_area, fsl
 
-def check_new_geometry(data_norm: pd.DataFrame) -> List[bool]:
-    """Check which events has unchanged geometry since the event before.
 
-    This function is intented to calculate if new geometry parameters needs
-    to be calculated, i.e., new beam, geometry positioning, field area and
-    cell hit calculation.
+def fetch_hvl(data_norm: pd.DataFrame,
+              memo: Optional[CorrectionMemo] = None) -> None:
+    """Add event HVL to RDSR event data from database.
 
     Parameters
     ----------
     data_norm : pd.DataFrame
         RDSR data, normalized for compliance with PySkinDose.
+    memo : CorrectionMemo, optional
+        Correction factors of each beam quality, by default the memo of the
+        default correction store.
 
     Returns
     -------
-    List[bool]
-        List of booleans where True[event] means that the event has updated
-        geometry since the preceding irradiation event.
-
-    """
-    # List all RDSR parameters that contains geometry parameters.
-    geom_params = data_norm[['dLAT', 'dLONG', 'dVERT', 'FS_lat',
-                             'FS_long', 'PPA', 'PSA']]
+    None
+        This function appends event specific HVL (mmAl) as a function of device
+        model, acquisition plane, kVp, and copper- and aluminum filtration to
+        the normalized RDSR data in data_norm.
 
-    # check which event has the same parameters as the previous
-    same_geometry = [geom_params.iloc[event].equals(
-        geom_params.iloc[event - 1]) for event in range(1, len(geom_params))]
+    Raises
+    ------
+    ValueError
+        If no HVL is tabulated for the device model, plane, filtration or kVp
+        of an event.
 
-    # insert false to first event
-    same_geometry.insert(0, False)
+    """
+    if memo is None:
+        memo = get_correction_memo()
 
-    # return inverted list, to get correct output
-    return [not event for event in same_geometry]
+    # Append HVL data to data_norm
+    data_norm["HVL"] = [corrections.hvl
+                        for corrections in memo.events(data_norm)]
 
 
 class Triangle:
@@ -269,6 +306,7 @@ class Triangle:
         ----------
         start : np.array
             Carthesian 3D coordinates to the starting point of the segment.
+            Note, can also be one starting point for each point in stop.
         stop : np.array
             Carthesian 3D coordinates to the end points of the segment. Note,
             can be several points, e.g, several skin cells.
@@ -317,8 +355,130 @@ class Triangle:
         return hits.tolist()
 
 
+def create_table_triangles(table: Phantom, offset: Optional[np.array] = None
+                           ) -> Tuple[Triangle, Triangle]:
+    """Create two triangles covering the surface of the support table.
+
+    Parameters
+    ----------
+    table : Phantom
+        Patient support table, i.e., instance of class phantom with
+        phantom_type="table"
+    offset : np.array, optional
+        Translation of the table from its reference position, see
+        Phantom.save_position, e.g. np.zeros(3) for the reference position.
+        By default, the current position of the table is used.
+
+    Returns
+    -------
+    Tuple[Triangle, Triangle]
+        The triangles spanning the "bottom left" and the "top right" part of
+        the support table (viewed from above).
+
+    """
+    r = table.r if offset is None else table.r_ref + offset
+
+    # Define edges of table (see illustration in project documentation)
+    a = r[6, :]
+    a1 = r[7, :]
+    a2 = r[5, :]
+
+    b = r[0, :]
+    b1 = r[5, :]
+    b2 = r[7, :]
+
+    # triangle spanning the "top right" part of the support table
+    # (viewed from above)
+    triangle_b_l = Triangle(p=a, p1=a1, p2=a2)
+    # triangle spanning the "bottom left" part of the support table
+    # (viewed from above)
+    triangle_t_r = Triangle(p=b, p1=b1, p2=b2)
+
+    return triangle_b_l, triangle_t_r
+
+
+def slab_thickness(phantom: Phantom) -> float:
+    """Thickness of the patient support table or pad.
+
+    Parameters
+    ----------
+    phantom : Phantom
+        Support table or pad, i.e., instance of class phantom with
+        phantom_type="table" or phantom_type="pad".
+
+    Returns
+    -------
+    float
+        Distance between the top and bottom surface of the slab, i.e. the
+        path length of a beam at normal incidence.
+
+    """
+    # Vertex 8 lies straight below (table) or above (pad) vertex 0
+    return float(np.linalg.norm(phantom.r[8, :] - phantom.r[0, :]))
+
+
+def slab_path_length(source: np.array, cells: np.array, slab: Phantom,
+                     offset: Optional[np.array] = None) -> np.array:
+    """Path length of beams through the patient support table or pad.
+
+    The table and pad are boxes with faces perpendicular to the room axes.
+    Each beam, from the X-ray source to a skin cell, is clipped against the
+    box with the slab method, so that beams leaving the box through a side,
+    e.g. at grazing angles near the table edge, get the length of their
+    actual chord.
+
+    Parameters
+    ----------
+    source : np.array
+        Carthesian 3D coordinates to the X-ray souce, either one source for
+        all skin cells or one source for each skin cell.
+    cells : np.array
+        Carthesian 3D coordinates to the skin cells.
+    slab : Phantom
+        Support table or pad, i.e., instance of class phantom with
+        phantom_type="table" or phantom_type="pad".
+    offset : np.array, optional
+        Translation of the slab from its reference position, in the frame
+        of source and cells, see create_table_triangles. By default, the
+        current position of the slab is used.
+
+    Returns
+    -------
+    np.array
+        Path length in cm through the slab of the beam to each skin cell,
+        zero for beams that miss the slab.
+
+    """
+    r = slab.r if offset is None else slab.r_ref + offset
+    lower, upper = r.min(axis=0), r.max(axis=0)
+
+    source = np.asarray(source, dtype=float)
+    direction = np.atleast_2d(cells) - source
+
+    # Ray parameters at the two planes bounding the box along each axis.
+    # Rays parallel to the planes are inside or outside for all parameters.
+    parallel = direction == 0
+    inside = (source >= lower) & (source <= upper)
+    step = np.where(parallel, 1.0, direction)
+    t_lower = (lower - source) / step
+    t_upper = (upper - source) / step
+    t_near = np.where(parallel, np.where(inside, -np.inf, np.inf),
+                      np.minimum(t_lower, t_upper))
+    t_far = np.where(parallel, np.where(inside, np.inf, -np.inf),
+                     np.maximum(t_lower, t_upper))
+
+    # Part of the box chord between the source and the skin cell
+    enter = np.clip(t_near.max(axis=-1), 0, 1)
+    leave = np.clip(t_far.min(axis=-1), 0, 1)
+
+    return np.maximum(leave - enter, 0) * np.linalg.norm(direction, axis=-1)
+
+
 def check_table_hits(source: np.array, table: Phantom, beam,
-                     cells: np.array) -> List[bool]:
+                     cells: np.array, pad: Optional[Phantom] = None,
+                     path_length: bool = False,
+                     table_offset: Optional[np.array] = None
+                     ) -> Union[List[bool], Tuple[np.array, np.array]]:
     """Check which skin cells are blocket by the patient support table.
 
     This fuctions creates two triangles covering the entire surface of the
@@ -326,6 +486,11 @@ def check_table_hits(source: np.array, table: Phantom, beam,
     table. This is conducted in order to be able to append table and pad
     correction factor k_(T+P) when required.
 
+    Optionally, the path length of each beam through the table and pad is
+    returned as well, see slab_path_length. The chord through the boxes is
+    used rather than the normal thickness over the direction cosine, which
+    overestimates the path of beams that leave through a side of the table.
+
     Parameters
     ----------
     source : np.array
@@ -338,39 +503,45 @@ def check_table_hits(source: np.array, table: Phantom, beam,
     cells : np.array
         List of skin cells to be controlled if the patient support table and
         pad blocks the beam before it reached the them.
+    pad : Phantom, optional
+        Patient support pad, i.e., instance of class phantom with
+        phantom_type="pad", included in the path length.
+    path_length : bool, optional
+        Set to True to also return the path length through table and pad,
+        default is False.
+    table_offset : np.array, optional
+        Translation of the table and pad from their reference position, in
+        the frame of source, beam and cells, see create_table_triangles. By
+        default, the current position of the table and pad is used.
 
     Returns
     -------
-    List[bool]
+    Union[List[bool], Tuple[np.array, np.array]]
         Boolean list of the statuses of each skin cell. True if the path from
         X-ray source to skin cell is blocked by the table (any of the two
         triangles), else false. Start points above triangle returns False,
         to not include hits where the table does not block the beam.
+        With path_length=True, a boolean array of the statuses, and the path
+        length in cm through table and pad of each skin cell, zero for cells
+        that are not blocked.
 
     """
     # Create triangles:
-
-    # Define edges of table (see illustration in project documentation)
-    a = table.r[6, :]
-    a1 = table.r[7, :]
-    a2 = table.r[5, :]
-
-    b = table.r[0, :]
-    b1 = table.r[5, :]
-    b2 = table.r[7, :]
-
-    # triangle spanning the "top right" part of the support table
-    # (viewed from above)
-    triangle_b_l = Triangle(p=a, p1=a1, p2=a2)
-    # triangle spanning the "bottom left" part of the support table
-    # (viewed from above)
-    triangle_t_r = Triangle(p=b, p1=b1, p2=b2)
-
-    # If over-table irradiation, return false for all points in cells
-    if np.dot(np.array([0, 0, 0]) - beam.r[0, :], triangle_b_l.n) < 0:
-        if cells.ndim == 1:
-            return [False]
-        return [False] * cells.shape[0]
+    triangle_b_l, triangle_t_r = create_table_triangles(table,
+                                                        offset=table_offset)
+
+    cells = np.asarray(cells)
+    nr_cells = 1 if cells.ndim == 1 else cells.shape[0]
+
+    # If over-table irradiation, return false for all points in cells. The
+    # beam central axis, from the source through the isocenter to the
+    # detector center, is the same in any translated frame.
+    central_axis = np.mean(beam.r[1:, :], axis=0) - beam.r[0, :]
+    if np.dot(central_axis, triangle_b_l.n) < 0:
+        hits = np.zeros(nr_cells, dtype=bool)
+        if path_length:
+            return hits, np.zeros(nr_cells)
+        return hits.tolist()
 
     # Check if beam vertices hits table on either of the triangles
     hit_t_r = triangle_t_r.check_intersection(start=source, stop=beam.r[1:, :])
@@ -379,17 +550,29 @@ def check_table_hits(source: np.array, table: Phantom, beam,
     # If all four beam verices hits the table, all cells are blocket by the
     # table, and all cells should be corrected for table and pad attenuation.
     if sum(hit_t_r + hit_b_l) == 4:
-        if cells.ndim == 1:
-            return [True]
-        return [True] * cells.shape[0]
+        hits = np.ones(nr_cells, dtype=bool)
 
     # Else, check individually for all skin cells that are hit by the beam
-    hit_t_r = triangle_t_r.check_intersection(start=source, stop=cells)
-    hit_b_l = triangle_b_l.check_intersection(start=source, stop=cells)
+    else:
+        hit_t_r = triangle_t_r.check_intersection(start=source, stop=cells)
+        hit_b_l = triangle_b_l.check_intersection(start=source, stop=cells)
 
-    hits = np.asarray([False] * len(cells))
-    # save results
-    hits[hit_t_r] = True
-    hits[hit_b_l] = True
+        hits = np.zeros(nr_cells, dtype=bool)
+        # save results
+        hits[hit_t_r] = True
+        hits[hit_b_l] = True
+
+    if not path_length:
+        return hits.tolist()
 
-    return hits.tolist()
+    # Path length through the table and pad boxes of the blocked beams
+    length = np.zeros(nr_cells)
+    if hits.any():
+        blocked = np.atleast_2d(cells)[hits]
+        length[hits] = slab_path_length(source, blocked, table,
+                                        offset=table_offset)
+        if pad is not None:
+            length[hits] += slab_path_length(source, blocked, pad,
+                                             offset=table_offset)
+
+    return hits, length
@@ -0,0 +1,239 @@
+from collections import OrderedDict
+from typing import Hashable, List, NamedTuple, Optional, Union
+import numpy as np
+import pandas as pd
+
+from .event_table import EventTable
+from .geom_calc import GEOMETRY_PARAMETERS
+
+# Default upper limit in bytes of the arrays held by a geometry cache
+DEFAULT_CACHE_BYTES = 256 * 2 ** 20
+
+# RDSR parameters that determine the irradiation geometry of an event,
+# including the source distances of the inverse-square law and field size
+# scaling, i.e. DSIRP and DSD, which are derived from DSI and DID
+GEOMETRY_KEY_PARAMETERS = GEOMETRY_PARAMETERS + ['DSI', 'DID']
+
+# Geometry key parameters in degrees, all others are in cm
+GEOMETRY_ANGLE_PARAMETERS = ['PPA', 'PSA']
+
+
+class EventGeometry(NamedTuple):
+    """Geometry dependent quantities of the skin cells hit by a beam.
+
+    All arrays are read-only, and hold one element for each hit skin cell,
+    except hits, which holds the indices of the hit cells.
+
+    Attributes
+    ----------
+    hits : np.array
+        Indices of the entrance skin cells hit by the beam, see
+        Beam.check_hit.
+    table_hits : np.array
+        True for the hit skin cells that are irradiated through the table.
+    table_path : np.array
+        Path length through table and pad, relative to their thickness.
+    k_isq : np.array
+        Inverse-square law correction.
+    field_area : np.array
+        X-ray field area in (cm^2) at the skin cell.
+    fsl : np.array
+        X-ray field side length in cm at the skin cell.
+
+    """
+
+    hits: np.array
+    table_hits: np.array
+    table_path: np.array
+    k_isq: np.array
+    field_area: np.array
+    fsl: np.array
+
+    @property
+    def nbytes(self) -> int:
+        """Total bytes of the arrays."""
+        return sum(array.nbytes for array in self)
+
+
+class GeometryCache:
+    """Bounded LRU cache of the geometry of the events of a procedure.
+
+    Events are keyed on their geometry parameters, see
+    GEOMETRY_KEY_PARAMETERS, so that repeated geometries are calculated
+    once, also when other projections are used in between. The least
+    recently used geometries are dropped when the arrays of the cache exceed
+    max_bytes.
+
+    With a tolerance, the distances and field sizes are rounded to multiples
+    of tolerance in cm, and with an angle_tolerance, the angles PPA and PSA
+    to multiples of angle_tolerance in degrees, before keying. Events with
+    nearly identical geometry then share the quantities calculated for the
+    first of them. Events sharing a key differ by less than one step in
+    each parameter, so that the shared beam is displaced by less than
+    tolerance, and rotated by less than angle_tolerance, i.e. by up to
+    angle_tolerance * pi / 180 * d at a distance d from the isocenter. Only
+    this error of the beam position is bounded. Skin cells within that
+    distance of the beam edge may be counted as hit or not hit, so the dose
+    of a cell may change by the full dose of the events sharing a key. For
+    the S1 example procedure on the human phantom, a step of 0.5 cm changes
+    the dose of single skin cells by up to 28% of the peak dose. Exact
+    matching, i.e. tolerances of None, is the only safe default.
+
+    The cached quantities depend on the phantoms, so a cache must only be
+    used for one procedure and phantom.
+
+    Attributes
+    ----------
+    tolerance : float
+        Quantization step in cm of the table displacements, field sizes and
+        source distances, or None for exact matching.
+    angle_tolerance : float
+        Quantization step in degrees of the angles PPA and PSA, or None for
+        exact matching.
+    max_bytes : int
+        Upper limit of the bytes of the cached arrays.
+    nbytes : int
+        Bytes of the cached arrays.
+    hits : int
+        Number of geometries returned from the cache.
+    misses : int
+        Number of geometries not found in the cache.
+
+    Methods
+    -------
+    keys(data_norm)
+        Cache key of each event.
+    get(key)
+        Cached geometry, or None.
+    add(key, geometry)
+        Cache the geometry of a key.
+    clear()
+        Drop all geometries and reset the counters.
+
+    """
+
+    def __init__(self, tolerance: Optional[float] = None,
+                 angle_tolerance: Optional[float] = None,
+                 max_bytes: int = DEFAULT_CACHE_BYTES):
+
+        if tolerance is not None and tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+
+        if angle_tolerance is not None and angle_tolerance <= 0:
+            raise ValueError("angle_tolerance must be positive")
+
+        self.tolerance = tolerance
+        self.angle_tolerance = angle_tolerance
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[Hashable, EventGeometry]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._cache
+
+    def keys(self, data_norm: Union[pd.DataFrame, EventTable]
+             ) -> List[Hashable]:
+        """Cache key of each event.
+
+        Parameters
+        ----------
+        data_norm : Union[pd.DataFrame, EventTable]
+            RDSR data, normalized for compliance with PySkinDose, or an
+            EventTable of it.
+
+        Returns
+        -------
+        List[Hashable]
+            Geometry parameters of each event, quantized by tolerance and
+            angle_tolerance.
+
+        """
+        values = np.column_stack([np.asarray(data_norm[column], dtype=float)
+                                  for column in GEOMETRY_KEY_PARAMETERS])
+
+        # Quantization step of each parameter, NaN for exact matching
+        steps = np.array([self.angle_tolerance
+                          if column in GEOMETRY_ANGLE_PARAMETERS
+                          else self.tolerance
+                          for column in GEOMETRY_KEY_PARAMETERS], dtype=float)
+        quantized = ~np.isnan(steps)
+        values[:, quantized] = np.rint(values[:, quantized] /
+                                       steps[quantized])
+
+        # Adding zero turns -0.0 into 0.0, so both give the same key
+        return [tuple(row) for row in (values + 0.0).tolist()]
+
+    def get(self, key: Hashable) -> Optional[EventGeometry]:
+        """Fetch the cached geometry of a key.
+
+        Parameters
+        ----------
+        key : Hashable
+            Cache key of an event, see keys.
+
+        Returns
+        -------
+        EventGeometry
+            Cached geometry, or None if not cached.
+
+        """
+        geometry = self._cache.get(key)
+
+        if geometry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._cache.move_to_end(key)
+
+        return geometry
+
+    def add(self, key: Hashable, geometry: EventGeometry) -> EventGeometry:
+        """Cache the geometry of a key.
+
+        Geometries larger than max_bytes are returned without caching.
+
+        Parameters
+        ----------
+        key : Hashable
+            Cache key of an event, see keys.
+        geometry : EventGeometry
+            Geometry of the event. The arrays are made read-only.
+
+        Returns
+        -------
+        EventGeometry
+            The geometry.
+
+        """
+        for array in geometry:
+            array.flags.writeable = False
+
+        if geometry.nbytes > self.max_bytes:
+            return geometry
+
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous.nbytes
+
+        self._cache[key] = geometry
+        self.nbytes += geometry.nbytes
+
+        # Drop the least recently used geometries
+        while self.nbytes > self.max_bytes:
+            _, dropped = self._cache.popitem(last=False)
+            self.nbytes -= dropped.nbytes
+
+        return geometry
+
+    def clear(self) -> None:
+        """Drop all cached geometries and reset the counters."""
+        self._cache.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
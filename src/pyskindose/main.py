@@ -1,23 +1,16 @@
 import argparse
-import numpy as np
 import os
-import pydicom
 from typing import Union, Optional
 
-from pyskindose.beam_class import Beam
-from pyskindose.corrections import calculate_k_bs
-from pyskindose.corrections import calculate_k_isq
-from pyskindose.corrections import calculate_k_med
-from pyskindose.corrections import calculate_k_tab
-from pyskindose.geom_calc import check_new_geometry
-from pyskindose.geom_calc import check_table_hits
-from pyskindose.geom_calc import fetch_hvl
+from pyskindose.dose_calculation import calculate_dose
 from pyskindose.geom_calc import position_geometry
-from pyskindose.geom_calc import scale_field_area
-from pyskindose.parse_data import rdsr_parser
-from pyskindose.parse_data import rdsr_normalizer
+from pyskindose.parse_data import iter_rdsr_events
+from pyskindose.parse_data import load_rdsr
+from pyskindose.parse_data import read_rdsr
 from pyskindose.phantom_class import Phantom
 from pyskindose.plots import plot_geometry
+from pyskindose.rdsr_cache import RDSRCache
+from pyskindose.rotational_dose import DEFAULT_ROTATION_TOLERANCE
 from pyskindose.settings import PyskindoseSettings
 
 PARSER = argparse.ArgumentParser()
@@ -38,6 +31,20 @@ PARAM_DEV = dict(
     estimate_k_tab=False,
     # Numeric value of estimated table correction
     k_tab_val=0.8,
+    # Directory for caching normalized RDSR data, or None to disable caching
+    rdsr_cache_dir=None,
+    # Relative error bound for rotational acquisitions calculated as a beam
+    # sweep, or None to split rotations into stationary events
+    rotation_tolerance=None,
+    # Field side length step in cm of quantized backscatter lookup tables, or
+    # None to interpolate backscatter for each skin cell
+    k_bs_step=None,
+    # Quantization steps in cm and degrees of the geometry parameters of
+    # events that share hit skin cells, or None to share only identical
+    # geometries. The dose error of shared geometries is not bounded, so None
+    # is the only safe choice.
+    geometry_tolerance=None,
+    geometry_angle_tolerance=None,
     # Phantom settings:
     phantom=dict(
         # Phantom model, valid selections: 'plane', 'cylinder', or 'human'
@@ -111,15 +118,26 @@ def main(file_path: Optional[str] = None, settings: Union[str, dict] = None):
             os.path.dirname(__file__), 'example_data', 'RDSR',
             param.rdsr_filename)
 
-    # Read RDSR data with pydicom
-    data_raw = pydicom.read_file(file_path)
+    # Cache of normalized RDSR data, if enabled in settings
+    cache = None
+    if param.rdsr_cache_dir is not None:
+        cache = RDSRCache(param.rdsr_cache_dir)
 
-    # parse RDSR data from raw .dicom file
-    data_parsed = rdsr_parser(data_raw)
+    # Keep rotational acquisitions unsplit if calculated as a beam sweep
+    split_rotations = not (param.mode == "calculate_dose" and
+                           param.rotation_tolerance is not None)
+
+    if param.mode == "calculate_dose" and cache is None:
+        # Stream normalized RDSR events in batches to the dose calculation
+        events = iter_rdsr_events(read_rdsr(file_path),
+                                  split_rotations=split_rotations)
+
+    else:
+        # Read, parse and normalize RDSR data for compliance with PySkinDose
+        data_norm = load_rdsr(file_path, cache=cache,
+                              split_rotations=split_rotations)
+        events = [data_norm]
 
-    # normalized rdsr for compliance with PySkinDose
-    data_norm = rdsr_normalizer(data_parsed)
-    
     # create table, pad and patient phantoms.
     table = Phantom(phantom_model='table', phantom_dim=param.phantom.dimension)
     pad = Phantom(phantom_model='pad', phantom_dim=param.phantom.dimension)
@@ -159,96 +177,14 @@ def main(file_path: Optional[str] = None, settings: Union[str, dict] = None):
 
     elif param.mode == "calculate_dose":
 
-        # Append HVL for all events to data_norm
-        fetch_hvl(data_norm)
-        # Check which irradiation events that contains updated
-        # geometry parameters since the previous irradiation event
-        new_geom = check_new_geometry(data_norm)
-        # fetch of k_bs interpolation object (k_bs=f(field_size))for all events
-        bs_interp = calculate_k_bs(data_norm)
-        # Calculate table correction factors
-        k_tab = calculate_k_tab(data_norm,
-                                estimate_k_tab=param.estimate_k_tab,
-                                k_tab_val=param.k_tab_val)
-
-        nr_events = len(data_norm)
-
-        output = dict(hits=[[]] * nr_events,
-                      kerma=[np.array] * nr_events,
-                      k_isq=[[]] * nr_events,
-                      k_bs=[[]] * nr_events,
-                      k_med=[[]] * nr_events,
-                      k_tab=[[]] * nr_events,
-                      dose_map=np.zeros(len(patient.r)))
-
-        print('Calculating event: ')
-        # For each irradiation event
-        for event in range(0, nr_events):
-            print(f"{event + 1} of {nr_events}")
-
-            # If the geometry has changed since preceding event,
-            # of if it is the first event
-            if new_geom[event]:
-                # create event beam
-                beam = Beam(data_norm, event=event, plot_setup=False)
-
-                # position geometry in relation to the X-ray beam
-                patient.position(data_norm, event)
-                table.position(data_norm, event)
-                pad.position(data_norm, event)
-
-                # Check which skin cells are hit by the beam
-                hits = beam.check_hit(patient)
-                # If any skin cell is hit
-                if sum(hits):
-
-                    # Check which skin cells need table correction
-                    table_hits = check_table_hits(
-                        source=beam.r[0, :], table=table, beam=beam,
-                        cells=patient.r[hits])
-
-                    # Calculate X-ray field area at the location
-                    # of each skin cell
-                    field_area = scale_field_area(data_norm, event, patient,
-                                                  hits, beam.r[0, :])
-
-                    # Calculate inverse-square law fluece correction
-                    k_isq = calculate_k_isq(source=beam.r[0, :],
-                                            cells=patient.r[hits],
-                                            dref=data_norm["DSIRP"][0])
-
-            if sum(hits):
-                # Interpolate backscatter factor to actual cell field sizes
-                k_bs = bs_interp[event](np.sqrt(field_area))
-
-                # Calculate reference point medium correction (air -> water)
-                k_med = calculate_k_med(data_norm, field_area, event)
-
-            # Save event data
-            event_dose = np.zeros(len(patient.r))
-
-            output["hits"][event] = hits
-            output["kerma"][event] = data_norm.K_IRP[event]
-
-            if sum(hits):
-                output["k_isq"][event] = k_isq
-                output["k_bs"][event] = k_bs
-                output["k_med"][event] = k_med
-                output["k_tab"][event] = k_tab[event]
-
-                # Calculate event skin dose by appending each of the correction
-                # factors to the reference point air kerma.
-                event_dose[hits] += data_norm.K_IRP[event]
-                event_dose[hits] *= k_isq
-                event_dose[hits] *= k_med
-                event_dose[hits] *= k_bs
-
-                temp = np.ones(len(table_hits))
-                temp[table_hits] = k_tab[event]
-                event_dose[hits] *= temp
-
-            # Add event dose to procedure dosemap
-            output["dose_map"] += event_dose
+        # Calculate the skin dose map, event by event
+        dose_map = calculate_dose(
+            events, patient=patient, table=table, pad=pad,
+            estimate_k_tab=param.estimate_k_tab, k_tab_val=param.k_tab_val,
+            rotation_tolerance=param.rotation_tolerance or
+            DEFAULT_ROTATION_TOLERANCE, k_bs_step=param.k_bs_step,
+            geometry_tolerance=param.geometry_tolerance,
+            geometry_angle_tolerance=param.geometry_angle_tolerance)
 
         # Fix error with plotly layout for 2D plane patient.
         if patient.phantom_model == "plane":
@@ -257,7 +193,7 @@ def main(file_path: Optional[str] = None, settings: Union[str, dict] = None):
                 phantom_dim=param.phantom.dimension)
 
         # Append and plot dosemap
-        patient.dose = output["dose_map"]
+        patient.dose = dose_map
         patient.plot_dosemap()
 
 
@@ -0,0 +1,306 @@
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+import numpy as np
+import pandas as pd
+
+# Dtype that pandas infers for a column of strings, e.g. str from pandas 3
+TEXT_DTYPE = pd.Series(['']).dtype
+
+
+class Column:
+    """Normalized column mapped from one parsed RDSR column.
+
+    The parsed values are transformed as round(scale * func(values) /
+    divisor + offset, decimals), for all events at once. Unit conversions
+    that divide, e.g. from mm to cm, use divisor rather than a fractional
+    scale, so that the values are exactly those of the division.
+
+    Attributes
+    ----------
+    source : str
+        Name of the parsed column, e.g. 'DistanceSourcetoDetector_mm'.
+    scale : float
+        Unit scaling factor.
+    divisor : float
+        Unit scaling divisor.
+    offset : float
+        Offset added after scaling.
+    func : Callable, optional
+        Vectorized function applied to the parsed values before scaling.
+    decimals : int, optional
+        Number of decimals to round to.
+    fill : Any, optional
+        Value for events where the parsed value is missing.
+    optional : bool
+        If True, a missing source column gives a column of fill, or of NaN
+        if fill is None. Otherwise, a missing source column is an error.
+    dtype : Any, optional
+        Dtype of the column, so that the column has the same dtype whether
+        or not any event holds a value, e.g. in a batch of events.
+
+    """
+
+    def __init__(self, source: str, scale: float = 1, offset: float = 0,
+                 func: Optional[Callable[[pd.Series], pd.Series]] = None,
+                 decimals: Optional[int] = None, fill: Any = None,
+                 optional: bool = False, divisor: float = 1,
+                 dtype: Any = None):
+
+        self.source = source
+        self.scale = scale
+        self.divisor = divisor
+        self.offset = offset
+        self.func = func
+        self.decimals = decimals
+        self.fill = fill
+        self.optional = optional
+        self.dtype = dtype
+
+    def apply(self, data_parsed: pd.DataFrame,
+              data_norm: pd.DataFrame) -> pd.Series:
+        """Normalize the source column of all events.
+
+        Parameters
+        ----------
+        data_parsed : pd.DataFrame
+            parsed RDSR data.
+        data_norm : pd.DataFrame
+            Columns normalized so far, not used.
+
+        Returns
+        -------
+        pd.Series
+            Normalized values of each event.
+
+        Raises
+        ------
+        ValueError
+            If the parsed data holds no source column, unless the column is
+            optional.
+
+        """
+        if self.source not in data_parsed.columns:
+            if self.optional:
+                return pd.Series(np.nan if self.fill is None else self.fill,
+                                 index=data_parsed.index, dtype=self.dtype)
+            raise ValueError(f"Parsed RDSR data holds no {self.source}")
+
+        values = data_parsed[self.source]
+
+        if self.func is not None:
+            values = self.func(values)
+        if self.scale != 1:
+            values = self.scale * values
+        if self.divisor != 1:
+            values = values / self.divisor
+        if self.offset != 0:
+            values = values + self.offset
+        if self.decimals is not None:
+            values = values.round(self.decimals)
+        if self.fill is not None:
+            # A column without any parsed value has object dtype until
+            # filled, e.g. in a batch of events without X-ray filters
+            values = values.fillna(self.fill).infer_objects()
+        if self.dtype is not None:
+            values = values.astype(self.dtype)
+
+        return values
+
+
+class Derived:
+    """Normalized column derived from already normalized columns.
+
+    The value is the linear combination sum(coefficient * column) + offset,
+    e.g. DID = DSD - DSI.
+
+    Attributes
+    ----------
+    terms : Dict[str, float]
+        Coefficient of each normalized column.
+    offset : float
+        Constant term.
+
+    """
+
+    def __init__(self, terms: Dict[str, float], offset: float = 0):
+        self.terms = terms
+        self.offset = offset
+
+    def apply(self, data_parsed: pd.DataFrame,
+              data_norm: pd.DataFrame) -> pd.Series:
+        """Derive the column of all events from normalized columns.
+
+        Parameters
+        ----------
+        data_parsed : pd.DataFrame
+            parsed RDSR data, not used.
+        data_norm : pd.DataFrame
+            Columns normalized so far, holding all columns of terms.
+
+        Returns
+        -------
+        pd.Series
+            Derived values of each event.
+
+        """
+        values = sum(coefficient * data_norm[column]
+                     for column, coefficient in self.terms.items())
+
+        return values + self.offset
+
+
+class Constant:
+    """Normalized column with the same value for all events."""
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def apply(self, data_parsed: pd.DataFrame,
+              data_norm: pd.DataFrame) -> Any:
+        """Value of the column, for all events.
+
+        Parameters
+        ----------
+        data_parsed : pd.DataFrame
+            parsed RDSR data, not used.
+        data_norm : pd.DataFrame
+            Columns normalized so far, not used.
+
+        Returns
+        -------
+        Any
+            The constant value, broadcast to all events by Normalizer.
+
+        """
+        return self.value
+
+
+class Normalizer:
+    """Normalization of the RDSR conventions of one device model.
+
+    The normalizer is declared as data: an ordered mapping from each
+    normalized column to a Column, Derived or Constant specification. All
+    specifications operate on entire columns, so the cost of normalizing
+    does not grow with the number of device models.
+
+    Attributes
+    ----------
+    model : str
+        Cleaned manufacturer model name, e.g. 'AXIOMArtis'.
+    columns : Dict[str, Any]
+        Specification of each normalized column, in output order.
+    containers : Set[str]
+        Parsed RDSR containers (concept names without unit) that hold the
+        source fields, e.g. 'XRayFilters'.
+
+    """
+
+    def __init__(self, model: str, columns: Dict[str, Any],
+                 containers: Iterable[str] = ()):
+        self.model = model
+        self.columns = columns
+        self.containers = set(containers)
+
+    @property
+    def fields(self) -> Set[str]:
+        """Parsed RDSR fields required by the normalizer."""
+        return {spec.source for spec in self.columns.values()
+                if isinstance(spec, Column)} | self.containers
+
+    @property
+    def required_fields(self) -> Set[str]:
+        """Parsed RDSR columns that must exist, see Column.optional."""
+        return {spec.source for spec in self.columns.values()
+                if isinstance(spec, Column) and not spec.optional}
+
+    def normalize(self, data_parsed: pd.DataFrame) -> pd.DataFrame:
+        """Normalize parsed RDSR data of this device model.
+
+        Parameters
+        ----------
+        data_parsed : pd.DataFrame
+            parsed RDSR data.
+
+        Returns
+        -------
+        pd.DataFrame
+            RDSR data, normalized for compliance with PySkinDose.
+
+        """
+        data_norm = pd.DataFrame(index=data_parsed.index)
+
+        for column, spec in self.columns.items():
+            data_norm[column] = spec.apply(data_parsed, data_norm)
+
+        return data_norm
+
+
+def _side_length(area: pd.Series) -> pd.Series:
+    # Side length of a square field
+    return np.sqrt(area)
+
+
+NORMALIZERS: Dict[str, Normalizer] = dict()
+
+
+def register_normalizer(normalizer: Normalizer) -> None:
+    """Add a device model normalizer to the registry.
+
+    Parameters
+    ----------
+    normalizer : Normalizer
+        Normalizer, registered on its cleaned model name.
+
+    """
+    NORMALIZERS[normalizer.model] = normalizer
+
+
+register_normalizer(Normalizer(
+    model='AXIOMArtis',
+    columns=dict(
+        # Device
+        model=Column('model'),
+        # Acquisition type
+        acquisition_type=Column('IrradiationEventType'),
+        acquisition_plane=Column('AcquisitionPlane'),
+        # Field size in cm at detector plane, in lateral direction
+        FS_lat=Column('CollimatedFieldArea_m2', scale=100, func=_side_length,
+                      decimals=3),
+        # Field size in cm at detector plane, in longitudinal direction
+        FS_long=Column('CollimatedFieldArea_m2', scale=100,
+                       func=_side_length, decimals=3),
+        # Distance source to detector in cm
+        DSD=Column('DistanceSourcetoDetector_mm', divisor=10),
+        # Distance source to isocenter in cm
+        DSI=Column('DistanceSourcetoIsocenter_mm', divisor=10),
+        # Distance isocenter to detector, in cm
+        DID=Derived({'DSD': 1, 'DSI': -1}),
+        # Distance source to IRP, in cm
+        DSIRP=Derived({'DSI': 1}, offset=-15),
+        # Reference point (IRP) air kerma in mGy
+        K_IRP=Column('DoseRP_Gy', scale=1000),
+        # Tube peak voltage in kV
+        kVp=Column('KVP_kV'),
+        # Positioner primary angle in degress
+        PPA=Column('PositionerPrimaryAngle_deg'),
+        # Positioner secondary angle in degress
+        PSA=Column('PositionerSecondaryAngle_deg'),
+        # End angles, only reported for rotational acquisitions
+        PPA_end=Column('PositionerPrimaryEndAngle_deg', optional=True,
+                       dtype=float),
+        PSA_end=Column('PositionerSecondaryEndAngle_deg', optional=True,
+                       dtype=float),
+        # Table increment in lateral direction, in cm
+        dLAT=Column('TableLateralPosition_mm', divisor=10),
+        # Table increment in longitudinal direction, in cm
+        dLONG=Column('TableLongitudinalPosition_mm', divisor=10),
+        # Table increment in vertical direction, in cm
+        dVERT=Column('TableHeightPosition_mm', divisor=10),
+        # Detector size lenth, in cm
+        DSL=Constant(40),
+        # X-ray filter material
+        filter_type=Column('XRayFilterType', dtype=TEXT_DTYPE),
+        # X-ray filter thickness
+        filter_thickness_Cu=Column('XRayFilterThicknessMaximum_mm',
+                                   fill=0.0),
+        filter_thickness_Al=Constant(0.0)),
+    containers=['XRayFilters']))
@@ -1,16 +1,338 @@
-from datetime import datetime as dt
+from datetime import datetime, timezone
+from functools import lru_cache
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import numpy as np
 import pandas as pd
 import pydicom
+from pydicom.errors import InvalidDicomError
+from pydicom.filereader import read_partial
+from pydicom.tag import Tag
+from pydicom.valuerep import DT
 
+from .normalizers import NORMALIZERS, Normalizer
+from .rdsr_cache import RDSRCache, hash_file
 
-def rdsr_parser(data_raw: pydicom.FileDataset) -> pd.DataFrame:
+# SOP classes that may hold an X-ray radiation dose report: X-Ray Radiation
+# Dose SR, Enhanced SR and Comprehensive SR.
+RDSR_SOP_CLASS_UIDS = {'1.2.840.10008.5.1.4.1.1.88.67',
+                       '1.2.840.10008.5.1.4.1.1.88.22',
+                       '1.2.840.10008.5.1.4.1.1.88.33'}
+
+# Code value of the document title 'X-Ray Radiation Dose Report'
+RDSR_DOCUMENT_TITLE = '113701'
+
+# DICOM attributes read from RDSR files, all other elements are skipped.
+RDSR_TAGS = ['SOPClassUID', 'SOPInstanceUID', 'StudyDate',
+             'TimezoneOffsetFromUTC', 'StudyInstanceUID',
+             'ManufacturerModelName', 'ConceptNameCodeSequence',
+             'ContentSequence']
+
+# Version of the normalized output. Increment when rdsr_normalizer output
+# changes, in order to invalidate cached normalized data.
+NORMALIZER_VERSION = 5
+
+# Number of stationary events to split each rotational acquisition into
+NR_ROT_STEPS = 20
+
+# Format of DICOM DateTime (DT) values after rounding to whole seconds
+DATETIME_FORMAT = '%Y%m%d%H%M%S'
+
+# Optional UTC offset suffix of DICOM DateTime (DT) values, e.g. '+0100'
+_UTC_OFFSET = re.compile(r'[+-]\d{4}$')
+
+
+def read_rdsr(file_path: str, defer_size: Optional[str] = '1 KB'
+              ) -> pydicom.FileDataset:
+    """Read the attributes of an RDSR file required by PySkinDose.
+
+    The SOP class is read first, from the start of the file, so that
+    non-RDSR objects are rejected without reading the rest of the file. For
+    RDSR files, only the attributes in RDSR_TAGS are read.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the DICOM file.
+    defer_size : str, optional
+        Values of elements larger than this are not read until accessed, by
+        default '1 KB'. Set to None to read all values at once.
+
+    Returns
+    -------
+    pydicom.FileDataset
+        RDSR file, with the attributes in RDSR_TAGS.
+
+    Raises
+    ------
+    ValueError
+        Raises value error if the file is not an X-ray radiation dose report.
+
+    """
+    # Stop reading as soon as the SOP class UID has been passed
+    sop_class_tag = Tag('SOPClassUID')
+
+    with open(file_path, 'rb') as fp:
+
+        try:
+            header = read_partial(
+                fp, stop_when=lambda tag, vr, length: tag > sop_class_tag,
+                specific_tags=[sop_class_tag])
+        except InvalidDicomError:
+            raise ValueError(f"{file_path} is not a DICOM file")
+
+        sop_class_uid = header.get('SOPClassUID')
+        if sop_class_uid is None and header.file_meta is not None:
+            sop_class_uid = header.file_meta.get('MediaStorageSOPClassUID')
+
+        if sop_class_uid not in RDSR_SOP_CLASS_UIDS:
+            raise ValueError(f"{file_path} is not a structured report, "
+                             f"SOP class UID: {sop_class_uid}")
+
+        fp.seek(0)
+        data_raw = pydicom.dcmread(fp, defer_size=defer_size,
+                                   specific_tags=RDSR_TAGS)
+
+    document_title = data_raw.get('ConceptNameCodeSequence')
+
+    if not document_title or \
+            document_title[0].CodeValue != RDSR_DOCUMENT_TITLE:
+        raise ValueError(f"{file_path} is not an X-ray radiation dose report")
+
+    return data_raw
+
+
+def load_rdsr(file_path: str, cache: Optional[RDSRCache] = None,
+              split_rotations: bool = True) -> pd.DataFrame:
+    """Read, parse and normalize the irradiation events of an RDSR file.
+
+    If a cache is given, the normalized events are loaded from the cache when
+    the file has been processed before by the same normalizer version. In
+    that case, the RDSR file is only hashed, not read with pydicom.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the RDSR file.
+    cache : RDSRCache, optional
+        Cache of normalized RDSR event data, by default no cache is used.
+    split_rotations : bool, optional
+        Split rotational acquisitions into stationary sub-events, see
+        rdsr_normalizer. Default is True.
+
+    Returns
+    -------
+    pd.DataFrame
+        RDSR data, normalized for compliance with PySkinDose.
+
+    """
+    if cache is not None:
+        content_hash = hash_file(file_path)
+        data_norm = cache.get(content_hash, NORMALIZER_VERSION)
+
+        if data_norm is not None:
+            return _split_rotations(data_norm, NR_ROT_STEPS) \
+                if split_rotations else data_norm
+
+    data_raw = read_rdsr(file_path)
+
+    # Parse only the fields required by the device specific normalizer
+    data_parsed = rdsr_parser(
+        data_raw, fields=normalizer_fields(data_raw.ManufacturerModelName))
+
+    # Rotations are cached unsplit, and split after loading if requested
+    data_norm = rdsr_normalizer(data_parsed, split_rotations=False)
+
+    if cache is not None:
+        cache.put(content_hash, NORMALIZER_VERSION, data_raw.SOPInstanceUID,
+                  data_norm)
+
+    if split_rotations:
+        data_norm = _split_rotations(data_norm, NR_ROT_STEPS)
+
+    return data_norm
+
+
+def merge_rdsr(file_paths: Iterable[str], split_rotations: bool = True
+               ) -> pd.DataFrame:
+    """Merge the irradiation events of several RDSR files of one study.
+
+    Some systems send several RDSRs per study, e.g. interim reports,
+    re-sends, or one report per acquisition plane. The irradiation events of
+    all reports are indexed on (StudyInstanceUID, IrradiationEventUID) in a
+    hash index, so that events reported more than once are kept only once,
+    in linear time. The union of events is sorted on start time, in UTC,
+    and normalized once. Events without IrradiationEventUID are always
+    kept.
+
+    Parameters
+    ----------
+    file_paths : Iterable[str]
+        Paths to the RDSR files of the study.
+    split_rotations : bool, optional
+        Split rotational acquisitions into stationary sub-events, see
+        rdsr_normalizer. Default is True.
+
+    Returns
+    -------
+    pd.DataFrame
+        RDSR data of all unique irradiation events, normalized for
+        compliance with PySkinDose, in order of start time.
+
+    Raises
+    ------
+    ValueError
+        Raises value error if the RDSR files belong to different studies.
+
+    """
+    datetime_columns: Set[str] = set()
+    events: Dict[Tuple[str, ...], Dict[str, Any]] = dict()
+    start_times: Dict[Tuple[str, ...], Optional[datetime]] = dict()
+    study_uid = None
+
+    for file_path in file_paths:
+        data_raw = read_rdsr(file_path)
+
+        uid = str(data_raw.get('StudyInstanceUID', ''))
+        if study_uid is None:
+            study_uid = uid
+        elif uid != study_uid:
+            raise ValueError(f"{file_path} belongs to study {uid}, "
+                             f"not to study {study_uid}")
+
+        fields = normalizer_fields(data_raw.ManufacturerModelName) | \
+            {'IrradiationEventUID', 'DateTimeStarted'}
+        utc_offset = data_raw.get('TimezoneOffsetFromUTC')
+
+        for ind, data_parsed_dict in enumerate(_iter_parsed_events(
+                data_raw, datetime_columns, fields)):
+
+            event_uid = data_parsed_dict.get('IrradiationEventUID')
+            key = (uid, str(event_uid)) if event_uid is not None else \
+                (uid, str(data_raw.SOPInstanceUID), str(ind))
+
+            # Keep the first report of each irradiation event
+            if key not in events:
+                events[key] = data_parsed_dict
+                start_times[key] = _start_time(
+                    data_parsed_dict.get('DateTimeStarted'), utc_offset)
+
+    # Sort on start time, events without start time last
+    earliest = datetime.min.replace(tzinfo=timezone.utc)
+    events_sorted = [events[key] for key in sorted(
+        events, key=lambda key: (start_times[key] is None,
+                                 start_times[key] or earliest))]
+
+    data_parsed = _build_table(events_sorted, datetime_columns)
+
+    return rdsr_normalizer(data_parsed, split_rotations=split_rotations)
+
+
+def _start_time(value: Any, utc_offset: Optional[str]) -> Optional[datetime]:
+    """Parse a DICOM DT start time to a datetime in UTC.
+
+    DT values without UTC offset are in the TimezoneOffsetFromUTC of the
+    report, or in UTC if the report states no offset.
+
+    Parameters
+    ----------
+    value : Any
+        DT string, or None if the event holds no start time.
+    utc_offset : str, optional
+        TimezoneOffsetFromUTC of the report, e.g. '+0100'.
+
+    Returns
+    -------
+    datetime
+        Timezone aware start time in UTC, or None.
+
+    """
+    if not isinstance(value, str):
+        return None
+
+    if _UTC_OFFSET.search(value) is None:
+        value += utc_offset or '+0000'
+
+    return DT(value).astimezone(timezone.utc)
+
+
+def get_normalizer(model: str) -> Normalizer:
+    """Fetch the registered normalizer of a device model.
+
+    Parameters
+    ----------
+    model : str
+        Manufacturer model name, either as stated in the RDSR or cleaned.
+
+    Returns
+    -------
+    Normalizer
+        Normalizer of the device model, see normalizers.py.
+
+    Raises
+    ------
+    ValueError
+        Raises value error if no normalizer exists for the device model.
+
+    """
+    model = clean_concept_name(model)
+
+    if model not in NORMALIZERS:
+        raise ValueError(f"No RDSR normalizer for device model {model}. "
+                         f"Valid models: {', '.join(NORMALIZERS)}")
+
+    return NORMALIZERS[model]
+
+
+def normalizer_fields(model: str) -> Set[str]:
+    """Fetch the parsed RDSR fields required to normalize a device model.
+
+    Parameters
+    ----------
+    model : str
+        Manufacturer model name, either as stated in the RDSR or cleaned.
+
+    Returns
+    -------
+    Set[str]
+        Field names to pass as fields to rdsr_parser.
+
+    Raises
+    ------
+    ValueError
+        Raises value error if no normalizer exists for the device model.
+
+    """
+    return get_normalizer(model).fields
+
+
+def rdsr_parser(data_raw: pydicom.FileDataset,
+                fields: Optional[Iterable[str]] = None,
+                acquisition_types: Optional[Iterable[str]] = None,
+                time_window: Optional[Tuple[datetime, datetime]] = None
+                ) -> pd.DataFrame:
     """Parse event data from radiation dose structure reports (RDSR).
 
+    The parsed values are collected in one buffer per column and the
+    DataFrame is built once, after all irradiation events have been read.
+    DateTime values are kept as DICOM DT strings during the walk and are
+    converted to datetime for each column in a single vectorized pass.
+
     Parameters
     ----------
     data_raw : pydicom.FileDataset
         RDSR file from fluoroscopic device, opened with package pydicom.
+    fields : Iterable[str], optional
+        Parse only these fields, e.g. normalizer_fields(model). Content
+        items of other concept names are skipped before their values are
+        read, and containers are only descended into if the container name
+        is in fields. By default, all fields are parsed.
+    acquisition_types : Iterable[str], optional
+        Parse only irradiation events of these types, e.g. ['Fluoroscopy'].
+        By default, events of all types are parsed.
+    time_window : Tuple[datetime, datetime], optional
+        Parse only irradiation events started within [start, stop]. By
+        default, events are parsed regardless of start time.
 
     Returns
     -------
@@ -18,202 +340,440 @@ def rdsr_parser(data_raw: pydicom.FileDataset) -> pd.DataFrame:
         Parsed RDSR data from all irradiation events in the RDSR input file
 
     """
-    # Declare pandas DataFrame for storage of parsed RDSR data
-    data_parsed = pd.DataFrame(columns=[])
+    # Columns that holds DateTime values, converted after parsing
+    datetime_columns: Set[str] = set()
+
+    events = _iter_parsed_events(data_raw, datetime_columns, fields,
+                                 acquisition_types, time_window)
+
+    return _build_table(events, datetime_columns)
+
+
+def iter_rdsr_events(data_raw: pydicom.FileDataset, batch_size: int = 100,
+                     acquisition_types: Optional[Iterable[str]] = None,
+                     time_window: Optional[Tuple[datetime, datetime]] = None,
+                     split_rotations: bool = True
+                     ) -> Iterator[pd.DataFrame]:
+    """Parse and normalize RDSR irradiation events in small batches.
+
+    This is the streaming counterpart of rdsr_parser followed by
+    rdsr_normalizer. Events are parsed and normalized batch_size at a time,
+    so that the parsed and normalized data of the entire procedure is never
+    held in memory, and the first batch is available for dose calculation
+    as soon as it has been read. Rotational acquisitions are split into
+    sub-events within their batch, unless split_rotations is False.
+
+    Parameters
+    ----------
+    data_raw : pydicom.FileDataset
+        RDSR file from fluoroscopic device, opened with package pydicom.
+    batch_size : int, optional
+        Number of irradiation events parsed per batch, by default 100.
+    acquisition_types : Iterable[str], optional
+        Yield only irradiation events of these types, see rdsr_parser.
+    time_window : Tuple[datetime, datetime], optional
+        Yield only irradiation events started within [start, stop], see
+        rdsr_parser.
+    split_rotations : bool, optional
+        Split rotational acquisitions into stationary sub-events, see
+        rdsr_normalizer. Default is True.
+
+    Yields
+    ------
+    pd.DataFrame
+        Normalized RDSR data of the next batch of irradiation events, indexed
+        from 0.
+
+    """
+    datetime_columns: Set[str] = set()
+    normalizer = get_normalizer(data_raw.ManufacturerModelName)
+
+    events = _iter_parsed_events(data_raw, datetime_columns,
+                                 normalizer.fields, acquisition_types,
+                                 time_window)
+
+    # Columns that the normalizer requires, also in batches where no event
+    # holds a value for them, e.g. batches without X-ray filters
+    required = normalizer.required_fields
+
+    batch: List[Dict[str, Any]] = []
+    for data_parsed_dict in events:
+        batch.append(data_parsed_dict)
+
+        if len(batch) == batch_size:
+            yield rdsr_normalizer(
+                _build_table(batch, datetime_columns, required),
+                split_rotations=split_rotations)
+            batch = []
+
+    if batch:
+        yield rdsr_normalizer(_build_table(batch, datetime_columns, required),
+                              split_rotations=split_rotations)
+
+
+def _iter_parsed_events(data_raw: pydicom.FileDataset,
+                        datetime_columns: Set[str],
+                        fields: Optional[Iterable[str]] = None,
+                        acquisition_types: Optional[Iterable[str]] = None,
+                        time_window: Optional[Tuple[datetime, datetime]] = None
+                        ) -> Iterator[Dict[str, Any]]:
+    """Parse the irradiation events of an RDSR one at a time.
+
+    See rdsr_parser for a description of the parameters. Tags of parsed
+    DateTime values are added to datetime_columns.
+
+    """
+    # Save manufacturer model name
+    model = clean_concept_name(data_raw.ManufacturerModelName)
+
+    event_filter = _EventFilter(acquisition_types, time_window)
+
+    # Concept names to parse. Measured values are matched on the concept
+    # name without unit, and detector size is parsed from the comment.
+    wanted_tags: Optional[Set[str]] = None
+    if fields is not None:
+        fields = set(fields) | {'model'}
+        wanted_tags = {field.split('_')[0] for field in fields}
+        if 'DetectorSize_mm' in fields:
+            wanted_tags.add('Comment')
+        wanted_tags |= event_filter.tags
 
     # For each content in RDSR file
     for rdsr_content in data_raw.ContentSequence:
 
         # If content = irradiation event
         if rdsr_content.ConceptNameCodeSequence[0].CodeMeaning\
-                == 'Irradiation Event X-Ray Data':
+                != 'Irradiation Event X-Ray Data':
+            continue
+
+        data_parsed_dict = _parse_event(rdsr_content, model, datetime_columns,
+                                        wanted_tags, event_filter)
+
+        # Skip events rejected by the event filter
+        if data_parsed_dict is None:
+            continue
+
+        if fields is not None:
+            data_parsed_dict = {tag: value for tag, value in
+                                data_parsed_dict.items() if tag in fields}
+
+        yield data_parsed_dict
+
+
+def _build_table(events: Iterable[Dict[str, Any]],
+                 datetime_columns: Set[str],
+                 required: Iterable[str] = ()) -> pd.DataFrame:
+    """Build a DataFrame from parsed irradiation events.
+
+    The values are collected in one buffer per column and the DataFrame is
+    built once, after all events have been read. DateTime columns are
+    converted from DT strings in a single pass per column. The required
+    columns are created even if no event holds a value for them, so that
+    a batch of events normalizes like the entire procedure.
+
+    """
+    # Column buffers, each list holds one value per irradiation event
+    columns: Dict[str, List[Any]] = {tag: [] for tag in sorted(required)}
+    nr_events = 0
+
+    for data_parsed_dict in events:
+
+        # Append event values to the column buffers. Columns first seen in
+        # this event are back-filled for all preceding events.
+        for tag, value in data_parsed_dict.items():
+            if tag not in columns:
+                columns[tag] = [None] * nr_events
+            columns[tag].append(value)
+
+        nr_events += 1
+
+        # Pad columns that are missing in this event
+        for column in columns.values():
+            if len(column) < nr_events:
+                column.append(None)
+
+    # Convert all DateTime columns at once
+    for tag in datetime_columns:
+        if tag in columns:
+            columns[tag] = _convert_datetime(columns[tag])
+
+    return pd.DataFrame(columns)
+
+
+# Characters removed from concept names by clean_concept_name
+_CONCEPT_NAME_TABLE = str.maketrans('', '', ' -().')
+
+
+@lru_cache(maxsize=1024)
+def clean_concept_name(name: str) -> str:
+    """Reformat an RDSR 'Concept Name' to a valid column name.
+
+    RDSRs use a small vocabulary of concept names, so the cleaned names are
+    memoized.
+
+    Parameters
+    ----------
+    name : str
+        Concept name, e.g. code meaning or manufacturer model name.
+
+    Returns
+    -------
+    str
+        Concept name without spaces, hyphens, parentheses and periods.
+
+    """
+    return name.translate(_CONCEPT_NAME_TABLE)
+
+
+def _store_value(data_parsed_dict: Dict[str, Any], tag: str, value: Any,
+                 pair: type = list) -> None:
+    """Save value to tag, pair it with any previous value of the same tag."""
+    if tag in data_parsed_dict.keys():
+        data_parsed_dict[tag] = pair([data_parsed_dict[tag], value])
+    else:
+        data_parsed_dict[tag] = value
+
 
-            # Declare temporary dictionary
-            data_parsed_dict = dict()
+class _EventFilter:
+    """Predicate on irradiation event type and start time.
 
-            # Save manufacturer model name
-            data_parsed_dict["model"] = data_raw.ManufacturerModelName\
-                .replace(" ", "").replace("-", "").replace("(", "")\
-                .replace(")", "").replace(".", "")
+    The predicate is checked while an event is parsed, as soon as the
+    filtered concept is read, so that rejected events are not parsed further.
 
-            # For each content in 'Irradiation Event X-Ray Data'
-            for xray_event_content in rdsr_content.ContentSequence:
+    """
+
+    def __init__(self, acquisition_types: Optional[Iterable[str]],
+                 time_window: Optional[Tuple[datetime, datetime]]):
+
+        self.acquisition_types = (
+            None if acquisition_types is None else set(acquisition_types))
+
+        # Compare start times as numbers on the form YYYYMMDDHHMMSS
+        self.time_window = None
+        if time_window is not None:
+            self.time_window = tuple(
+                float(limit.strftime(DATETIME_FORMAT)) for limit in
+                time_window)
+
+        # Concept names required to evaluate the filter
+        self.tags: Set[str] = set()
+        if self.acquisition_types is not None:
+            self.tags.add('IrradiationEventType')
+        if self.time_window is not None:
+            self.tags.add('DateTimeStarted')
+
+    def reject(self, tag: str, value: Any) -> bool:
+        """Check if the value of tag rejects the irradiation event."""
+        if tag == 'IrradiationEventType' and \
+                self.acquisition_types is not None:
+            return value not in self.acquisition_types
+
+        if tag == 'DateTimeStarted' and self.time_window is not None:
+            start_time = round(float(_UTC_OFFSET.sub('', value)))
+            return not self.time_window[0] <= start_time <= self.time_window[1]
+
+        return False
+
+    def accept(self, data_parsed_dict: Dict[str, Any]) -> bool:
+        """Check that all filtered concepts were present in the event."""
+        return self.tags.issubset(data_parsed_dict.keys())
+
+
+def _parse_event(rdsr_content: pydicom.Dataset, model: str,
+                 datetime_columns: Set[str],
+                 wanted_tags: Optional[Set[str]] = None,
+                 event_filter: Optional[_EventFilter] = None
+                 ) -> Optional[Dict[str, Any]]:
+    """Parse all content of one 'Irradiation Event X-Ray Data' item.
+
+    Parameters
+    ----------
+    rdsr_content : pydicom.Dataset
+        'Irradiation Event X-Ray Data' item of the RDSR ContentSequence.
+    model : str
+        Cleaned manufacturer model name.
+    datetime_columns : Set[str]
+        Tags of parsed DateTime values are added to this set. The values are
+        stored as DT strings, to be converted by the caller.
+    wanted_tags : Set[str], optional
+        Parse only content with these concept names. By default, all
+        content is parsed.
+    event_filter : _EventFilter, optional
+        Predicate that the event must pass.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Parsed value of each 'Concept Name' in the irradiation event, or
+        None if the event is rejected by event_filter.
+
+    """
+    data_parsed_dict: Dict[str, Any] = dict(model=model)
+
+    # For each content in 'Irradiation Event X-Ray Data'
+    for xray_event_content in rdsr_content.ContentSequence:
+        # Reformat 'Concept Name'
+        tag = clean_concept_name(
+            xray_event_content.ConceptNameCodeSequence[0].CodeMeaning)
+
+        # Skip unwanted content, before any value is read
+        if wanted_tags is not None and tag not in wanted_tags:
+            continue
+
+        # Save 'Concept Name' to dictionary, assign corresponding value
+        if 'ConceptCodeSequence' in xray_event_content:
+            _store_value(data_parsed_dict, tag, xray_event_content
+                         .ConceptCodeSequence[0].CodeMeaning)
+
+        elif 'MeasuredValueSequence' in xray_event_content:
+            # If the content contains a 'Measured Value Sequence'
+            # Reformat 'Concept Name' to include unit of measurement
+            unit = xray_event_content.MeasuredValueSequence[0]\
+                .MeasurementUnitsCodeSequence[0].CodeValue.replace(".", "")
+
+            _store_value(data_parsed_dict, '_'.join([tag, unit]),
+                         xray_event_content.MeasuredValueSequence[0]
+                         .NumericValue)
+
+        elif 'TextValue' in xray_event_content:
+
+            # This loop extracts detector size for static acquisitions,
+            # which is given as a 'Comment' for siemens artis zee units
+            if tag == 'Comment':
+                comment = xray_event_content.TextValue.split('/')
+                if 'AcquisitionData' in comment[0]:
+                    for index in comment:
+                        if 'iiDiameter SRData' in index:
+                            data_parsed_dict['DetectorSize_mm']\
+                                = index.split('=')[1].replace('"', '')
+            else:
+                _store_value(data_parsed_dict, tag,
+                             xray_event_content.TextValue)
+
+        elif 'DateTime' in xray_event_content:
+            datetime_columns.add(tag)
+            _store_value(data_parsed_dict, tag,
+                         str(xray_event_content.DateTime))
+
+        elif 'UID' in xray_event_content:
+            _store_value(data_parsed_dict, tag, xray_event_content.UID)
+
+        # If the 'Irradiation Event X-Ray Data' contains subcontent
+        elif 'ContentSequence' in xray_event_content:
+            # For each subcontent
+            for xray_event_subcontent in xray_event_content.ContentSequence:
                 # Reformat 'Concept Name'
-                tag = (
-                    xray_event_content.ConceptNameCodeSequence[0].CodeMeaning.
-                    replace(" ", "").replace("-", "").replace("(", "").
-                    replace(")", "").replace(".", ""))
-
-                # Save 'Concept Name' to dictionary, assign corresponding value
-                if 'ConceptCodeSequence' in xray_event_content:
-                    if tag in data_parsed_dict.keys():
-                        data_parsed_dict[tag] = (
-                            [data_parsed_dict[tag],
-                             xray_event_content.ConceptCodeSequence[0].
-                             CodeMeaning])
-                    else:
-                        data_parsed_dict[tag] = xray_event_content\
-                            .ConceptCodeSequence[0].CodeMeaning
-
-                elif 'MeasuredValueSequence' in xray_event_content:
-                    # If the content contains a 'Measured Value Sequence'
-                    # Reformat 'Concept Name' to include unit of measurement
-                    unit = xray_event_content.MeasuredValueSequence[0]\
-                        .MeasurementUnitsCodeSequence[0]\
-                        .CodeValue.replace(".", "")
-
-                    tag = '_'.join([tag, unit])
-
-                    if tag in data_parsed_dict.keys():
-                        data_parsed_dict[tag] = (
-                            [data_parsed_dict[tag],
-                             xray_event_content.MeasuredValueSequence[0].
-                             NumericValue])
-
-                    else:
-                        data_parsed_dict[tag] = xray_event_content\
-                            .MeasuredValueSequence[0].NumericValue
-
-                elif 'TextValue' in xray_event_content:
-
-                    # This loop extracts detector size for static acquisitions,
-                    # which is given as a 'Comment' for siemens artis zee units
-                    if tag == 'Comment':
-                        comment = xray_event_content.TextValue.split('/')
-                        if 'AcquisitionData' in comment[0]:
-                            for index in comment:
-                                if 'iiDiameter SRData' in index:
-                                    data_parsed_dict['DetectorSize_mm']\
-                                        = index.split('=')[1].replace('"', '')
-
-                    elif tag in data_parsed_dict.keys():
-                        data_parsed_dict[tag] = (
-                            [data_parsed_dict[tag],
-                             xray_event_content.TextValue])
-                    else:
-                        data_parsed_dict[tag] = xray_event_content.TextValue
-
-                elif 'DateTime' in xray_event_content:
-                    if tag in data_parsed_dict.keys():
-                        data_parsed_dict[tag] = (
-                            [data_parsed_dict[tag],
-                             dt.strptime(str(round(float(
-                                 xray_event_content.DateTime))),
-                                         '%Y%m%d%H%M%S')])
-                    else:
-                        data_parsed_dict[tag] = dt.strptime(str(round(float(
-                            xray_event_content.DateTime))), '%Y%m%d%H%M%S')
-
-                elif 'UID' in xray_event_content:
-                    if tag in data_parsed_dict.keys():
-                        data_parsed_dict[tag] =\
-                            [data_parsed_dict[tag], xray_event_content.UID]
-                    else:
-                        data_parsed_dict[tag] = xray_event_content.UID
-
-                # If the 'Irradiation Event X-Ray Data' contains subcontent
-                elif 'ContentSequence' in xray_event_content:
-                    # For each subcontent
-                    for xray_event_subcontent in xray_event_content.\
-                            ContentSequence:
-                        # Reformat 'Concept Name'
-                        tag = (
-                            xray_event_subcontent.ConceptNameCodeSequence[0].
-                            CodeMeaning.replace(" ", "").replace("-", "").
-                            replace("(", "").replace(")", "").replace(".", ""))
-
-                        # corresponding value
-                        if 'ConceptCodeSequence' in xray_event_subcontent:
-                            if tag in data_parsed_dict.keys():
-                                data_parsed_dict[tag] = (
-                                    [data_parsed_dict[tag],
-                                     xray_event_subcontent
-                                     .ConceptCodeSequence[0].CodeMeaning])
-                            else:
-                                data_parsed_dict[tag] = (
-                                    xray_event_subcontent.
-                                    ConceptCodeSequence[0].CodeMeaning)
-
-                        elif 'DateTime' in xray_event_subcontent:
-
-                            if tag in data_parsed_dict.keys():
-                                data_parsed_dict[tag] = (
-                                    [data_parsed_dict[tag],
-                                     dt.strptime(
-                                         str(
-                                             round(float(xray_event_subcontent.
-                                                         DateTime))),
-                                         '%Y%m%d%H%M%S')])
-                            else:
-                                data_parsed_dict[tag] = (
-                                    dt.strptime(
-                                        str(round(float(
-                                            xray_event_subcontent.
-                                            DateTime))),
-                                        '%Y%m%d%H%M%S'))
-
-                        elif 'TextValue' in xray_event_subcontent:
-
-                            if tag in data_parsed_dict.keys():
-                                data_parsed_dict[tag] = (
-                                    [data_parsed_dict[tag],
-                                     xray_event_subcontent.TextValue])
-
-                            else:
-                                data_parsed_dict[tag] =\
-                                    xray_event_subcontent.TextValue
-
-                        elif 'UID' in xray_event_subcontent:
-                            if tag in data_parsed_dict.keys():
-                                data_parsed_dict[tag] = (
-                                    [data_parsed_dict[tag],
-                                     xray_event_subcontent.UID])
-                            else:
-                                data_parsed_dict[tag] =\
-                                    xray_event_subcontent.UID
-                        elif 'MeasuredValueSequence' in xray_event_subcontent:
-                            # Reformat 'Concept Name' to include unit of
-                            # measurement
-                            unit = xray_event_subcontent\
-                                .MeasuredValueSequence[0]\
-                                .MeasurementUnitsCodeSequence[0].CodeValue
-
-                            tag = '_'.join([tag, unit])
-
-                            if tag in data_parsed_dict.keys():
-                                data_parsed_dict[tag] = (
-                                    data_parsed_dict[tag],
-                                    xray_event_subcontent.
-                                    MeasuredValueSequence[0].NumericValue)
-                            else:
-                                data_parsed_dict[tag] =\
-                                    xray_event_subcontent.\
-                                    MeasuredValueSequence[0].NumericValue
-
-                        # Assign None to 'Concept Name' if nothing relevant to
-                        # parse in RDSR subcontent
-                        else:
-                            data_parsed_dict[tag] = None
-
-                # Assign None to 'Concept Name' if nothing relevant to parse
-                # in RDSR content
+                tag = clean_concept_name(xray_event_subcontent
+                                         .ConceptNameCodeSequence[0]
+                                         .CodeMeaning)
+
+                if wanted_tags is not None and tag not in wanted_tags:
+                    continue
+
+                # corresponding value
+                if 'ConceptCodeSequence' in xray_event_subcontent:
+                    _store_value(data_parsed_dict, tag, xray_event_subcontent
+                                 .ConceptCodeSequence[0].CodeMeaning)
+
+                elif 'DateTime' in xray_event_subcontent:
+                    datetime_columns.add(tag)
+                    _store_value(data_parsed_dict, tag,
+                                 str(xray_event_subcontent.DateTime))
+
+                elif 'TextValue' in xray_event_subcontent:
+                    _store_value(data_parsed_dict, tag,
+                                 xray_event_subcontent.TextValue)
+
+                elif 'UID' in xray_event_subcontent:
+                    _store_value(data_parsed_dict, tag,
+                                 xray_event_subcontent.UID)
+
+                elif 'MeasuredValueSequence' in xray_event_subcontent:
+                    # Reformat 'Concept Name' to include unit of
+                    # measurement
+                    unit = xray_event_subcontent.MeasuredValueSequence[0]\
+                        .MeasurementUnitsCodeSequence[0].CodeValue
+
+                    _store_value(data_parsed_dict, '_'.join([tag, unit]),
+                                 xray_event_subcontent
+                                 .MeasuredValueSequence[0].NumericValue,
+                                 pair=tuple)
+
+                # Assign None to 'Concept Name' if nothing relevant to
+                # parse in RDSR subcontent
                 else:
                     data_parsed_dict[tag] = None
 
-            # Append dictionary to DataFrame
-            data_parsed = data_parsed.append(data_parsed_dict,
-                                             ignore_index=True)
+        # Assign None to 'Concept Name' if nothing relevant to parse
+        # in RDSR content
+        else:
+            data_parsed_dict[tag] = None
+
+        # Stop parsing the event as soon as it is rejected by the filter
+        if event_filter is not None and tag in event_filter.tags and \
+                event_filter.reject(tag, data_parsed_dict[tag]):
+            return None
+
+    if event_filter is not None and not event_filter.accept(data_parsed_dict):
+        return None
+
+    return data_parsed_dict
+
+
+def _convert_datetime(values: List[Any]) -> List[Any]:
+    """Convert a column of DICOM DT strings to datetime.
+
+    The DT strings are rounded to whole seconds and converted in one call to
+    pd.to_datetime. Cells holding several DateTime values (repeated concept
+    names) are converted element by element.
+
+    Parameters
+    ----------
+    values : List[Any]
+        Column buffer with DT strings, None, or lists/tuples of DT strings.
+
+    Returns
+    -------
+    List[Any]
+        Column buffer with the DT strings replaced by datetime.
+
+    """
+    # Index of all cells holding a single DT string
+    index = [ind for ind, value in enumerate(values)
+             if isinstance(value, str)]
+
+    # Local date and time, without the UTC offset
+    seconds = np.round(np.asarray(
+        [_UTC_OFFSET.sub('', values[ind]) for ind in index], dtype=float))
+    converted = pd.to_datetime(seconds.astype(np.int64).astype(str),
+                               format=DATETIME_FORMAT).to_pydatetime()
 
-    return data_parsed
+    output = list(values)
+    for ind, value in zip(index, converted):
+        output[ind] = value
 
+    # Cells with repeated DateTime concept names
+    for ind, value in enumerate(output):
+        if isinstance(value, (list, tuple)):
+            output[ind] = type(value)(_convert_datetime(list(value)))
 
-def rdsr_normalizer(data_parsed: pd.DataFrame) -> pd.DataFrame:
+    return output
+
+
+def rdsr_normalizer(data_parsed: pd.DataFrame,
+                    split_rotations: bool = True) -> pd.DataFrame:
     """Normalize the vendor specific RDSR conventions.
 
     Parameters
     ----------
     data_parsed : pd.DataFrame
         parsed RDSR data.
+    split_rotations : bool, optional
+        Split rotational acquisitions into NR_ROT_STEPS stationary
+        sub-events, default is True. If False, rotational acquisitions are
+        kept as single events with end angles PPA_end and PSA_end, for
+        calculation of the dose as a beam sweep, see
+        calculate_rotational_dose.
 
     Returns
     -------
@@ -221,104 +781,85 @@ def rdsr_normalizer(data_parsed: pd.DataFrame) -> pd.DataFrame:
         RDSR data, normalized for compliance with PySkinDose.
 
     """
-    data_norm = pd.DataFrame()
-
-    if data_parsed.model[0] == "AXIOMArtis":
-
-        # Device
-        data_norm["model"] = data_parsed.model
-        # Acquisition type
-        data_norm["acquisition_type"] = data_parsed.IrradiationEventType
-        # Field size in cm at detector plane, in lateral direction
-        data_norm["acquisition_plane"] = data_parsed.AcquisitionPlane
-        data_norm["FS_lat"] = \
-            round(100 * np.sqrt(data_parsed.CollimatedFieldArea_m2), 3)
-        # Field size in cm at detector plane, in longitudinal direction
-        data_norm["FS_long"] = \
-            round(100 * np.sqrt(data_parsed.CollimatedFieldArea_m2), 3)
-        # Distance source to detector in cm
-        data_norm["DSD"] = \
-            data_parsed.DistanceSourcetoDetector_mm / 10
-        # Distance source to isocenter in cm
-        data_norm["DSI"] = data_parsed.DistanceSourcetoIsocenter_mm / 10
-        # Distance isocenter to detector, in cm
-        data_norm["DID"] = data_norm.DSD - data_norm.DSI
-        # Distance source to IRP, in cm
-        data_norm["DSIRP"] = data_norm.DSI - 15
-        # Reference point (IRP) air kerma in mGy
-        data_norm["K_IRP"] = 1000 * data_parsed.DoseRP_Gy
-        # Tube peak voltage in kV
-        data_norm["kVp"] = data_parsed.KVP_kV
-        # Positioner primary angle in degress
-        data_norm["PPA"] = data_parsed.PositionerPrimaryAngle_deg
-        # Positioner secondary angle in degress
-        data_norm["PSA"] = data_parsed.PositionerSecondaryAngle_deg
-        # Save PPA and PSA end angles if rotational acquisition.
-        if "Rotational Acquisition" in data_parsed.IrradiationEventType.tolist():
-            data_norm["PPA_end"] = data_parsed.PositionerPrimaryEndAngle_deg
-            data_norm["PSA_end"] = data_parsed.PositionerSecondaryEndAngle_deg
-
-        # Table increment in lateral direction, in cm
-        data_norm["dLAT"] = + data_parsed.TableLateralPosition_mm / 10
-        # Table increment in longitudinal direction, in cm
-        data_norm["dLONG"] = + data_parsed.TableLongitudinalPosition_mm / 10
-        # Table increment in vertical direction, in cm
-        data_norm["dVERT"] = + data_parsed.TableHeightPosition_mm / 10
-        # Detector size lenth, in cm
-        data_norm["DSL"] = 40
-        # X-ray filter material
-        data_norm["filter_type"] = data_parsed.XRayFilterType
-        # X-ray filter thickness
-        data_norm["filter_thickness_Cu"] = (
-            data_parsed.XRayFilterThicknessMaximum_mm)
-        data_norm["filter_thickness_Al"] = (
-            [0.0] * len(data_parsed.XRayFilterThicknessMaximum_mm))
-        data_norm.filter_thickness_Cu = (
-            data_norm.filter_thickness_Cu.fillna(0.0))
-
-        # The following section parses rotational acquisitions as a descrete
-        # number of stationary events.
-
-        # Number of events to spit up the rotation about
-        nr_rot_steps = 20
-
-
-        # For each irradiation event
-        for event in range(0, len(data_norm)):
-            # If event is of type "Rotational Acquisition"
-            if data_norm.acquisition_type[event] == "Rotational Acquisition":
-                # Split the dataframe in two parts, the first part with all
-                # event before the rotation, and the second with all events
-                # after the rotation.
-                temp_before = data_norm.loc[:event-1] # everything before rot
-                temp_after = data_norm.loc[event+1:] # everthing after rot
-
-                # Discretize beam angulation from start angle to stop angle,
-                range_PPA = np.linspace(data_norm.ix[event, 'PPA'],
-                                        data_norm.ix[event, 'PPA_end'],
-                                        nr_rot_steps)
-
-                range_PSA = np.linspace(data_norm.ix[event, 'PSA'],
-                                        data_norm.ix[event, 'PSA_end'],
-                                        nr_rot_steps)
-
-                # for every angle increment
-                for angle_increment in range(0, len(range_PPA)):
-                    # Select the rotational acquisition event
-                    temp_event = data_norm.loc[event]
-                    # Distribute the total air kerma equally to all events
-                    # in the rotation.
-                    temp_event.at['K_IRP'] = temp_event.K_IRP/nr_rot_steps
-                    # Increase primary angle
-                    temp_event.at['PPA'] = range_PPA[angle_increment]
-                    # Increase secondary angle
-                    temp_event.at['PSA'] = range_PSA[angle_increment]
-                    # Append sub-event to procedure
-                    temp_before = temp_before.append(temp_event)
-
-                data_norm = temp_before.append(temp_after)
+    models = data_parsed.model.unique()
+
+    if len(models) == 1:
+        data_norm = get_normalizer(models[0]).normalize(data_parsed)
+
+    else:
+        # Normalize the events of each device model column-wise, and restore
+        # the event order
+        data_norm = pd.concat(
+            [get_normalizer(model).normalize(
+                data_parsed[data_parsed.model == model])
+             for model in models]).sort_index()
+
+    # The following section parses rotational acquisitions as a descrete
+    # number of stationary events.
+    if split_rotations:
+        data_norm = _split_rotations(data_norm, NR_ROT_STEPS)
 
     # Reset indexing
     data_norm = data_norm.reset_index(drop=True)
 
     return data_norm
+
+
+def _split_rotations(data_norm: pd.DataFrame,
+                     nr_rot_steps: int) -> pd.DataFrame:
+    """Split rotational acquisitions into a number of stationary events.
+
+    Each 'Rotational Acquisition' event is replaced by nr_rot_steps
+    sub-events, with primary and secondary angles linearly spaced from start
+    to end angle, and with the air kerma distributed equally between the
+    sub-events. The end angles of the sub-events are set to NaN, since each
+    sub-event is stationary. All events are expanded in one pass, by
+    repeating the rows of the rotational events.
+
+    Parameters
+    ----------
+    data_norm : pd.DataFrame
+        RDSR data, normalized for compliance with PySkinDose.
+    nr_rot_steps : int
+        Number of events to split each rotation into.
+
+    Returns
+    -------
+    pd.DataFrame
+        RDSR data where all rotational acquisitions has been split into
+        sub-events, indexed from 0.
+
+    """
+    rotational = (data_norm.acquisition_type ==
+                  "Rotational Acquisition").to_numpy()
+
+    if not rotational.any():
+        return data_norm
+
+    # Number of rows for each event after expansion
+    repeats = np.where(rotational, nr_rot_steps, 1)
+    data_norm = data_norm.loc[data_norm.index.repeat(repeats)]\
+        .reset_index(drop=True)
+
+    # Rotation step of each sub-event, from 0 to nr_rot_steps - 1
+    rot = np.repeat(rotational, repeats)
+    step = np.arange(len(data_norm)) - np.repeat(
+        np.cumsum(repeats) - repeats, repeats)
+    step = step[rot]
+
+    # Discretize beam angulation from start angle to stop angle,
+    # equivalent to np.linspace(start, stop, nr_rot_steps) for each rotation
+    for angle in ['PPA', 'PSA']:
+        start = data_norm[angle].to_numpy()[rot]
+        stop = data_norm[f"{angle}_end"].to_numpy()[rot]
+        delta = (stop - start) / max(nr_rot_steps - 1, 1)
+        data_norm.loc[rot, angle] = np.where(step == nr_rot_steps - 1, stop,
+                                             start + step * delta)
+
+    # Distribute the total air kerma equally to all events in the rotation.
+    data_norm.loc[rot, 'K_IRP'] = data_norm.K_IRP.to_numpy()[rot] / \
+        nr_rot_steps
+
+    data_norm.loc[rot, ['PPA_end', 'PSA_end']] = np.nan
+
+    return data_norm
@@ -6,9 +6,11 @@ import plotly.graph_objs as go
 import plotly.offline as ply
 from stl import mesh
 from typing import Dict
-from typing import List, Optional
+from typing import List, Optional, Union
 
+from .event_table import EventTable
 from .settings import PhantomDimensions
+from .spatial_index import CellGrid
 
 # valid phantom types
 VALID_PHANTOM_MODELS = ["plane", "cylinder", "human", "table", "pad"]
@@ -43,6 +45,10 @@ class Phantom:
         Empty array to store of reference position of the phantom cells after
         the phantom has been aligned in the geometry with the position_geometry
         function in geom_calc.py
+    cell_grid : CellGrid
+        Spatial index of the skin cells at the reference position, for fast
+        beam hit checks. Built by the position_geometry function in
+        geom_calc.py, None until then.
 
     Methods
     -------
@@ -96,6 +102,7 @@ class Phantom:
                              f"{'.'.join(VALID_PHANTOM_MODELS)}")
 
         self.r_ref: np.array
+        self.cell_grid: Optional[CellGrid] = None
 
         # creates a plane phantom (2D grid)
         if phantom_model == "plane":
@@ -347,13 +354,17 @@ class Phantom:
         """Store a reference position of the phantom.
 
         This function is supposed to be used to store the patient fixation
-        conducted in the function position_geometry
+        conducted in the function position_geometry. The reference position
+        is read-only, so that it can be shared between calculations, see
+        BeamBatch.
 
         """
-        r_ref = copy.copy(self.r)
+        r_ref = np.array(self.r, dtype=float)
+        r_ref.flags.writeable = False
         self.r_ref = r_ref
 
-    def position(self, data_norm: pd.DataFrame, i: int) -> None:
+    def position(self, data_norm: Union[pd.DataFrame, EventTable],
+                 i: int) -> None:
         """Position the phantom for a event by adding RDSR table displacement.
 
         Positions the phantom from reference position to actual position
@@ -361,9 +372,9 @@ class Phantom:
 
         Parameters
         ----------
-        data_norm : pd.DataFrame
+        data_norm : Union[pd.DataFrame, EventTable]
             Table containing dicom RDSR information from each irradiation event
-            See parse_data.py for more information.
+            See parse_data.py and event_table.py for more information.
 
         """
         self.r = copy.copy(self.r_ref)
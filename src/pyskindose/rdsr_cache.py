@@ -0,0 +1,304 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Default upper limit of the total size of all cached event tables
+DEFAULT_MAX_BYTES = 500 * 1024 ** 2
+
+
+def hash_file(file_path: str) -> str:
+    """Calculate the SHA-256 hash of the content of a file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest of the file content.
+
+    """
+    sha = hashlib.sha256()
+
+    with open(file_path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1024 ** 2), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+class RDSRCache:
+    """On-disk cache of normalized RDSR event data.
+
+    Each entry holds the normalized event table (data_norm) of one RDSR file,
+    keyed by the SOPInstanceUID of the report, a hash of the file content and
+    the version of the normalizer that produced it. Since the content hash
+    identifies the file, entries are looked up on content hash and normalizer
+    version, so that a cached file can be loaded without reading it with
+    pydicom. The tables are stored column by column in uncompressed .npz
+    files, and the least recently used entries are evicted when the total
+    size exceeds max_bytes.
+
+    The index is only modified under an exclusive file lock, so that several
+    processes can share one cache directory. The last access of an entry is
+    the modification time of its file, so that cache hits never rewrite the
+    index. Tables with columns that cannot be stored exactly, i.e. object
+    columns of other values than strings, are not cached.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Directory where the cached tables and the cache index are stored.
+    max_bytes : int
+        Upper limit of the total size of all cached tables, in bytes.
+
+    Methods
+    -------
+    get(content_hash, normalizer_version)
+        Load a cached event table, or None if not cached.
+    put(content_hash, normalizer_version, sop_instance_uid, data_norm)
+        Store an event table, and evict least recently used entries.
+    remove(sop_instance_uid)
+        Remove all entries of an RDSR instance.
+
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, 'index.json')
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the cache index, across processes."""
+        with open(os.path.join(self.cache_dir, 'index.lock'), 'a+b') as fp:
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            else:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+                else:
+                    fp.seek(0)
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @staticmethod
+    def _entry_name(content_hash: str, normalizer_version: int) -> str:
+        return f"{content_hash}_v{normalizer_version}.npz"
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            with open(self._index_path, 'r') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return dict()
+
+    def _write_index(self, index: Dict[str, dict]) -> None:
+        # Write to a temporary file and replace, so that readers never see
+        # a partially written index.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(index, fp)
+        os.replace(tmp_path, self._index_path)
+
+    def get(self, content_hash: str,
+            normalizer_version: int) -> Optional[pd.DataFrame]:
+        """Load a cached normalized event table.
+
+        Parameters
+        ----------
+        content_hash : str
+            Hash of the RDSR file content, see hash_file.
+        normalizer_version : int
+            Version of the normalizer that produced the table.
+
+        Returns
+        -------
+        pd.DataFrame
+            The cached event table, or None if it is not in the cache.
+
+        """
+        name = self._entry_name(content_hash, normalizer_version)
+        path = os.path.join(self.cache_dir, name)
+
+        if not os.path.exists(path):
+            return None
+
+        try:
+            data_norm = _load_table(path)
+        except (OSError, ValueError, KeyError):
+            # Entry removed or corrupted by another process
+            with self._lock():
+                index = self._read_index()
+                if name in index:
+                    self._remove_entry(index, name)
+                    self._write_index(index)
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return data_norm
+
+    def put(self, content_hash: str, normalizer_version: int,
+            sop_instance_uid: str, data_norm: pd.DataFrame) -> None:
+        """Store a normalized event table in the cache.
+
+        Parameters
+        ----------
+        content_hash : str
+            Hash of the RDSR file content, see hash_file.
+        normalizer_version : int
+            Version of the normalizer that produced the table.
+        sop_instance_uid : str
+            SOPInstanceUID of the RDSR.
+        data_norm : pd.DataFrame
+            RDSR data, normalized for compliance with PySkinDose.
+
+        """
+        name = self._entry_name(content_hash, normalizer_version)
+        path = os.path.join(self.cache_dir, name)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                _save_table(fp, data_norm)
+        except ValueError:
+            # Columns that cannot be stored exactly are not cached
+            os.remove(tmp_path)
+            return
+        size = os.path.getsize(tmp_path)
+
+        # Tables larger than the entire cache are not stored
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+
+        with self._lock():
+            os.replace(tmp_path, path)
+
+            index = self._read_index()
+            index[name] = dict(sop_instance_uid=str(sop_instance_uid),
+                               content_hash=content_hash,
+                               normalizer_version=normalizer_version,
+                               size=size)
+
+            self._evict(index)
+            self._write_index(index)
+
+    def remove(self, sop_instance_uid: str) -> None:
+        """Remove all cached tables of an RDSR instance.
+
+        Parameters
+        ----------
+        sop_instance_uid : str
+            SOPInstanceUID of the RDSR.
+
+        """
+        with self._lock():
+            index = self._read_index()
+
+            for name in [name for name, entry in index.items()
+                         if entry['sop_instance_uid'] == sop_instance_uid]:
+                self._remove_entry(index, name)
+
+            self._write_index(index)
+
+    def _remove_entry(self, index: Dict[str, dict], name: str) -> None:
+        del index[name]
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def _last_access(self, name: str) -> float:
+        """Time of the last access of an entry, see get."""
+        try:
+            return os.path.getmtime(os.path.join(self.cache_dir, name))
+        except OSError:
+            return 0.0
+
+    def _evict(self, index: Dict[str, dict]) -> None:
+        """Remove least recently used entries until within max_bytes."""
+        total = sum(entry['size'] for entry in index.values())
+
+        for name in sorted(index, key=self._last_access):
+            if total <= self.max_bytes:
+                break
+            total -= index[name]['size']
+            self._remove_entry(index, name)
+
+
+def _save_table(fp, data_norm: pd.DataFrame) -> None:
+    """Save a DataFrame column by column to an uncompressed .npz file.
+
+    Object columns (strings) are stored as unicode arrays together with a
+    mask of missing values, so that the file can be loaded without pickle.
+
+    Raises
+    ------
+    ValueError
+        If an object column holds other values than strings, e.g. tuples or
+        datetimes, which would not be loaded unchanged.
+
+    """
+    arrays = dict(columns=np.asarray(data_norm.columns, dtype=str))
+
+    for ind, column in enumerate(data_norm.columns):
+        values = data_norm[column].to_numpy()
+
+        if values.dtype.kind not in 'biufcmM':
+            missing = pd.isna(data_norm[column]).to_numpy()
+            if not all(isinstance(value, str) for value in values[~missing]):
+                raise ValueError(f"Column {column} holds values other than "
+                                 "strings, which cannot be cached")
+            values = np.where(missing, '', values.astype(str))
+            arrays[f"null_{ind}"] = missing
+
+        arrays[f"col_{ind}"] = values
+
+    np.savez(fp, **arrays)
+
+
+def _load_table(path: str) -> pd.DataFrame:
+    """Load a DataFrame saved with _save_table."""
+    with np.load(path, allow_pickle=False) as data:
+        columns = data['columns']
+        table = dict()
+
+        for ind, column in enumerate(columns):
+            values = data[f"col_{ind}"]
+
+            if f"null_{ind}" in data.files:
+                values = values.astype(object)
+                values[data[f"null_{ind}"]] = None
+
+            table[str(column)] = values
+
+    return pd.DataFrame(table, columns=[str(column) for column in columns])
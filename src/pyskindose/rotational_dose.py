@@ -0,0 +1,513 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, List, Optional, Tuple, Union
+
+from .beam_class import Beam
+from .event_table import EventTable
+from .geom_calc import create_table_triangles
+from .geom_calc import slab_path_length
+from .geom_calc import slab_thickness
+from .phantom_class import Phantom
+
+# Gauss-Legendre quadrature orders, tried in turn until the integral of each
+# in-beam interval has converged to the requested tolerance.
+QUADRATURE_ORDERS = [2, 4, 8, 16, 32]
+
+# Default relative error bound of the beam sweep integration
+DEFAULT_ROTATION_TOLERANCE = 1e-3
+
+# Conditions evaluated for each skin cell along the sweep, as bit flags:
+# inside each of the four beam faces, facing the X-ray source (always set for
+# the plane phantom) and with the beam blocked by the table. A cell is in the
+# beam when all of IN_BEAM are set.
+FACES = [1, 2, 4, 8]
+FRONT = 16
+BLOCKED = 32
+IN_BEAM = sum(FACES) | FRONT
+
+# Upper limit of the number of (cell, angle) pairs evaluated at once
+MAX_PAIRS = 10 ** 6
+
+
+def calculate_rotational_dose(data_norm: Union[pd.DataFrame, EventTable],
+                              event: int, patient: Phantom, table: Phantom,
+                              bs_interp: Callable[[np.array], np.array],
+                              k_tab: float,
+                              tolerance: float = DEFAULT_ROTATION_TOLERANCE,
+                              pad: Optional[Phantom] = None
+                              ) -> Tuple[np.array, np.array, np.array]:
+    """Calculate skin dose from a rotational acquisition as a beam sweep.
+
+    Instead of splitting the rotation into a fixed number of stationary
+    beams, the angular interval during which each skin cell lies within the
+    sweeping beam is located, and the air kerma is integrated over that
+    interval. The rotation is parametrized by t in [0, 1], with primary and
+    secondary angles linearly interpolated from start to end angle, and with
+    the IRP air kerma evenly distributed over t.
+
+    The sweep is sampled at a step of a quarter of the beam width, where it
+    is checked for all cells whether the cell is inside each beam face,
+    whether it faces the X-ray source, and whether the beam is blocked by
+    the table. Each change of condition between two samples is located by
+    bisection, separately for each condition. The inverse-square law,
+    backscatter and table corrections are then integrated over each interval
+    where the cell is in the beam with Gauss-Legendre quadrature, of
+    increasing order until converged. Where the table blocks the beam, k_tab
+    is raised to the path length through table and pad relative to their
+    thickness at each quadrature point, as for stationary beams. The
+    tolerance sets both the bisection depth (boundary error relative to the
+    beam width) and the relative quadrature error.
+
+    Parameters
+    ----------
+    data_norm : Union[pd.DataFrame, EventTable]
+        RDSR data, normalized for compliance with PySkinDose, with the
+        rotational acquisition not split into sub-events, i.e. with end
+        angles PPA_end and PSA_end, and with HVL appended.
+    event : int
+        Index of the rotational acquisition in data_norm.
+    patient : Phantom
+        Patient phantom, positioned with position_geometry. The phantom is
+        not moved, see _BeamSweep.
+    table : Phantom
+        Table phantom, positioned with position_geometry.
+    bs_interp : Callable[[np.array], np.array]
+        Backscatter correction of the event, as a function of field side
+        length, e.g. a spline of calculate_k_bs or the Backscatter of the
+        procedure bound to the event.
+    k_tab : float
+        Table correction factor of the event, at normal incidence.
+    tolerance : float, optional
+        Relative error bound of the integration, by default 1e-3.
+    pad : Phantom, optional
+        Pad phantom, positioned with position_geometry, included in the
+        path length through the table.
+
+    Returns
+    -------
+    hits : np.array
+        Indices of all patient skin cells that are hit during the rotation.
+    dose : np.array
+        Skin dose in mGy for each cell in hits, excluding medium correction.
+    field_area : np.array
+        Mean X-ray field area in cm^2 at each cell in hits, for medium
+        correction.
+
+    """
+    sweep = _BeamSweep(data_norm, event, patient, table, pad=pad)
+
+    # Coarse sampling of the sweep, at a quarter of the beam width
+    nr_samples = max(int(np.ceil(4 / sweep.beam_width)) + 1, 2)
+    t_grid = np.linspace(0, 1, nr_samples)
+
+    # Number of bisections to locate boundaries to within tolerance of the
+    # beam width, i.e. of the shortest in-beam interval.
+    nr_bisections = max(int(np.ceil(np.log2(1 / (4 * tolerance)))), 0)
+
+    # Intervals of t where a cell is in the beam: cell, start, stop, flags
+    intervals: List[Tuple[np.array, ...]] = []
+
+    chunk_size = max(MAX_PAIRS // nr_samples, 1)
+
+    for start in range(0, len(patient.r_ref), chunk_size):
+        cells = np.arange(start, min(start + chunk_size, len(patient.r_ref)))
+
+        flags, margins = sweep.evaluate(cells[:, np.newaxis],
+                                        t_grid[np.newaxis, :])
+
+        # Steps where a condition of FACES or FRONT may change twice, i.e.
+        # where its margin could reach zero and return within the step, given
+        # the largest rate of change of the margin of each cell.
+        reach = sweep.rate(cells)[:, np.newaxis, :] * \
+            np.diff(t_grid)[np.newaxis, :, np.newaxis]
+        twice = ((margins[:, :-1] <= 0) == (margins[:, 1:] <= 0)) & \
+            (np.abs(margins[:, :-1]) + np.abs(margins[:, 1:]) <= reach)
+
+        # Steps between samples where the cell may be in the beam, i.e. where
+        # each condition holds at either end of the step, or may hold within
+        may_hold = flags[:, :-1] | flags[:, 1:] | \
+            twice @ np.array(FACES + [FRONT])
+        row, step = np.nonzero((may_hold & IN_BEAM) == IN_BEAM)
+        step_id = np.full(flags[:, :-1].shape, -1)
+        step_id[row, step] = np.arange(len(row))
+
+        # Each condition is tracked separately, since the intersection of
+        # their intervals can be much shorter than the sampling step.
+        piece_id = [np.repeat(np.arange(len(row)), 2)]
+        piece_t = [np.column_stack((t_grid[step], t_grid[step + 1])).ravel()]
+
+        for condition, flag in enumerate(FACES + [FRONT, BLOCKED]):
+            changed = (flags[:, :-1] ^ flags[:, 1:]) & flag
+            b_row, b_step = np.nonzero((changed > 0) & (step_id >= 0))
+            b_id = step_id[b_row, b_step]
+            low = t_grid[b_step]
+            high = t_grid[b_step + 1]
+
+            # Brackets of boundaries within steps where the condition is the
+            # same at both ends
+            if flag != BLOCKED:
+                t_row, t_step = np.nonzero(twice[..., condition] &
+                                           (step_id >= 0))
+                t_id, t_low, t_high = _double_crossings(
+                    sweep, cells[t_row], condition, t_grid[t_step],
+                    t_grid[t_step + 1], margins[t_row, t_step, condition],
+                    margins[t_row, t_step + 1, condition], nr_bisections)
+                b_id = np.concatenate((b_id, step_id[t_row, t_step][t_id]))
+                b_row = np.concatenate((b_row, t_row[t_id]))
+                low = np.concatenate((low, t_low))
+                high = np.concatenate((high, t_high))
+
+            # Locate condition boundaries by bisection
+            flag_low = sweep.classify(cells[b_row], low) & flag
+
+            for _ in range(nr_bisections):
+                mid = (low + high) / 2
+                move_low = \
+                    (sweep.classify(cells[b_row], mid) & flag) == flag_low
+                low = np.where(move_low, mid, low)
+                high = np.where(move_low, high, mid)
+
+            piece_id.append(b_id)
+            piece_t.append((low + high) / 2)
+
+        # Split each step into pieces at all boundaries within the step
+        piece_id = np.concatenate(piece_id)
+        piece_t = np.concatenate(piece_t)
+        order = np.lexsort((piece_t, piece_id))
+        piece_id, piece_t = piece_id[order], piece_t[order]
+
+        same_step = piece_id[:-1] == piece_id[1:]
+        piece_cell = cells[row[piece_id[:-1][same_step]]]
+        t_start = piece_t[:-1][same_step]
+        t_stop = piece_t[1:][same_step]
+
+        piece_flags = sweep.classify(piece_cell, (t_start + t_stop) / 2)
+        in_beam = ((piece_flags & IN_BEAM) == IN_BEAM) & (t_stop > t_start)
+
+        intervals.append((piece_cell[in_beam], t_start[in_beam],
+                          t_stop[in_beam], piece_flags[in_beam]))
+
+    cell, t_start, t_stop, flags = [np.concatenate(column) for column in
+                                    zip(*intervals)]
+
+    # Integrate inverse-square law, backscatter and table correction over
+    # each interval, with increasing quadrature order until converged.
+    blocked = (flags & BLOCKED) > 0
+    integral, area = _integrate(sweep, bs_interp, cell, t_start, t_stop,
+                                QUADRATURE_ORDERS[0], k_tab, blocked)
+
+    for order in QUADRATURE_ORDERS[1:]:
+        previous = integral
+        integral, area = _integrate(sweep, bs_interp, cell, t_start, t_stop,
+                                    order, k_tab, blocked)
+        if np.all(np.abs(integral - previous) <= tolerance * np.abs(integral)):
+            break
+
+    hits, cell_ind = np.unique(cell, return_inverse=True)
+    duration = np.bincount(cell_ind, weights=t_stop - t_start)
+
+    dose = data_norm.K_IRP[event] * np.bincount(cell_ind, weights=integral)
+    field_area = np.bincount(cell_ind, weights=area) / duration
+
+    return hits, dose, field_area
+
+
+def _double_crossings(sweep: '_BeamSweep', cells: np.array, condition: int,
+                      low: np.array, high: np.array, margin_low: np.array,
+                      margin_high: np.array, nr_bisections: int
+                      ) -> Tuple[np.array, np.array, np.array]:
+    """Find condition changes within steps where it holds at both ends.
+
+    Each step is halved until the margin of the condition changes sign at
+    the midpoint, or until the margins at the ends of each half rule out a
+    zero within it, see _BeamSweep.rate. Steps are halved nr_bisections
+    times at most, so that intervals shorter than the boundary tolerance
+    are neglected, as in calculate_rotational_dose.
+
+    Returns
+    -------
+    step : np.array
+        Index of the step of each bracket, in the input arrays.
+    low, high : np.array
+        Brackets of t that hold exactly one change of the condition.
+
+    """
+    rate = sweep.rate(cells)[:, condition]
+    step = np.arange(len(cells))
+    brackets: List[Tuple[np.array, ...]] = []
+
+    for _ in range(nr_bisections):
+        if not len(step):
+            break
+
+        mid = (low + high) / 2
+        margin_mid = sweep.margins(cells[step], mid)[:, condition]
+
+        # A sign change at the midpoint brackets a change on either side
+        crossed = (margin_mid <= 0) != (margin_low <= 0)
+        brackets.append((np.tile(step[crossed], 2),
+                         np.concatenate((low[crossed], mid[crossed])),
+                         np.concatenate((mid[crossed], high[crossed]))))
+
+        # Halves that may still hold two changes
+        step, low, high, margin_low, margin_high, rate = [
+            np.concatenate(pair) for pair in zip(
+                (step, low, mid, margin_low, margin_mid, rate),
+                (step, mid, high, margin_mid, margin_high, rate))]
+        keep = np.tile(~crossed, 2) & \
+            (np.abs(margin_low) + np.abs(margin_high) <= rate * (high - low))
+        step, low, high, margin_low, margin_high, rate = \
+            step[keep], low[keep], high[keep], margin_low[keep], \
+            margin_high[keep], rate[keep]
+
+    if not brackets:
+        return np.zeros(0, dtype=int), np.zeros(0), np.zeros(0)
+
+    step, low, high = [np.concatenate(column) for column in zip(*brackets)]
+
+    return step, low, high
+
+
+def _integrate(sweep: '_BeamSweep',
+               bs_interp: Callable[[np.array], np.array], cell: np.array,
+               t_start: np.array, t_stop: np.array, order: int,
+               k_tab: float, blocked: np.array
+               ) -> Tuple[np.array, np.array]:
+    """Integrate k_isq * k_bs * k_tab, and field area, over intervals of t.
+
+    k_tab is raised to the relative path length through table and pad, see
+    _BeamSweep.table_path, in the blocked intervals only.
+    """
+    x, w = np.polynomial.legendre.leggauss(order)
+
+    half_length = (t_stop - t_start)[:, np.newaxis] / 2
+    t = t_start[:, np.newaxis] + half_length * (x + 1)
+
+    distance = sweep.distance(cell[:, np.newaxis], t)
+
+    # Inverse-square law correction and field area at each skin cell
+    k_isq = np.square(sweep.d_ref / distance)
+    field_area = sweep.field_area_ref * np.square(distance / sweep.dsd)
+    k_bs = bs_interp(np.sqrt(field_area))
+
+    # Table and pad transmission along the oblique path of each beam
+    k_table = np.ones_like(k_isq)
+    if k_tab != 1 and blocked.any():
+        k_table[blocked] = k_tab ** sweep.table_path(
+            cell[blocked, np.newaxis], t[blocked])
+
+    weights = half_length * w
+
+    return np.sum(weights * k_isq * k_bs * k_table, axis=1), \
+        np.sum(weights * field_area, axis=1)
+
+
+class _BeamSweep:
+    """Beam geometry of a rotational acquisition as a function of t.
+
+    Cells are transformed to the beam frame, i.e. the frame of a beam with
+    zero angulation, where the beam faces are fixed. For angles ap1 and ap2,
+    the beam frame coordinates are R2(ap2) R1(ap1) r, see Beam.
+
+    The phantoms stay in their reference position. Instead, the X-ray source
+    is moved by the inverse table displacement of the event.
+
+    """
+
+    def __init__(self, data_norm: Union[pd.DataFrame, EventTable],
+                 event: int, patient: Phantom, table: Phantom,
+                 pad: Optional[Phantom] = None):
+
+        # Beam of zero angulation, with the collimation of the event
+        beam = Beam(data_norm, event=event, plot_setup=True)
+        self.source = beam.r[0, :]
+        self.N = beam.N
+
+        self.ap1 = np.deg2rad(data_norm.PPA[event])
+        self.ap2 = np.deg2rad(data_norm.PSA[event])
+        self.dap1 = np.deg2rad(data_norm.PPA_end[event]) - self.ap1
+        self.dap2 = np.deg2rad(data_norm.PSA_end[event]) - self.ap2
+
+        # Beam width in the sweep direction, in units of t
+        sweep_angle = np.hypot(self.dap1, self.dap2)
+        beam_angle = 2 * np.arctan(
+            min(data_norm.FS_lat[event], data_norm.FS_long[event]) / 2 /
+            data_norm.DSD[event])
+        self.beam_width = beam_angle / sweep_angle if sweep_angle else 1.0
+
+        self.r = patient.r_ref
+        self.n = patient.n if patient.phantom_model != "plane" else None
+
+        # Table displacement of the event, see Phantom.position
+        self.offset = np.array([data_norm.dLONG[event],
+                                data_norm.dVERT[event],
+                                data_norm.dLAT[event]], dtype=float)
+
+        self.triangles = create_table_triangles(table, offset=np.zeros(3))
+
+        # Table and pad, and their thickness, i.e. path length at normal
+        # incidence
+        self.slabs = [table] if pad is None else [table, pad]
+        self.normal_thickness = sum(slab_thickness(slab)
+                                    for slab in self.slabs)
+
+        self.d_ref = data_norm.DSIRP[event]
+        self.dsd = data_norm.DSD[event]
+        self.field_area_ref = data_norm.FS_lat[event] * \
+            data_norm.FS_long[event]
+
+    def rotation(self, t: np.array) -> np.array:
+        """Rotation matrices R2 R1 from world to beam frame, at each t."""
+        ap1 = self.ap1 + t * self.dap1
+        ap2 = self.ap2 + t * self.dap2
+        c1, s1 = np.cos(ap1), np.sin(ap1)
+        c2, s2 = np.cos(ap2), np.sin(ap2)
+        zero = np.zeros_like(c1)
+
+        return np.stack([
+            np.stack([c1, s1, zero], axis=-1),
+            np.stack([-c2 * s1, c2 * c1, -s2], axis=-1),
+            np.stack([-s2 * s1, s2 * c1, c2], axis=-1)], axis=-2)
+
+    def apex(self, rotation: np.array) -> np.array:
+        """X-ray source in beam frame, moved by the inverse table displacement.
+
+        Parameters
+        ----------
+        rotation : np.array
+            Rotation matrices from world to beam frame, see rotation.
+
+        Returns
+        -------
+        np.array
+            Position of the X-ray source relative to the phantoms in their
+            reference position, for each rotation.
+
+        """
+        return self.source - rotation @ self.offset
+
+    def distance(self, cells: np.array, t: np.array) -> np.array:
+        """Distance from X-ray source to cells, at each t."""
+        rotation = self.rotation(t)
+        v = np.einsum('...ij,...j->...i', rotation, self.r[cells]) - \
+            self.apex(rotation)
+        return np.linalg.norm(v, axis=-1)
+
+    def margins(self, cells: np.array, t: np.array) -> np.array:
+        """Margins of the conditions FACES and FRONT, at each t.
+
+        The margin of each beam face is the distance of the cell outside of
+        the face times the length of the face normal. The margin of
+        FRONT is the component of the vector from the X-ray source to the
+        cell along the cell normal, -inf for the plane phantom. A condition
+        holds where its margin is <= 0.
+
+        """
+        return self._margins(cells, t)[0]
+
+    def _margins(self, cells: np.array, t: np.array
+                 ) -> Tuple[np.array, np.array]:
+        """Margins, see margins, and rotation matrices at each t."""
+        cells, t = np.broadcast_arrays(cells, t)
+        rotation = self.rotation(t)
+
+        # Vectors from X-ray source to cells, in beam frame
+        v = np.einsum('...ij,...j->...i', rotation, self.r[cells]) - \
+            self.apex(rotation)
+
+        margins = np.empty(cells.shape + (len(FACES) + 1,))
+        margins[..., :len(FACES)] = np.einsum('...j,ij->...i', v, self.N)
+
+        # if patient phantom is 3D, skin cells must face the X-ray source
+        if self.n is not None:
+            n = np.einsum('...ij,...j->...i', rotation, self.n[cells])
+            margins[..., -1] = np.einsum('...j,...j->...', v, n)
+        else:
+            margins[..., -1] = -np.inf
+
+        return margins, rotation
+
+    def table_path(self, cells: np.array, t: np.array) -> np.array:
+        """Path length through table and pad relative to normal incidence.
+
+        The path length is calculated with slab_path_length, with the table
+        and pad in the reference position, like the cells.
+
+        """
+        cells, t = np.broadcast_arrays(cells, t)
+
+        # Source position in the reference frame of the phantoms
+        source = np.einsum('...ji,j->...i', self.rotation(t), self.source) - \
+            self.offset
+        source = source.reshape(-1, 3)
+        stop = self.r[cells].reshape(-1, 3)
+
+        length = sum(slab_path_length(source, stop, slab, offset=np.zeros(3))
+                     for slab in self.slabs)
+        if self.normal_thickness > 0:
+            length /= self.normal_thickness
+
+        return length.reshape(cells.shape)
+
+    def rate(self, cells: np.array) -> np.array:
+        """Upper bound of the rate of change of each margin with t.
+
+        The rotation R2 R1 turns any vector x by at most
+        (|dap1| + |dap2|) |x| per unit of t. The face margins change with
+        the rotation of the cell around the isocenter, and the margin of
+        FRONT with the rotation of the cell normal relative to the X-ray
+        source.
+
+        """
+        omega = abs(self.dap1) + abs(self.dap2)
+        rate = np.zeros((len(cells), len(FACES) + 1))
+
+        radius = np.linalg.norm(self.r[cells] + self.offset, axis=-1)
+        rate[:, :len(FACES)] = omega * radius[:, np.newaxis] * \
+            np.linalg.norm(self.N, axis=-1)
+
+        if self.n is not None:
+            rate[:, -1] = omega * np.linalg.norm(self.source) * \
+                np.linalg.norm(self.n[cells], axis=-1)
+
+        return rate
+
+    def classify(self, cells: np.array, t: np.array) -> np.array:
+        """Classify cells at each t, as bit flags FACES, FRONT and BLOCKED.
+
+        Since all beam faces contain the X-ray source, each face condition
+        varies slowly with t, regardless of the distance between the cell
+        and the isocenter.
+
+        """
+        return self.evaluate(cells, t)[0]
+
+    def evaluate(self, cells: np.array, t: np.array
+                 ) -> Tuple[np.array, np.array]:
+        """Flags, see classify, and margins, see margins, at each t."""
+        cells, t = np.broadcast_arrays(cells, t)
+        margins, rotation = self._margins(cells, t)
+
+        flags = (margins <= 0) @ np.array(FACES + [FRONT])
+
+        # Source position in world frame
+        source = np.einsum('...ji,j->...i', rotation, self.source)
+        source = source.reshape(-1, 3)
+        stop = self.r[cells].reshape(-1, 3)
+
+        if not len(stop):
+            return flags, margins
+
+        # The table triangles are in the reference position, like the cells
+        triangle_b_l, triangle_t_r = self.triangles
+        start = source - self.offset
+        blocked = np.logical_or(
+            triangle_b_l.check_intersection(start=start, stop=stop),
+            triangle_t_r.check_intersection(start=start, stop=stop))
+
+        # Over-table irradiation is never blocked by the table
+        blocked &= np.dot(-source, triangle_b_l.n) >= 0
+
+        flags += blocked.reshape(flags.shape) * BLOCKED
+
+        return flags, margins
@@ -31,6 +31,33 @@ class PyskindoseSettings:
     plot_event_index : int
         Index for the event that should be plotted when mode="plot_event" is
         chosen.
+    estimate_k_tab : bool
+        Set to True to use an estimated table correction k_tab_val instead of
+        measured table corrections.
+    k_tab_val : float
+        Value of the estimated table correction.
+    rdsr_cache_dir : str
+        Directory where normalized RDSR data is cached between runs. Optional,
+        caching is disabled if omitted or null.
+    rotation_tolerance : float
+        Relative error bound for calculating rotational acquisitions as a
+        continuous beam sweep. Optional, if omitted or null, rotational
+        acquisitions are split into a fixed number of stationary events.
+    k_bs_step : float
+        Field side length step in cm of quantized backscatter lookup tables.
+        Optional, if omitted or null, the backscatter correction is
+        interpolated for each skin cell.
+    geometry_tolerance : float
+        Quantization step in cm of the table displacements, field sizes and
+        source distances, so that events with nearly identical geometry
+        share one calculation of the hit skin cells. Optional, if omitted or
+        null, these are matched exactly. The dose error of shared
+        geometries is not bounded, see GeometryCache, so null is the only
+        safe default.
+    geometry_angle_tolerance : float
+        Quantization step in degrees of the angles PPA and PSA, see
+        geometry_tolerance. Optional, if omitted or null, angles are
+        matched exactly.
     phantom : PhantomSettings
         Instance of class PhantomSettings containing all phantom related
         settings.
@@ -58,6 +85,11 @@ class PyskindoseSettings:
         self.plot_event_index = tmp['plot_event_index']
         self.estimate_k_tab = tmp['estimate_k_tab']
         self.k_tab_val = tmp['k_tab_val']
+        self.rdsr_cache_dir = tmp.get('rdsr_cache_dir')
+        self.rotation_tolerance = tmp.get('rotation_tolerance')
+        self.k_bs_step = tmp.get('k_bs_step')
+        self.geometry_tolerance = tmp.get('geometry_tolerance')
+        self.geometry_angle_tolerance = tmp.get('geometry_angle_tolerance')
         self.phantom = PhantomSettings(ptm_dim=tmp['phantom'])
 
 
@@ -0,0 +1,190 @@
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Default average number of skin cells in each grid voxel
+DEFAULT_CELLS_PER_VOXEL = 32
+
+# Relative tolerance of the voxel classification. Voxels closer than this
+# to a beam face are tested cell by cell, so that rounding never moves a
+# cell across the face.
+FACE_TOLERANCE = 1e-9
+
+
+class CellGrid:
+    """Uniform grid over the skin cells of a phantom, for frustum culling.
+
+    The skin cells are bucketed into the voxels of a uniform grid over the
+    reference position of the phantom, and the tight bounding box of the
+    cells in each non-empty voxel is stored. A beam is tested against the
+    bounding boxes first: voxels entirely outside of any beam face are
+    rejected and voxels entirely inside all faces are accepted, so that only
+    the cells of voxels intersected by a beam face are tested one by one.
+
+    The phantom is only translated from its reference position between
+    events, see Phantom.position, so the grid is never rebuilt. Instead, the
+    X-ray source is moved by the opposite translation, into the reference
+    position of the grid.
+
+    Attributes
+    ----------
+    r : np.array
+        Reference position of the skin cells, of shape (cells, 3).
+    order : np.array
+        Cell indices, sorted by voxel.
+    starts : np.array
+        Start of the cells of each non-empty voxel in order, followed by the
+        number of cells.
+    center : np.array
+        Center of the bounding box of each non-empty voxel.
+    half : np.array
+        Half side lengths of the bounding box of each non-empty voxel.
+
+    """
+
+    def __init__(self, r: np.array,
+                 cells_per_voxel: int = DEFAULT_CELLS_PER_VOXEL):
+
+        if cells_per_voxel < 1:
+            raise ValueError("cells_per_voxel must be at least 1")
+
+        self.r = np.array(r, dtype=float)
+        self.r.flags.writeable = False
+
+        lower = self.r.min(axis=0)
+        extent = self.r.max(axis=0) - lower
+
+        # Voxel side length, so that the bounding box of the phantom holds
+        # about one voxel per cells_per_voxel cells. Flat phantoms are only
+        # divided along their non-zero dimensions.
+        nr_voxels = max(1, len(self.r) // cells_per_voxel)
+        spanned = extent[extent > 0]
+        size = (np.prod(spanned) / nr_voxels) ** (1 / len(spanned)) \
+            if len(spanned) else 1.0
+
+        shape = np.maximum(1, np.ceil(extent / size)).astype(int)
+        voxel = np.minimum(((self.r - lower) / size).astype(int), shape - 1)
+        key = np.ravel_multi_index(voxel.T, shape)
+
+        self.order = np.argsort(key, kind='stable')
+        _, starts = np.unique(key[self.order], return_index=True)
+        self.starts = np.append(starts, len(self.r))
+
+        sorted_r = self.r[self.order]
+        box_lower = np.minimum.reduceat(sorted_r, starts, axis=0)
+        box_upper = np.maximum.reduceat(sorted_r, starts, axis=0)
+        self.center = (box_lower + box_upper) / 2
+        self.half = (box_upper - box_lower) / 2
+
+        self._scale = float(np.abs(self.r).max(initial=0) + extent.max() + 1)
+
+    def offset(self, r: np.array) -> Optional[np.array]:
+        """Translation of the phantom from the reference position of the grid.
+
+        Parameters
+        ----------
+        r : np.array
+            Current position of the skin cells.
+
+        Returns
+        -------
+        np.array
+            Translation of the phantom, or None if r is not a translation
+            of the reference position, e.g. if the phantom has been rotated
+            since the grid was built.
+
+        """
+        if np.shape(r) != self.r.shape:
+            return None
+
+        # All cells must agree on the translation. Checking a few cells is
+        # not enough, since a rotation about an axis through those cells
+        # leaves them in place.
+        displacement = np.asarray(r, dtype=float) - self.r
+        translation = displacement[0]
+        if not np.allclose(displacement, translation, rtol=0,
+                           atol=FACE_TOLERANCE * self._scale):
+            return None
+
+        return translation
+
+    def cull(self, source: np.array, normals: np.array,
+             offset: np.array) -> Tuple[np.array, np.array]:
+        """Classify the cells of the grid against the faces of a beam.
+
+        A cell is inside the beam if np.dot(r - source, normal) <= 0 for the
+        normal of each face.
+
+        Parameters
+        ----------
+        source : np.array
+            (x,y,z) coordinates to the X-ray source.
+        normals : np.array
+            Normal vector of each beam face, pointing out of the beam.
+        offset : np.array
+            Translation of the phantom from the reference position, see
+            offset.
+
+        Returns
+        -------
+        Tuple[np.array, np.array]
+            Indices of the cells in voxels inside all beam faces, and of the
+            cells in voxels intersected by a beam face, which must be tested
+            one by one.
+
+        """
+        return self.cull_beams(np.reshape(source, (1, 3)),
+                               np.atleast_2d(normals)[np.newaxis],
+                               np.reshape(offset, (1, 3)))[0]
+
+    def cull_beams(self, source: np.array, normals: np.array,
+                   offset: np.array) -> List[Tuple[np.array, np.array]]:
+        """Classify the cells of the grid against the faces of many beams.
+
+        The bounding boxes are tested against all beams in one broadcast
+        operation, see cull.
+
+        Parameters
+        ----------
+        source : np.array
+            (x,y,z) coordinates to the X-ray source of each beam, of shape
+            (beams, 3).
+        normals : np.array
+            Normal vectors of the beam faces, of shape (beams, faces, 3).
+        offset : np.array
+            Translation of the phantom from the reference position for each
+            beam, of shape (beams, 3).
+
+        Returns
+        -------
+        List[Tuple[np.array, np.array]]
+            Indices of the accepted cells and of the cells to test, see cull,
+            for each beam.
+
+        """
+        # Signed distance from each face to the bounding box centers, in
+        # units of the length of each normal, and the largest deviation from
+        # it within the bounding boxes
+        apex = source - offset
+        distance = np.matmul(self.center, normals.transpose(0, 2, 1)) - \
+            np.einsum('bk,bfk->bf', apex, normals)[:, np.newaxis]
+        radius = np.matmul(self.half, np.abs(normals).transpose(0, 2, 1))
+        tolerance = FACE_TOLERANCE * self._scale * \
+            np.linalg.norm(normals, axis=-1)[:, np.newaxis]
+
+        outside = (distance - radius > tolerance).any(axis=-1)
+        inside = (distance + radius < -tolerance).all(axis=-1)
+
+        return [(self._cells(inside[beam]),
+                 self._cells(~outside[beam] & ~inside[beam]))
+                for beam in range(len(apex))]
+
+    def _cells(self, voxels: np.array) -> np.array:
+        """Indices of all cells in the selected voxels."""
+        starts = self.starts[:-1][voxels]
+        counts = self.starts[1:][voxels] - starts
+
+        # Position in order of each cell, voxel by voxel
+        first = np.cumsum(counts) - counts
+        position = np.arange(counts.sum()) + np.repeat(starts - first, counts)
+
+        return self.order[position]
@@ -0,0 +1,62 @@
+"""Benchmark of backscatter correction of skin cells.
+
+Compares the per event spline evaluation of calculate_k_bs, i.e.
+bs_interp[event](fsl), with Backscatter and QuantizedBackscatter, for a
+procedure of many fluoroscopy events with few distinct beam qualities.
+
+Run with: python tests/benchmarks/benchmark_backscatter.py
+"""
+from pathlib import Path
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute() / 'src'))
+
+from pyskindose.backscatter import Backscatter  # noqa: E402
+from pyskindose.backscatter import QuantizedBackscatter  # noqa: E402
+from pyskindose.corrections import calculate_k_bs  # noqa: E402
+
+NR_EVENTS = 2000
+NR_QUALITIES = 40
+NR_CELLS = 2000
+NR_REPEATS = 3
+
+
+def main():
+    rng = np.random.default_rng(0)
+    quality = rng.integers(0, NR_QUALITIES, NR_EVENTS)
+    data_norm = pd.DataFrame({'kVp': 60.0 + quality,
+                              'HVL': 3.0 + 0.1 * quality})
+    fsl = [rng.uniform(5, 30, NR_CELLS) for _ in range(NR_EVENTS)]
+
+    def splines():
+        bs_interp = calculate_k_bs(data_norm)
+        return [bs_interp[event](fsl[event]) for event in range(NR_EVENTS)]
+
+    def batched():
+        backscatter = Backscatter(data_norm.kVp, data_norm.HVL)
+        return [backscatter(fsl[event], event) for event in range(NR_EVENTS)]
+
+    def quantized():
+        backscatter = QuantizedBackscatter(
+            Backscatter(data_norm.kVp, data_norm.HVL))
+        return [backscatter(fsl[event], event) for event in range(NR_EVENTS)]
+
+    reference = np.concatenate(splines())
+    error = np.abs(np.concatenate(quantized()) - reference).max()
+
+    print(f"{NR_EVENTS} events, {NR_QUALITIES} beam qualities, "
+          f"{NR_CELLS} cells per event")
+    for name, func in [('bs_interp[event](fsl)', splines),
+                       ('Backscatter', batched),
+                       ('QuantizedBackscatter', quantized)]:
+        seconds = min(timeit.repeat(func, number=1, repeat=NR_REPEATS))
+        print(f"{name:>24}: {seconds:.3f} s")
+    print(f"QuantizedBackscatter max error: {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark rdsr_parser against the number of irradiation events.
+
+Run with `python tests/benchmarks/benchmark_rdsr_parser.py`. A synthetic RDSR
+is created by repeating the irradiation events of the example file S1.dcm.
+The time per event should stay constant as the event count grows, i.e. the
+parser should scale linearly with the number of events.
+"""
+from pathlib import Path
+import copy
+import os
+import sys
+import timeit
+
+import pydicom
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.joinpath('src').absolute()))
+
+from pyskindose.parse_data import rdsr_parser  # noqa: E402
+
+RDSR_PATH = os.path.join(str(P), 'src', 'pyskindose', 'example_data', 'RDSR',
+                         'S1.dcm')
+
+EVENT_COUNTS = [250, 500, 1000, 2000, 4000]
+
+
+def create_rdsr(data_raw: pydicom.FileDataset,
+                nr_events: int) -> pydicom.FileDataset:
+    """Create a copy of data_raw with nr_events irradiation events."""
+    events = [content for content in data_raw.ContentSequence
+              if content.ConceptNameCodeSequence[0].CodeMeaning ==
+              'Irradiation Event X-Ray Data']
+
+    data = copy.copy(data_raw)
+    data.ContentSequence = [events[ind % len(events)]
+                            for ind in range(nr_events)]
+    return data
+
+
+def main():
+    data_raw = pydicom.dcmread(RDSR_PATH)
+
+    print(f"{'events':>8} {'total [s]':>10} {'per event [us]':>15}")
+    for nr_events in EVENT_COUNTS:
+        data = create_rdsr(data_raw, nr_events)
+        elapsed = min(timeit.repeat(lambda: rdsr_parser(data), number=1,
+                                    repeat=3))
+        print(f"{nr_events:>8} {elapsed:>10.3f} "
+              f"{1e6 * elapsed / nr_events:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import sys
+
+from pyskindose.backscatter import Backscatter
+from pyskindose.backscatter import FSL_RANGE
+from pyskindose.backscatter import QuantizedBackscatter
+from pyskindose.corrections import calculate_k_bs
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+DATA_NORM = pd.DataFrame({'kVp': [80, 80, 63.5, 80, 120],
+                          'HVL': [4.99, 4.99, 2.5, 6.1, 8.0]})
+
+
+def test_backscatter_unique_beam_qualities():
+    # Tests if one spline is built per unique (kVp, HVL)
+    backscatter = Backscatter(kvp=DATA_NORM.kVp, hvl=DATA_NORM.HVL)
+
+    assert len(backscatter.quality) == 4
+    assert backscatter.event_quality[0] == backscatter.event_quality[1]
+    assert backscatter.coefficients.shape == (4, 4, 4)
+
+
+def test_backscatter_matches_event_splines():
+    # Tests if the batched evaluation equals the spline of each event, also
+    # when extrapolating outside of the tabulated field sizes
+    backscatter = Backscatter(kvp=DATA_NORM.kVp, hvl=DATA_NORM.HVL)
+    bs_interp = calculate_k_bs(DATA_NORM)
+    fsl = np.array([2.0, 5.0, 7.3, 10.0, 22.0, 35.0, 50.0])
+
+    for event in range(len(DATA_NORM)):
+        np.testing.assert_allclose(backscatter(fsl, event),
+                                   bs_interp[event](fsl), rtol=1e-12)
+
+
+def test_backscatter_concatenated_events():
+    # Tests if cells of several events are evaluated in one call, also for
+    # a 2D array of field sizes
+    backscatter = Backscatter(kvp=DATA_NORM.kVp, hvl=DATA_NORM.HVL)
+    fsl = np.array([[6.0, 12.0, 30.0], [6.0, 12.0, 30.0]])
+    event = np.array([[0, 2, 4], [3, 3, 1]])
+
+    expected = [[backscatter(fsl[i, j], event[i, j]) for j in range(3)]
+                for i in range(2)]
+
+    np.testing.assert_array_equal(backscatter(fsl, event), expected)
+
+
+def test_quantized_backscatter_within_max_error():
+    # Tests if the lookup table deviates from the spline by at most the
+    # documented maximum error, and evaluates outside of the table range
+    # with the spline
+    backscatter = Backscatter(kvp=DATA_NORM.kVp, hvl=DATA_NORM.HVL)
+    quantized = QuantizedBackscatter(backscatter, step=0.1)
+
+    rng = np.random.default_rng(0)
+    fsl = rng.uniform(FSL_RANGE[0], FSL_RANGE[1], 10000)
+    event = rng.integers(0, len(DATA_NORM), 10000)
+
+    error = np.abs(quantized(fsl, event) - backscatter(fsl, event))
+    assert 0 < error.max() <= quantized.max_error
+
+    fsl = np.array([0.5, 70.0])
+    np.testing.assert_array_equal(quantized(fsl, 2), backscatter(fsl, 2))
+
+    # Smaller step, smaller error
+    assert QuantizedBackscatter(backscatter, step=0.01).max_error < \
+        quantized.max_error / 5
@@ -0,0 +1,144 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import sys
+
+from pyskindose.beam_class import Beam
+from pyskindose.beam_class import BeamBatch
+from pyskindose.geom_calc import position_geometry
+from pyskindose.parse_data import rdsr_normalizer
+from pyskindose.phantom_class import Phantom
+from pyskindose.settings import PhantomDimensions
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+
+def test_beam_check_hit():
+    # Tests if the hit index array holds the cells inside all four beam
+    # faces and facing the X-ray source, compared with a test of each cell
+    # separately
+    dim = PhantomDimensions(dict(
+        plane_length=120, plane_width=40, plane_resolution='sparse',
+        cylinder_length=150, cylinder_radii_a=20, cylinder_radii_b=10,
+        cylinder_resolution='sparse', table_thickness=5, table_length=210,
+        table_width=50, pad_thickness=4, pad_length=210, pad_width=50,
+        units='cm'))
+    data_norm = rdsr_normalizer(pd.DataFrame(dict(
+        model=['AXIOMArtis'],
+        IrradiationEventType=['Fluoroscopy'],
+        AcquisitionPlane=['Single Plane'],
+        CollimatedFieldArea_m2=[0.04],
+        DistanceSourcetoDetector_mm=[1200.0],
+        DistanceSourcetoIsocenter_mm=[785.0],
+        DoseRP_Gy=[0.1],
+        KVP_kV=[80.0],
+        PositionerPrimaryAngle_deg=[30.0],
+        PositionerSecondaryAngle_deg=[10.0],
+        TableLateralPosition_mm=[1000.0],
+        TableLongitudinalPosition_mm=[0.0],
+        TableHeightPosition_mm=[200.0],
+        XRayFilterType=['Strip filter'],
+        XRayFilterThicknessMaximum_mm=[0.1])))
+    beam = Beam(data_norm, event=0, plot_setup=False)
+
+    patient = Phantom(phantom_model='cylinder', phantom_dim=dim)
+    table = Phantom(phantom_model='table', phantom_dim=dim)
+    pad = Phantom(phantom_model='pad', phantom_dim=dim)
+    position_geometry(patient=patient, table=table, pad=pad,
+                      pad_thickness=dim.pad_thickness,
+                      patient_offset=[0, 0, -15])
+    patient.position(data_norm, 0)
+
+    expected = []
+    for cell in range(len(patient.r)):
+        v = patient.r[cell] - beam.r[0, :]
+        inside = all(np.dot(v, normal) <= 0 for normal in beam.N)
+        if inside and np.dot(v, patient.n[cell]) <= 0:
+            expected.append(cell)
+
+    test = beam.check_hit(patient)
+
+    assert len(expected) > 0
+    assert test.dtype.kind == 'i'
+    np.testing.assert_array_equal(test, expected)
+
+    # The cell grid of the positioned phantom gives the same hits
+    patient.cell_grid = None
+    np.testing.assert_array_equal(beam.check_hit(patient), expected)
+
+
+def test_beam_batch():
+    # Tests if the batched beams equal the beam of each event, and if the
+    # chunked hit check, with and without cell grid, gives the hits of each
+    # beam with the phantom positioned for the event
+    dim = PhantomDimensions(dict(
+        plane_length=120, plane_width=40, plane_resolution='sparse',
+        cylinder_length=150, cylinder_radii_a=20, cylinder_radii_b=10,
+        cylinder_resolution='sparse', table_thickness=5, table_length=210,
+        table_width=50, pad_thickness=4, pad_length=210, pad_width=50,
+        units='cm'))
+    nr_events = 6
+    data_norm = rdsr_normalizer(pd.DataFrame(dict(
+        model=['AXIOMArtis'] * nr_events,
+        IrradiationEventType=['Fluoroscopy'] * nr_events,
+        AcquisitionPlane=['Single Plane'] * nr_events,
+        CollimatedFieldArea_m2=[0.04, 0.01, 0.09, 0.04, 0.02, 0.04],
+        DistanceSourcetoDetector_mm=[1200.0, 1100.0, 1200.0, 1000.0, 1200.0,
+                                     1150.0],
+        DistanceSourcetoIsocenter_mm=[785.0] * nr_events,
+        DoseRP_Gy=[0.1] * nr_events,
+        KVP_kV=[80.0] * nr_events,
+        PositionerPrimaryAngle_deg=[0.0, 30.0, -45.0, 90.0, 10.0, -20.0],
+        PositionerSecondaryAngle_deg=[0.0, 10.0, -20.0, 0.0, 30.0, 5.0],
+        TableLateralPosition_mm=[1000.0, 980.0, 1050.0, 1000.0, 1000.0, 950.0],
+        TableLongitudinalPosition_mm=[0.0, 100.0, -200.0, 0.0, 300.0, 50.0],
+        TableHeightPosition_mm=[200.0, 200.0, 150.0, 250.0, 200.0, 180.0],
+        XRayFilterType=['Strip filter'] * nr_events,
+        XRayFilterThicknessMaximum_mm=[0.1] * nr_events)))
+
+    patient = Phantom(phantom_model='cylinder', phantom_dim=dim)
+    table = Phantom(phantom_model='table', phantom_dim=dim)
+    pad = Phantom(phantom_model='pad', phantom_dim=dim)
+    position_geometry(patient=patient, table=table, pad=pad,
+                      pad_thickness=dim.pad_thickness,
+                      patient_offset=[0, 0, -15])
+
+    beams = BeamBatch(data_norm)
+    assert beams.r.shape == (nr_events, 5, 3)
+    assert beams.N.shape == (nr_events, 4, 3)
+
+    expected = []
+    for event in range(nr_events):
+        beam = Beam(data_norm, event=event, plot_setup=False)
+        np.testing.assert_allclose(beams.r[event], beam.r, atol=1e-9)
+        np.testing.assert_allclose(beams.N[event], beam.N, atol=1e-12)
+
+        patient.position(data_norm, event)
+        expected.append(beam.check_hit(patient))
+
+    assert sum(len(hits) > 0 for hits in expected) > 3
+
+    events = [4, 0, 5, 1]
+    for grid in [patient.cell_grid, None]:
+        patient.cell_grid = grid
+        # A memory ceiling of about two beams at a time
+        for max_bytes in [None, 2 * 64 * len(patient.r)]:
+            kwargs = {} if max_bytes is None else dict(max_bytes=max_bytes)
+            test = beams.check_hit(patient, events=events, **kwargs)
+
+            assert len(test) == len(events)
+            for event, hits in zip(events, test):
+                np.testing.assert_array_equal(hits, expected[event])
+
+    # The beams relative to the phantom in its reference position hit the
+    # same cells, without positioning the phantom
+    assert not patient.r_ref.flags.writeable
+    patient.r = np.array(patient.r_ref)
+    patient.cell_grid = None
+    for event in range(nr_events):
+        beam = beams.beam(event, reference=True)
+        np.testing.assert_allclose(
+            beam.r, beams.r[event] - beams.displacement[event], atol=1e-12)
+        np.testing.assert_array_equal(beam.check_hit(patient),
+                                      expected[event])
@@ -0,0 +1,137 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import threading
+
+from pyskindose.beam_quality import BeamQuality
+from pyskindose.beam_quality import CorrectionMemo
+from pyskindose.corrections import calculate_k_bs
+from pyskindose.corrections import calculate_k_med
+from pyskindose.corrections import calculate_k_med_batch
+from pyskindose.corrections import calculate_k_tab
+from pyskindose.geom_calc import fetch_hvl
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+
+def _data_norm() -> pd.DataFrame:
+    # Fluoroscopy run of two beam qualities
+    return pd.DataFrame(dict(
+        model=['AXIOMArtis'] * 5,
+        acquisition_plane=['Single Plane'] * 5,
+        kVp=[80.0, 80.0, 80.0, 71.8, 80.0],
+        filter_thickness_Cu=[0.3, 0.3, 0.3, 0.6, 0.3],
+        filter_thickness_Al=[0.0] * 5))
+
+
+def test_correction_memo_hits_and_misses():
+    # Tests if each beam quality is looked up once, and returned from the
+    # memo for all following events
+    memo = CorrectionMemo()
+    data_norm = _data_norm()
+
+    fetch_hvl(data_norm, memo=memo)
+    assert (memo.misses, memo.hits) == (2, 3)
+
+    calculate_k_tab(data_norm, memo=memo)
+    assert (memo.misses, memo.hits) == (2, 8)
+    assert len(memo) == 2
+
+    memo.clear()
+    assert (len(memo), memo.misses, memo.hits) == (0, 0, 0)
+
+
+def test_correction_memo_lru_eviction():
+    # Tests if the least recently used beam quality is dropped when full
+    memo = CorrectionMemo(maxsize=2)
+    qualities = BeamQuality.of_events(pd.DataFrame(dict(
+        model=['AXIOMArtis'] * 3, acquisition_plane=['Single Plane'] * 3,
+        kVp=[70.0, 80.0, 90.0], filter_thickness_Cu=[0.3] * 3,
+        filter_thickness_Al=[0.0] * 3)))
+
+    memo.get(qualities[0])
+    memo.get(qualities[1])
+    memo.get(qualities[0])
+    memo.get(qualities[2])
+
+    assert len(memo) == 2
+    memo.get(qualities[0])
+    assert memo.misses == 3
+    memo.get(qualities[1])
+    assert memo.misses == 4
+
+    with pytest.raises(ValueError):
+        CorrectionMemo(maxsize=0)
+
+
+def test_correction_memo_matches_direct_calculation():
+    # Tests if memoized corrections equal the corrections calculated from
+    # kVp and HVL of each event
+    memo = CorrectionMemo()
+    data_norm = _data_norm()
+    fetch_hvl(data_norm, memo=memo)
+
+    bs_interp = calculate_k_bs(data_norm, memo=memo)
+    expected = calculate_k_bs(data_norm[['kVp', 'HVL']])
+    field_area = np.square([4.0, 12.0, 22.0, 40.0])
+
+    # Events of the same beam quality share one interpolation object
+    assert bs_interp[0] is bs_interp[1]
+
+    for event in range(len(data_norm)):
+        np.testing.assert_allclose(bs_interp[event](np.sqrt(field_area)),
+                                   expected[event](np.sqrt(field_area)))
+        np.testing.assert_array_equal(
+            calculate_k_med(data_norm, field_area, event, memo=memo),
+            calculate_k_med_batch(data_norm.kVp[event], data_norm.HVL[event],
+                                  field_area))
+
+
+def test_correction_memo_threads():
+    # Tests if threads sharing one memo get the corrections of a serial
+    # calculation, and if the counters account for every lookup
+    memo = CorrectionMemo()
+    rng = np.random.default_rng(0)
+    procedures = []
+    for _ in range(8):
+        data_norm = _data_norm().sample(frac=1, random_state=rng.integers(
+            1000)).reset_index(drop=True)
+        data_norm.loc[0, 'kVp'] = rng.choice([70.0, 90.0, 100.0])
+        procedures.append(data_norm)
+
+    def corrections(data_norm, memo):
+        data_norm = data_norm.copy()
+        fetch_hvl(data_norm, memo=memo)
+        return (data_norm.HVL.tolist(), calculate_k_tab(data_norm, memo=memo),
+                [calculate_k_med(data_norm, np.square([5.0, 30.0]), event,
+                                 memo=memo).tolist()
+                 for event in range(len(data_norm))])
+
+    expected = [corrections(data_norm, CorrectionMemo())
+                for data_norm in procedures]
+
+    barrier = threading.Barrier(len(procedures))
+    results = [None] * len(procedures)
+
+    def worker(ind):
+        barrier.wait()
+        for _ in range(20):
+            results[ind] = corrections(procedures[ind], memo)
+
+    threads = [threading.Thread(target=worker, args=(ind,))
+               for ind in range(len(procedures))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == expected
+    # Each of 20 runs of 8 procedures looks up 3 * 5 events
+    assert memo.hits + memo.misses == 20 * 8 * 3 * 5
+    assert len(memo) <= memo.misses <= len(memo) * len(procedures)
+
+    with pytest.raises(ValueError):
+        memo.store.hvl_table.values[0] = 0
@@ -0,0 +1,100 @@
+from pathlib import Path
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+
+from pyskindose.compiled_tables import TABLE_DATA_DIR
+from pyskindose.compiled_tables import load_table
+from pyskindose.correction_store import CorrectionStore
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+HVL_CSV = os.path.join(TABLE_DATA_DIR, 'HVL_simulated.csv')
+
+
+def test_load_table_matches_csv(tmp_path):
+    # Tests if the compiled table holds the CSV rows, memory-mapped read-only
+    records = load_table('HVL_simulated', dirs=[str(tmp_path)])
+    expected = pd.read_csv(HVL_CSV)
+
+    assert isinstance(records, np.memmap)
+    assert not records.flags.writeable
+    assert len(records) == len(expected)
+    assert np.isclose(records['HVL_mmAl'].sum(), expected.HVL_mmAl.sum())
+
+    # Second load maps the same artifact
+    assert load_table('HVL_simulated', dirs=[str(tmp_path)]).filename == \
+        records.filename
+
+
+def test_load_table_rebuilds_on_checksum_change(tmp_path):
+    # Tests if a changed CSV file is recompiled, and the artifact of the
+    # earlier content is removed
+    csv_path = str(tmp_path / 'HVL_simulated.csv')
+    table = pd.read_csv(HVL_CSV)
+    table.to_csv(csv_path, index=False)
+
+    artifacts = tmp_path / 'compiled'
+    first = load_table('HVL_simulated', csv_path=csv_path,
+                       dirs=[str(artifacts)])
+
+    table.loc[0, 'HVL_mmAl'] = 100.0
+    table.to_csv(csv_path, index=False)
+    second = load_table('HVL_simulated', csv_path=csv_path,
+                        dirs=[str(artifacts)])
+
+    assert first.filename != second.filename
+    assert second['HVL_mmAl'].max() == 100.0
+    assert os.listdir(str(artifacts)) == [os.path.basename(second.filename)]
+
+
+def test_load_table_falls_back_to_writable_dir(tmp_path):
+    # Tests if the artifact is stored in the next directory, if the first
+    # one can not be created
+    blocked = tmp_path / 'file'
+    blocked.write_text('')
+
+    records = load_table('table_transmission',
+                         dirs=[str(blocked / 'compiled'),
+                               str(tmp_path / 'cache')])
+
+    assert os.path.dirname(records.filename) == str(tmp_path / 'cache')
+
+
+def test_load_table_removes_temporary_file(tmp_path, monkeypatch):
+    # Tests if the temporary file is removed when the artifact can not be
+    # stored, so that failed attempts leave no files behind
+    def replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, 'replace', replace)
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            load_table('HVL_simulated', dirs=[str(tmp_path)])
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_correction_store_from_compiled(tmp_path):
+    # Tests if the store of compiled tables gives the same corrections as
+    # the store of the CSV tables
+    compiled = CorrectionStore.from_compiled(dirs=[str(tmp_path)])
+    expected = CorrectionStore(
+        *[pd.read_csv(os.path.join(TABLE_DATA_DIR, name)) for name in [
+            'HVL_simulated.csv', 'KS_table_concatenated.csv',
+            'table_transmission.csv']])
+
+    events = dict(model=['AlluraClarity', 'AXIOMArtis'],
+                  plane=['Plane B', 'Single Plane'], kvp=[70.4, 110],
+                  cu=[0.1, 0.6], al=[1, 0])
+
+    np.testing.assert_array_equal(compiled.hvl(**events),
+                                  expected.hvl(**events))
+    np.testing.assert_array_equal(compiled.k_tab(**events),
+                                  expected.k_tab(**events))
+    np.testing.assert_array_equal(compiled.k_med(83, 5.1, [4, 12, 40]),
+                                  expected.k_med(83, 5.1, [4, 12, 40]))
@@ -0,0 +1,102 @@
+from pathlib import Path
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+
+from pyskindose.compiled_tables import TABLE_DATA_DIR
+from pyskindose.correction_store import get_correction_store
+from pyskindose.corrections import calculate_k_tab
+from pyskindose.geom_calc import fetch_hvl
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+
+def _data_norm() -> pd.DataFrame:
+    return pd.DataFrame(dict(
+        model=['AXIOMArtis', 'AXIOMArtis', 'AXIOMArtis'],
+        acquisition_plane=['Single Plane'] * 3,
+        kVp=[80.2, 79.6, 50.0],
+        filter_thickness_Cu=[0.3, 0.1, 0.0],
+        filter_thickness_Al=[0.0, 0.0, 0.0]))
+
+
+def test_fetch_hvl():
+    # Tests if the HVL is interpolated linearly between the tabulated kVp
+    # of each event, e.g. 80.2 kV between 6.68 mmAl at 80 kV and 6.76 mmAl
+    # at 81 kV
+    expected = [0.8 * 6.68 + 0.2 * 6.76, 0.4 * 4.99 + 0.6 * 5.05, 2.33]
+
+    data_norm = _data_norm()
+    fetch_hvl(data_norm)
+
+    np.testing.assert_allclose(data_norm.HVL, expected, rtol=1e-12)
+
+
+def test_correction_store_hvl_kvp_range():
+    # Tests if a kVp outside of the tabulated range raises an error, or
+    # gives NaN if errors are coerced
+    params = dict(model=['AXIOMArtis'] * 3, plane=['Single Plane'] * 3,
+                  kvp=[49.9, 125.0, 130.0], cu=[0.3] * 3, al=[0.0] * 3)
+
+    with pytest.raises(ValueError):
+        get_correction_store().hvl(**params)
+
+    test = get_correction_store().hvl(**params, errors='coerce')
+
+    assert np.isnan(test[[0, 2]]).all()
+    assert not np.isnan(test[1])
+
+
+def test_calculate_k_tab_store():
+    # Tests if the correct k_tab value is returned from the store
+    expected = 0.7319
+
+    test = calculate_k_tab(_data_norm())
+
+    assert expected == test[0]
+    assert len(test) == 3
+
+
+def test_correction_store_unknown_filtration():
+    # Tests if an event without tabulated beam quality raises an error,
+    # rather than selecting another group
+    data_norm = _data_norm()
+    data_norm.loc[1, 'filter_thickness_Cu'] = 0.25
+
+    with pytest.raises(ValueError):
+        fetch_hvl(data_norm)
+
+    with pytest.raises(ValueError):
+        get_correction_store().k_tab(
+            model=['AXIOMArtis'], plane=['Single Plane'], kvp=[200],
+            cu=[0.3], al=[0.0])
+
+
+def test_correction_store_k_med_nearest():
+    # Tests if k_med is the entry of the closest tabulated field side length,
+    # then kVp and then HVL, compared with a search of the full KS table
+    ks_table = pd.read_csv(os.path.join(TABLE_DATA_DIR,
+                                        'KS_table_concatenated.csv'))
+    rng = np.random.default_rng(1)
+    kvp = rng.uniform(40, 160, 200)
+    hvl = rng.uniform(1, 12, 200)
+    fsl = rng.uniform(1, 40, 200)
+    # Ties select the lower tabulated value
+    kvp[:3], hvl[:3], fsl[:3] = [55, 80, 100], [4.0, 4.99, 6.0], [15, 7.5, 30]
+
+    test = get_correction_store().k_med(kvp, hvl, fsl)
+
+    for cell in range(len(test)):
+        fsl_tab = np.unique(ks_table.field_side_length_cm)
+        rows = ks_table[ks_table.field_side_length_cm == fsl_tab[
+            np.argmin(np.abs(fsl_tab - fsl[cell]))]]
+        kvp_tab = np.unique(rows.kvp_kV)
+        rows = rows[rows.kvp_kV == kvp_tab[
+            np.argmin(np.abs(kvp_tab - kvp[cell]))]]
+        expected = rows.mu_en_quotient.to_numpy()[
+            np.argmin(np.abs(rows.hvl_mmAl.to_numpy() - hvl[cell]))]
+
+        assert test[cell] == expected
@@ -5,6 +5,7 @@ import sys
 
 from pyskindose.corrections import calculate_k_bs
 from pyskindose.corrections import calculate_k_med
+from pyskindose.corrections import calculate_k_med_batch
 from pyskindose.corrections import calculate_k_isq
 from pyskindose.db_connect import db_connect
 
@@ -71,17 +72,38 @@ def test_calculate_k_bs():
 
 def test_calculate_k_med():
 
-    # Expected k_med factors for kVp = 80 kV and HVL = 4.99 mmAl
+    # Expected k_med factors for kVp = 80 kV and HVL = 4.99 mmAl, at the
+    # tabulated field side lengths closest to each cell
     expected = [1.027, 1.026, 1.025, 1.025, 1.025]
 
     data = {'kVp': [80], 'HVL': [4.99]}
     data_norm = pd.DataFrame(data)
 
-    # Tests if we get a value in expected, for cells with different field
-    # sizes with filed side length in [5 to 35] cm.
+    # Tests if we get the expected value for each cell, for cells with
+    # different field sizes with filed side length in [5 to 35] cm.
     test = calculate_k_med(data_norm, np.square([6, 10, 20, 22, 32]), 0)
 
-    assert test in expected
+    np.testing.assert_array_equal(test, expected)
+
+
+def test_calculate_k_med_batch():
+    # Tests if the cells of several events are corrected at once, with the
+    # result of each event corrected by itself
+    data_norm = pd.DataFrame({'kVp': [80, 63, 150], 'HVL': [4.99, 2.5, 9.0]})
+    field_area = [np.square([6, 10]), np.square([2, 21, 40]),
+                  np.square([30])]
+
+    test = calculate_k_med_batch(
+        kvp=np.repeat(data_norm.kVp, [2, 3, 1]),
+        hvl=np.repeat(data_norm.HVL, [2, 3, 1]),
+        field_area=np.concatenate(field_area))
+
+    expected = np.concatenate([calculate_k_med(data_norm, field_area[event],
+                                               event)
+                               for event in range(3)])
+
+    np.testing.assert_array_equal(test, expected)
+
 
 def test_calculate_k_tab():
     # Tests if correct k_tab value is returned from database
@@ -0,0 +1,113 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import sys
+
+from pyskindose.dose_calculation import calculate_dose
+from pyskindose.geom_calc import position_geometry
+from pyskindose.parse_data import rdsr_normalizer
+from pyskindose.phantom_class import Phantom
+from pyskindose.settings import PhantomDimensions
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+PHANTOM_DIM = PhantomDimensions(dict(
+    plane_length=120, plane_width=40, plane_resolution='sparse',
+    cylinder_length=150, cylinder_radii_a=20, cylinder_radii_b=10,
+    cylinder_resolution='sparse', table_thickness=5, table_length=210,
+    table_width=50, pad_thickness=4, pad_length=210, pad_width=50,
+    units='cm'))
+
+
+def _procedure(dsi) -> pd.DataFrame:
+    # Normalized procedure of stationary events, one for each DSI in mm
+    nr_events = len(dsi)
+    data_parsed = pd.DataFrame(dict(
+        model=['AXIOMArtis'] * nr_events,
+        IrradiationEventType=['Fluoroscopy'] * nr_events,
+        AcquisitionPlane=['Single Plane'] * nr_events,
+        CollimatedFieldArea_m2=[0.04] * nr_events,
+        DistanceSourcetoDetector_mm=[1200.0] * nr_events,
+        DistanceSourcetoIsocenter_mm=dsi,
+        DoseRP_Gy=[0.1] * nr_events,
+        KVP_kV=[80.0] * nr_events,
+        PositionerPrimaryAngle_deg=[0.0] * nr_events,
+        PositionerSecondaryAngle_deg=[0.0] * nr_events,
+        TableLateralPosition_mm=[1000.0] * nr_events,
+        TableLongitudinalPosition_mm=[0.0] * nr_events,
+        TableHeightPosition_mm=[200.0] * nr_events,
+        XRayFilterType=['Strip filter'] * nr_events,
+        XRayFilterThicknessMaximum_mm=[0.1] * nr_events))
+
+    return rdsr_normalizer(data_parsed)
+
+
+def _dose(data_norm: pd.DataFrame, **kwargs) -> np.array:
+    patient = Phantom(phantom_model='cylinder', phantom_dim=PHANTOM_DIM)
+    table = Phantom(phantom_model='table', phantom_dim=PHANTOM_DIM)
+    pad = Phantom(phantom_model='pad', phantom_dim=PHANTOM_DIM)
+    position_geometry(patient=patient, table=table, pad=pad,
+                      pad_thickness=PHANTOM_DIM.pad_thickness,
+                      patient_offset=[0, 0, -15])
+
+    return calculate_dose([data_norm], patient=patient, table=table,
+                          pad=pad, verbose=False, **kwargs)
+
+
+def test_calculate_dose_varying_dsi():
+    # Tests if the inverse-square law of each event is referenced to the
+    # IRP of that event, so that the dose of a procedure is the sum of the
+    # doses of its events when DSI varies between events
+    dsi = [785.0, 700.0]
+    data_norm = _procedure(dsi)
+
+    test = _dose(data_norm)
+    expected = sum(_dose(_procedure([value])) for value in dsi)
+
+    assert test.max() > 0
+    np.testing.assert_allclose(test, expected, rtol=1e-12)
+
+    # With the IRP closer to the source, the same K_IRP gives less skin dose
+    assert _dose(_procedure([700.0])).max() < \
+        _dose(_procedure([785.0])).max()
+
+
+def test_calculate_dose_rotation_table_path():
+    # Tests if the table correction of a rotation calculated as a beam sweep
+    # follows the oblique path through table and pad, as for the rotation
+    # split into 720 stationary beams
+    data_norm = rdsr_normalizer(pd.DataFrame(dict(
+        model=['AXIOMArtis'],
+        IrradiationEventType=['Rotational Acquisition'],
+        AcquisitionPlane=['Single Plane'],
+        CollimatedFieldArea_m2=[0.04],
+        DistanceSourcetoDetector_mm=[1200.0],
+        DistanceSourcetoIsocenter_mm=[785.0],
+        DoseRP_Gy=[0.1],
+        KVP_kV=[80.0],
+        PositionerPrimaryAngle_deg=[-100.0],
+        PositionerSecondaryAngle_deg=[0.0],
+        PositionerPrimaryEndAngle_deg=[100.0],
+        PositionerSecondaryEndAngle_deg=[10.0],
+        TableLateralPosition_mm=[1000.0],
+        TableLongitudinalPosition_mm=[0.0],
+        TableHeightPosition_mm=[200.0],
+        XRayFilterType=['Strip filter'],
+        XRayFilterThicknessMaximum_mm=[0.1])), split_rotations=False)
+    nr_steps = 720
+
+    # Stationary beams at the midpoint of each rotation step
+    t = (np.arange(nr_steps) + 0.5) / nr_steps
+    data_split = data_norm.loc[data_norm.index.repeat(nr_steps)]\
+        .reset_index(drop=True)
+    data_split['PPA'] = -100.0 + 200.0 * t
+    data_split['PSA'] = 10.0 * t
+    data_split['PPA_end'] = data_split['PSA_end'] = np.nan
+    data_split['K_IRP'] = data_norm.K_IRP[0] / nr_steps
+
+    test = _dose(data_norm, estimate_k_tab=True, k_tab_val=0.5)
+    expected = _dose(data_split, estimate_k_tab=True, k_tab_val=0.5)
+
+    assert np.abs(test - expected).max() < 0.02 * expected.max()
+    assert abs(test.sum() - expected.sum()) < 0.001 * expected.sum()
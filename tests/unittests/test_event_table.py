@@ -0,0 +1,61 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+
+from pyskindose.beam_class import Beam
+from pyskindose.event_table import EventTable
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+
+def _data_norm() -> pd.DataFrame:
+    return pd.DataFrame(dict(
+        model=['AXIOMArtis'] * 3,
+        acquisition_type=['Fluoroscopy'] * 3,
+        FS_lat=[10.0, 12.0, 14.0], FS_long=[10.0, 12.0, 14.0],
+        DSD=[120.0] * 3, DSI=[78.5] * 3, DID=[41.5] * 3,
+        K_IRP=[1.0, 2.0, 3.0], PPA=[0.0, 30.0, -30.0], PSA=[0.0, 10.0, 0.0],
+        DSL=[40] * 3))
+
+
+def test_event_table_columns():
+    # Tests if all columns are available as attributes and items, with the
+    # values of data_norm
+    data_norm = _data_norm()
+    event_table = EventTable(data_norm)
+
+    assert len(event_table) == len(data_norm)
+    assert event_table.columns == list(data_norm.columns)
+
+    for column in data_norm.columns:
+        assert event_table[column].tolist() == data_norm[column].tolist()
+        assert getattr(event_table, column)[1] == data_norm[column][1]
+
+    # Numeric columns share one structured array of float fields
+    assert event_table.records.dtype['DSL'] == np.float64
+    assert 'model' not in event_table.records.dtype.names
+
+
+def test_event_table_read_only():
+    # Tests if the event table can not be modified
+    event_table = EventTable(_data_norm())
+
+    with pytest.raises(ValueError):
+        event_table.DSI[0] = 0
+
+    with pytest.raises(ValueError):
+        event_table.model[0] = 'other'
+
+
+def test_event_table_beam():
+    # Tests if a beam created from an event table equals the beam created
+    # from data_norm
+    data_norm = _data_norm()
+    event_table = EventTable(data_norm)
+
+    for event in range(len(data_norm)):
+        np.testing.assert_array_equal(Beam(event_table, event).r,
+                                      Beam(data_norm, event).r)
@@ -1,8 +1,20 @@
 from pathlib import Path
 import numpy as np
+import pandas as pd
+import pytest
 import sys
 
+from pyskindose.beam_class import Beam
+from pyskindose.corrections import calculate_k_isq
 from pyskindose.geom_calc import Triangle
+from pyskindose.geom_calc import cell_geometry
+from pyskindose.geom_calc import check_table_hits
+from pyskindose.geom_calc import position_geometry
+from pyskindose.geom_calc import slab_path_length
+from pyskindose.geom_calc import slab_thickness
+from pyskindose.parse_data import rdsr_normalizer
+from pyskindose.phantom_class import Phantom
+from pyskindose.settings import PhantomDimensions
 
 P = Path(__file__).parent.parent.parent
 sys.path.insert(1, str(P.absolute()))
@@ -59,3 +71,154 @@ def test_triangle_check_intersection():
     assert expected == test
 
 test_triangle_check_intersection()
+
+
+def test_cell_geometry():
+    # Tests if the fused geometry kernel gives the inverse-square law
+    # correction of calculate_k_isq and the field area of the per cell
+    # scaling, and if the results are written to the out buffers
+    rng = np.random.default_rng(0)
+    source = np.array([0.0, -70.0, 5.0])
+    cells = rng.uniform(-20, 20, (50, 3))
+    dref, d_detector, field_area_ref = 62.0, 100.0, 20.0 * 15.0
+
+    expected_area = [round(field_area_ref * np.square(
+        np.linalg.norm(cell - source) / d_detector), 1) for cell in cells]
+
+    buffers = np.empty((3, 60))
+    out = tuple(buffers[:, :len(cells)])
+    k_isq, field_area, fsl = cell_geometry(source, cells, dref, d_detector,
+                                           field_area_ref, out=out)
+
+    np.testing.assert_allclose(
+        k_isq, calculate_k_isq(source=source, cells=cells, dref=dref),
+        rtol=1e-12)
+    np.testing.assert_array_equal(field_area, expected_area)
+    np.testing.assert_allclose(fsl, np.sqrt(expected_area), rtol=1e-12)
+    assert all(np.shares_memory(test, buffer)
+               for test, buffer in zip((k_isq, field_area, fsl), buffers))
+
+    with pytest.raises(ValueError):
+        cell_geometry(source, cells, dref, d_detector, field_area_ref,
+                      out=tuple(buffers))
+
+
+def test_check_table_hits_path_length():
+    # Tests if the path length through table and pad of each blocked cell
+    # equals the distance between the entrance and exit planes of the slabs
+    # along the beam, and is the slab thickness at normal incidence
+    dim = PhantomDimensions(dict(
+        plane_length=120, plane_width=40, plane_resolution='sparse',
+        cylinder_length=150, cylinder_radii_a=20, cylinder_radii_b=10,
+        cylinder_resolution='sparse', table_thickness=5, table_length=210,
+        table_width=50, pad_thickness=4, pad_length=210, pad_width=50,
+        units='cm'))
+    data_norm = rdsr_normalizer(pd.DataFrame(dict(
+        model=['AXIOMArtis'] * 2,
+        IrradiationEventType=['Fluoroscopy'] * 2,
+        AcquisitionPlane=['Single Plane'] * 2,
+        CollimatedFieldArea_m2=[0.04] * 2,
+        DistanceSourcetoDetector_mm=[1200.0] * 2,
+        DistanceSourcetoIsocenter_mm=[785.0] * 2,
+        DoseRP_Gy=[0.1] * 2,
+        KVP_kV=[80.0] * 2,
+        PositionerPrimaryAngle_deg=[0.0, 35.0],
+        PositionerSecondaryAngle_deg=[0.0, -10.0],
+        TableLateralPosition_mm=[1000.0] * 2,
+        TableLongitudinalPosition_mm=[0.0] * 2,
+        TableHeightPosition_mm=[200.0] * 2,
+        XRayFilterType=['Strip filter'] * 2,
+        XRayFilterThicknessMaximum_mm=[0.1] * 2)))
+
+    patient = Phantom(phantom_model='cylinder', phantom_dim=dim)
+    table = Phantom(phantom_model='table', phantom_dim=dim)
+    pad = Phantom(phantom_model='pad', phantom_dim=dim)
+    position_geometry(patient=patient, table=table, pad=pad,
+                      pad_thickness=dim.pad_thickness,
+                      patient_offset=[0, 0, -15])
+    assert slab_thickness(table) + slab_thickness(pad) == 9
+
+    for event in range(len(data_norm)):
+        beam = Beam(data_norm, event=event, plot_setup=False)
+        for phantom in (patient, table, pad):
+            phantom.position(data_norm, event)
+        source = beam.r[0, :]
+        cells = patient.r[beam.check_hit(patient)]
+
+        hits, length = check_table_hits(source=source, table=table,
+                                        beam=beam, cells=cells, pad=pad,
+                                        path_length=True)
+
+        assert hits.tolist() == check_table_hits(source=source, table=table,
+                                                 beam=beam, cells=cells)
+        assert hits.any()
+        assert (length[~hits] == 0).all()
+
+        # Ray parameter at the bottom of the table and the top of the pad
+        normal = table.r[8, :] - table.r[0, :]
+        direction = cells[hits] - source
+        bottom = np.dot(table.r[8, :] - source, normal) / (direction @ normal)
+        top = np.dot(pad.r[8, :] - source, normal) / (direction @ normal)
+        expected = np.abs(top - bottom) * np.linalg.norm(direction, axis=1)
+
+        np.testing.assert_allclose(length[hits], expected, rtol=1e-9)
+        if event == 0:
+            central = np.argmin(np.linalg.norm(np.cross(
+                direction, beam.r[1:, :].mean(axis=0) - source), axis=1) /
+                np.linalg.norm(direction, axis=1))
+            np.testing.assert_allclose(length[hits][central], 9, rtol=1e-3)
+        else:
+            assert (length[hits] > 9.5).all()
+
+
+def test_slab_path_length_grazing():
+    # Tests if a beam at a grazing angle near the table edge, which enters
+    # the table through its side, gets the chord through the table and pad
+    # boxes rather than the thickness over the direction cosine
+    dim = PhantomDimensions(dict(
+        plane_length=120, plane_width=40, plane_resolution='sparse',
+        cylinder_length=150, cylinder_radii_a=20, cylinder_radii_b=10,
+        cylinder_resolution='sparse', table_thickness=5, table_length=210,
+        table_width=50, pad_thickness=4, pad_length=210, pad_width=50,
+        units='cm'))
+    patient = Phantom(phantom_model='cylinder', phantom_dim=dim)
+    table = Phantom(phantom_model='table', phantom_dim=dim)
+    pad = Phantom(phantom_model='pad', phantom_dim=dim)
+    position_geometry(patient=patient, table=table, pad=pad,
+                      pad_thickness=dim.pad_thickness,
+                      patient_offset=[0, 0, -15])
+
+    # The table spans x in [-25, 25] and y in [0, 5], the pad y in [-4, 0]
+    np.testing.assert_allclose(table.r.min(axis=0), [-25, 0, -210])
+    np.testing.assert_allclose(pad.r.max(axis=0), [25, 0, 0], atol=1e-12)
+
+    source = np.array([60.0, 50.0, -100.0])
+    cells = np.array([
+        [20.0, -4.5, -100.0],   # enters through the side of the table
+        [60.0, -4.5, -100.0],   # normal incidence, outside the table
+        [0.0, -4.5, -100.0]])   # enters through the bottom of the table
+    direction = cells - source
+    norm = np.linalg.norm(direction, axis=1)
+
+    test = (slab_path_length(source, cells, table) +
+            slab_path_length(source, cells, pad))
+
+    # Ray parameters at the side of the table, and at the bottom of the
+    # table and the top of the pad
+    side = (25 - source[0]) / direction[0, 0]
+    bottom = (5 - source[1]) / direction[:, 1]
+    top = (-4 - source[1]) / direction[:, 1]
+
+    expected = np.array([(top[0] - side) * norm[0], 0,
+                         (top[2] - bottom[2]) * norm[2]])
+    np.testing.assert_allclose(test, expected, rtol=1e-12)
+
+    # The infinite slab approximation overestimates the grazing beam only
+    cosine = np.abs(direction[:, 1]) / norm
+    assert test[0] < 0.75 * 9 / cosine[0]
+    np.testing.assert_allclose(test[2], 9 / cosine[2], rtol=1e-12)
+
+    # Same path length in the reference frame of the table
+    np.testing.assert_allclose(
+        slab_path_length(source, cells, table, offset=np.zeros(3)) +
+        slab_path_length(source, cells, pad, offset=np.zeros(3)), test)
@@ -0,0 +1,74 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+
+from pyskindose.geometry_cache import EventGeometry
+from pyskindose.geometry_cache import GEOMETRY_KEY_PARAMETERS
+from pyskindose.geometry_cache import GeometryCache
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+
+def _geometry(nr_cells: int) -> EventGeometry:
+    return EventGeometry(hits=np.arange(nr_cells),
+                         table_hits=np.zeros(nr_cells, dtype=bool),
+                         table_path=np.zeros(nr_cells),
+                         k_isq=np.ones(nr_cells), field_area=np.ones(nr_cells),
+                         fsl=np.ones(nr_cells))
+
+
+def test_geometry_cache_keys():
+    # Tests if events alternating between two projections share keys, and
+    # if nearly identical geometries share keys within the tolerance
+    data_norm = pd.DataFrame({column: [10.0] * 4
+                              for column in GEOMETRY_KEY_PARAMETERS})
+    data_norm['PPA'] = [0.0, 90.0, -0.0, 90.3]
+
+    keys = GeometryCache().keys(data_norm)
+    assert keys[0] == keys[2]
+    assert len(set(keys)) == 3
+
+    keys = GeometryCache(angle_tolerance=1.0).keys(data_norm)
+    assert keys[1] == keys[3]
+    assert len(set(keys)) == 2
+
+    # The tolerance in cm does not apply to angles, nor the other way round
+    assert len(set(GeometryCache(tolerance=1.0).keys(data_norm))) == 3
+
+    data_norm['dLAT'] = [10.0, 10.0, 10.3, 10.0]
+    assert len(set(GeometryCache(angle_tolerance=1.0).keys(data_norm))) == 3
+    assert len(set(GeometryCache(tolerance=1.0, angle_tolerance=1.0)
+                   .keys(data_norm))) == 2
+
+    with pytest.raises(ValueError):
+        GeometryCache(tolerance=0)
+    with pytest.raises(ValueError):
+        GeometryCache(angle_tolerance=-1.0)
+
+
+def test_geometry_cache_lru_memory_bound():
+    # Tests if the least recently used geometries are dropped when the
+    # cached arrays exceed max_bytes
+    size = _geometry(10).nbytes
+    cache = GeometryCache(max_bytes=2 * size)
+
+    cache.add('a', _geometry(10))
+    cache.add('b', _geometry(10))
+    assert cache.get('a') is not None
+    cache.add('c', _geometry(10))
+
+    assert len(cache) == 2 and cache.nbytes == 2 * size
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Too large to be cached, but read-only as if it was
+    geometry = cache.add('d', _geometry(30))
+    assert 'd' not in cache and len(cache) == 2
+    with pytest.raises(ValueError):
+        geometry.k_isq[0] = 0
+
+    cache.clear()
+    assert (len(cache), cache.nbytes, cache.hits, cache.misses) == (0, 0, 0, 0)
@@ -0,0 +1,375 @@
+from datetime import datetime
+from datetime import timedelta
+from pathlib import Path
+import numpy as np
+import os
+import pandas as pd
+import pydicom
+import pytest
+import sys
+
+from pyskindose.normalizers import NORMALIZERS
+from pyskindose.normalizers import Column
+from pyskindose.normalizers import Constant
+from pyskindose.normalizers import Normalizer
+from pyskindose.parse_data import clean_concept_name
+from pyskindose.parse_data import iter_rdsr_events
+from pyskindose.parse_data import load_rdsr
+from pyskindose.parse_data import merge_rdsr
+from pyskindose.parse_data import normalizer_fields
+from pyskindose.parse_data import rdsr_normalizer
+from pyskindose.parse_data import rdsr_parser
+from pyskindose.parse_data import read_rdsr
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+RDSR_FOLDER = os.path.join(str(P), 'src', 'pyskindose', 'example_data',
+                           'RDSR')
+
+
+def test_rdsr_parser_one_row_per_event():
+    # Tests if one row is parsed for each irradiation event, with the
+    # cleaned model name on each row
+    data_raw = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    data_parsed = rdsr_parser(data_raw)
+
+    assert len(data_parsed) == 24
+    assert (data_parsed.model == 'AXIOMArtis').all()
+
+
+def test_rdsr_parser_datetime_conversion():
+    # Tests if DateTime values are converted to datetime, rounded to seconds
+    data_raw = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    data_parsed = rdsr_parser(data_raw)
+
+    expected = pd.Timestamp('2017-12-12 14:38:02')
+    test = data_parsed.DateTimeStarted[0]
+
+    assert expected == test
+
+
+def test_rdsr_parser_repeated_concept_name():
+    # Tests if repeated measured values in subcontent are kept as pairs, as
+    # for the two X-ray filters of each event in P1.dcm
+    data_raw = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'P1.dcm'))
+    data_parsed = rdsr_parser(data_raw)
+
+    test = data_parsed.XRayFilterThicknessMaximum_mm[0]
+
+    assert isinstance(test, tuple) and len(test) == 2
+
+
+def test_rdsr_parser_projection():
+    # Tests if only the requested fields are parsed
+    data_raw = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    fields = normalizer_fields(data_raw.ManufacturerModelName)
+
+    data_parsed = rdsr_parser(data_raw, fields=fields)
+
+    # S1.dcm contains no rotational acquisitions, i.e. no end angles, and
+    # the container XRayFilters is not a column
+    expected = fields - {'PositionerPrimaryEndAngle_deg',
+                         'PositionerSecondaryEndAngle_deg',
+                         'XRayFilters'} | {'model'}
+
+    assert expected == set(data_parsed.columns)
+    assert len(data_parsed) == 24
+
+
+def test_rdsr_parser_event_filter():
+    # Tests if events are filtered on acquisition type and start time
+    data_raw = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    data_all = rdsr_parser(data_raw)
+
+    data_fluoro = rdsr_parser(data_raw, acquisition_types=['Fluoroscopy'])
+
+    assert len(data_fluoro) == \
+        sum(data_all.IrradiationEventType == 'Fluoroscopy')
+    assert (data_fluoro.IrradiationEventType == 'Fluoroscopy').all()
+
+    start = data_all.DateTimeStarted[2].to_pydatetime()
+    stop = data_all.DateTimeStarted[5].to_pydatetime()
+    data_window = rdsr_parser(data_raw, time_window=(start, stop))
+
+    assert data_window.DateTimeStarted.tolist() == \
+        data_all.DateTimeStarted[2:6].tolist()
+
+
+def test_read_rdsr():
+    # Tests if the attributes used by PySkinDose are read from an RDSR file
+    data_raw = read_rdsr(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+
+    assert data_raw.ManufacturerModelName == 'AXIOM-Artis'
+    assert len(rdsr_parser(data_raw)) == 24
+
+
+def test_read_rdsr_rejects_other_objects(tmp_path):
+    # Tests if DICOM objects that are not radiation dose reports are rejected
+    data = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+
+    # CT image storage
+    data.SOPClassUID = '1.2.840.10008.5.1.4.1.1.2'
+    data.file_meta.MediaStorageSOPClassUID = data.SOPClassUID
+    data.save_as(str(tmp_path / 'ct.dcm'))
+
+    # Comprehensive SR, with another document title
+    data.SOPClassUID = '1.2.840.10008.5.1.4.1.1.88.33'
+    data.file_meta.MediaStorageSOPClassUID = data.SOPClassUID
+    data.ConceptNameCodeSequence[0].CodeValue = '126000'
+    data.save_as(str(tmp_path / 'sr.dcm'))
+
+    for file_name in ['ct.dcm', 'sr.dcm']:
+        with pytest.raises(ValueError):
+            read_rdsr(str(tmp_path / file_name))
+
+
+def test_iter_rdsr_events():
+    # Tests if the streamed batches add up to the normalized procedure
+    data_raw = read_rdsr(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    expected = rdsr_normalizer(rdsr_parser(
+        data_raw, fields=normalizer_fields(data_raw.ManufacturerModelName)))
+
+    batches = list(iter_rdsr_events(data_raw, batch_size=5))
+
+    assert [len(batch) for batch in batches] == [5, 5, 5, 5, 4]
+    pd.testing.assert_frame_equal(
+        expected, pd.concat(batches, ignore_index=True))
+
+
+def test_iter_rdsr_events_batch_without_filters():
+    # Tests if a batch where no event reports X-ray filters normalizes like
+    # the same events in the entire procedure
+    data_raw = read_rdsr(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    events = [content for content in data_raw.ContentSequence
+              if content.ConceptNameCodeSequence[0].CodeMeaning ==
+              'Irradiation Event X-Ray Data']
+    for event in events[:5]:
+        event.ContentSequence = [
+            item for item in event.ContentSequence
+            if item.ConceptNameCodeSequence[0].CodeMeaning != 'X-Ray Filters']
+
+    expected = rdsr_normalizer(rdsr_parser(
+        data_raw, fields=normalizer_fields(data_raw.ManufacturerModelName)))
+
+    batches = list(iter_rdsr_events(data_raw, batch_size=5))
+
+    # The columns of the first batch have the dtypes of the entire
+    # procedure, although no event of the batch holds an X-ray filter
+    assert (batches[0].filter_thickness_Cu == 0).all()
+    assert batches[0].filter_type.isna().all()
+    pd.testing.assert_series_equal(batches[0].dtypes, expected.dtypes)
+    pd.testing.assert_frame_equal(
+        expected, pd.concat(batches, ignore_index=True))
+
+
+def _rotational_procedure() -> pd.DataFrame:
+    # Parsed procedure with three rotational acquisitions
+    event_types = ['Fluoroscopy', 'Rotational Acquisition',
+                   'Rotational Acquisition', 'Stationary Acquisition',
+                   'Rotational Acquisition']
+    nr_events = len(event_types)
+
+    data_parsed = pd.DataFrame(dict(
+        model=['AXIOMArtis'] * nr_events,
+        IrradiationEventType=event_types,
+        AcquisitionPlane=['Single Plane'] * nr_events,
+        CollimatedFieldArea_m2=[0.04] * nr_events,
+        DistanceSourcetoDetector_mm=[1200.0] * nr_events,
+        DistanceSourcetoIsocenter_mm=[785.0] * nr_events,
+        DoseRP_Gy=[0.001, 0.02, 0.04, 0.003, 0.06],
+        KVP_kV=[80.0] * nr_events,
+        PositionerPrimaryAngle_deg=[0.0, -100.0, 100.0, 0.0, 0.0],
+        PositionerSecondaryAngle_deg=[0.0] * nr_events,
+        PositionerPrimaryEndAngle_deg=[None, 100.0, -100.0, None, 90.0],
+        PositionerSecondaryEndAngle_deg=[None, 0.0, 0.0, None, 19.0],
+        TableLateralPosition_mm=[0.0] * nr_events,
+        TableLongitudinalPosition_mm=[0.0] * nr_events,
+        TableHeightPosition_mm=[0.0] * nr_events,
+        XRayFilterType=['Strip filter'] * nr_events,
+        XRayFilterThicknessMaximum_mm=[0.1] * nr_events))
+
+    return data_parsed
+
+
+def test_rdsr_normalizer_without_rotations():
+    # Tests if events without rotational acquisitions, e.g. a batch of a
+    # procedure, normalize to the same columns and dtypes as the procedure
+    data_parsed = _rotational_procedure()
+    expected = rdsr_normalizer(data_parsed, split_rotations=False)
+
+    stationary = data_parsed.iloc[[0, 3]].drop(
+        columns=['PositionerPrimaryEndAngle_deg',
+                 'PositionerSecondaryEndAngle_deg'])
+    data_norm = rdsr_normalizer(stationary, split_rotations=False)
+
+    pd.testing.assert_frame_equal(
+        data_norm, expected.iloc[[0, 3]].reset_index(drop=True))
+
+
+def test_rdsr_normalizer_rotational_acquisitions():
+    # Tests if each rotational acquisition is split into 20 sub-events with
+    # linearly spaced angles, also when a procedure holds several rotations
+    data_parsed = _rotational_procedure()
+    data_norm = rdsr_normalizer(data_parsed)
+
+    assert len(data_norm) == 2 + 3 * 20
+    assert data_norm.acquisition_type.tolist() == \
+        ['Fluoroscopy'] + 40 * ['Rotational Acquisition'] + \
+        ['Stationary Acquisition'] + 20 * ['Rotational Acquisition']
+
+    # Air kerma is conserved
+    assert abs(data_norm.K_IRP.sum() - 1000 * sum(data_parsed.DoseRP_Gy)) \
+        < 1e-9
+
+    np.testing.assert_allclose(data_norm.PPA[1:21],
+                               np.linspace(-100, 100, 20))
+    np.testing.assert_allclose(data_norm.PPA[21:41],
+                               np.linspace(100, -100, 20))
+    np.testing.assert_allclose(data_norm.PSA[42:62], np.linspace(0, 19, 20))
+    np.testing.assert_allclose(data_norm.K_IRP[42:62], 60 / 20)
+
+    # Sub-events are stationary
+    assert data_norm.PPA_end[1:41].isna().all()
+
+
+def test_rdsr_normalizer_unsplit_rotations():
+    # Tests if rotational acquisitions are kept as single events with end
+    # angles when split_rotations is False
+    data_parsed = _rotational_procedure()
+    data_norm = rdsr_normalizer(data_parsed, split_rotations=False)
+
+    assert len(data_norm) == len(data_parsed)
+    assert data_norm.PPA_end.tolist()[1:3] == [100.0, -100.0]
+    assert data_norm.PSA_end[4] == 19.0
+    np.testing.assert_allclose(data_norm.K_IRP, 1000 * data_parsed.DoseRP_Gy)
+
+
+def test_clean_concept_name():
+    # Tests if spaces, hyphens, parentheses and periods are removed
+    assert clean_concept_name('AXIOM-Artis') == 'AXIOMArtis'
+    assert clean_concept_name('Dose (RP)') == 'DoseRP'
+    assert clean_concept_name('Distance Source to Detector.') == \
+        'DistanceSourcetoDetector'
+
+
+def test_rdsr_normalizer_unknown_model():
+    # Tests if data from a device model without normalizer is rejected
+    data_parsed = _rotational_procedure()
+    data_parsed['model'] = 'UnknownModel'
+
+    with pytest.raises(ValueError):
+        rdsr_normalizer(data_parsed)
+
+
+def test_rdsr_normalizer_mixed_models(monkeypatch):
+    # Tests if events from several device models are normalized by their
+    # own normalizer, in the original event order
+    monkeypatch.setitem(NORMALIZERS, 'OtherModel', Normalizer(
+        model='OtherModel',
+        columns=dict(model=Column('model'),
+                     acquisition_type=Column('IrradiationEventType'),
+                     K_IRP=Column('DoseRP_Gy', scale=1000),
+                     DSL=Constant(30))))
+
+    data_parsed = _rotational_procedure()
+    data_parsed.loc[[0, 3], 'model'] = 'OtherModel'
+
+    data_norm = rdsr_normalizer(data_parsed, split_rotations=False)
+
+    assert data_norm.model.tolist() == data_parsed.model.tolist()
+    assert data_norm.DSL.tolist() == [30, 40, 40, 30, 40]
+    np.testing.assert_allclose(data_norm.K_IRP, 1000 * data_parsed.DoseRP_Gy)
+    assert data_norm.DSD.isna().tolist() == [True, False, False, True, False]
+
+
+def _partial_rdsr(tmp_path, name: str, keep, utc_offset: int = None,
+                  report_offset: bool = False) -> str:
+    # Copy of S1.dcm holding only the irradiation events in keep, optionally
+    # with start times in local time of a UTC offset in hours. The offset is
+    # stated in each DT value, or only in the TimezoneOffsetFromUTC of the
+    # report if report_offset is set.
+    data = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+
+    content = [item for item in data.ContentSequence
+               if item.ConceptNameCodeSequence[0].CodeMeaning !=
+               'Irradiation Event X-Ray Data']
+    events = [item for item in data.ContentSequence
+              if item.ConceptNameCodeSequence[0].CodeMeaning ==
+              'Irradiation Event X-Ray Data']
+
+    if utc_offset is not None:
+        for event in events:
+            for item in event.ContentSequence:
+                if 'DateTime' in item:
+                    local = datetime.strptime(str(item.DateTime)[:14],
+                                              '%Y%m%d%H%M%S') + \
+                        timedelta(hours=utc_offset)
+                    item.DateTime = local.strftime('%Y%m%d%H%M%S')
+                    if not report_offset:
+                        item.DateTime += f"{utc_offset:+03d}00"
+
+        if report_offset:
+            data.TimezoneOffsetFromUTC = f"{utc_offset:+03d}00"
+
+    data.ContentSequence = content + [events[ind] for ind in keep]
+
+    file_path = str(tmp_path / name)
+    data.save_as(file_path)
+    return file_path
+
+
+def test_merge_rdsr(tmp_path):
+    # Tests if overlapping partial reports are merged into the events of the
+    # complete report, without duplicates and in order of start time
+    interim = _partial_rdsr(tmp_path, 'interim.dcm', range(0, 15))
+    final = _partial_rdsr(tmp_path, 'final.dcm', reversed(range(10, 24)))
+
+    data_norm = merge_rdsr([final, interim])
+    expected = load_rdsr(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+
+    pd.testing.assert_frame_equal(data_norm, expected)
+
+
+def test_merge_rdsr_utc_offset(tmp_path):
+    # Tests if start times with UTC offsets are sorted in UTC. In local time,
+    # the events of the final report would sort before the interim report.
+    interim = _partial_rdsr(tmp_path, 'interim.dcm', range(0, 15),
+                            utc_offset=1)
+    final = _partial_rdsr(tmp_path, 'final.dcm', reversed(range(10, 24)),
+                          utc_offset=-5)
+
+    data_norm = merge_rdsr([final, interim])
+    expected = load_rdsr(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+
+    pd.testing.assert_frame_equal(data_norm, expected)
+
+
+def test_merge_rdsr_report_utc_offset(tmp_path):
+    # Tests if start times without UTC offset are sorted in UTC, with the
+    # TimezoneOffsetFromUTC of each report. In local time, the events of the
+    # final report would sort before the interim report.
+    interim = _partial_rdsr(tmp_path, 'interim.dcm', range(0, 15),
+                            utc_offset=1, report_offset=True)
+    final = _partial_rdsr(tmp_path, 'final.dcm', reversed(range(10, 24)),
+                          utc_offset=-5, report_offset=True)
+
+    assert read_rdsr(final).TimezoneOffsetFromUTC == '-0500'
+
+    data_norm = merge_rdsr([final, interim])
+    expected = load_rdsr(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+
+    pd.testing.assert_frame_equal(data_norm, expected)
+
+
+def test_merge_rdsr_rejects_other_study(tmp_path):
+    # Tests if reports from different studies are not merged
+    interim = _partial_rdsr(tmp_path, 'interim.dcm', range(0, 15))
+
+    data = pydicom.dcmread(os.path.join(RDSR_FOLDER, 'S1.dcm'))
+    data.StudyInstanceUID = '1.2.3'
+    other = str(tmp_path / 'other.dcm')
+    data.save_as(other)
+
+    with pytest.raises(ValueError):
+        merge_rdsr([interim, other])
@@ -0,0 +1,118 @@
+from pathlib import Path
+import json
+import multiprocessing
+import os
+import pandas as pd
+import sys
+
+from pyskindose import parse_data
+from pyskindose.parse_data import load_rdsr
+from pyskindose.rdsr_cache import RDSRCache
+from pyskindose.rdsr_cache import hash_file
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+RDSR_PATH = os.path.join(str(P), 'src', 'pyskindose', 'example_data', 'RDSR',
+                         'S1.dcm')
+
+
+def test_rdsr_cache_round_trip(tmp_path):
+    # Tests if a cached event table is loaded unchanged
+    cache = RDSRCache(str(tmp_path))
+    data_norm = pd.DataFrame({'model': ['AXIOMArtis', 'AXIOMArtis'],
+                              'filter_type': ['Strip filter', None],
+                              'kVp': [80.0, 81.5],
+                              'nr': [1, 2]})
+
+    cache.put('hash', 1, '1.2.3', data_norm)
+
+    pd.testing.assert_frame_equal(data_norm, cache.get('hash', 1),
+                                  check_dtype=False)
+    # Other normalizer version is not a hit
+    assert cache.get('hash', 2) is None
+
+
+def test_rdsr_cache_lru_eviction(tmp_path):
+    # Tests if the least recently used entry is evicted when full
+    data_norm = pd.DataFrame({'kVp': [80.0] * 1000})
+
+    cache = RDSRCache(str(tmp_path))
+    cache.put('a', 1, '1.1', data_norm)
+    size = os.path.getsize(os.path.join(str(tmp_path), 'a_v1.npz'))
+
+    # Room for two tables only
+    cache.max_bytes = 2 * size
+    cache.put('b', 1, '1.2', data_norm)
+    cache.get('a', 1)
+    cache.put('c', 1, '1.3', data_norm)
+
+    assert cache.get('a', 1) is not None
+    assert cache.get('b', 1) is None
+    assert cache.get('c', 1) is not None
+
+
+def test_rdsr_cache_refuses_untyped_columns(tmp_path):
+    # Tests if tables with object columns of other values than strings are
+    # not cached, since they would be loaded as strings
+    cache = RDSRCache(str(tmp_path))
+    data_norm = pd.DataFrame({'kVp': [80.0, 81.5],
+                              'angles': [(0.0, 10.0), None]})
+
+    cache.put('hash', 1, '1.2.3', data_norm)
+
+    assert cache.get('hash', 1) is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_rdsr_cache_hit_keeps_index(tmp_path):
+    # Tests if a cache hit does not rewrite the index
+    cache = RDSRCache(str(tmp_path))
+    cache.put('hash', 1, '1.2.3', pd.DataFrame({'kVp': [80.0]}))
+    index_path = os.path.join(str(tmp_path), 'index.json')
+    mtime = os.stat(index_path).st_mtime_ns
+
+    assert cache.get('hash', 1) is not None
+    assert os.stat(index_path).st_mtime_ns == mtime
+
+
+def _put_entries(cache_dir, process, nr_entries):
+    cache = RDSRCache(cache_dir)
+    for entry in range(nr_entries):
+        cache.put(f"{process}-{entry}", 1, f"1.{process}.{entry}",
+                  pd.DataFrame({'kVp': [80.0]}))
+
+
+def test_rdsr_cache_concurrent_writers(tmp_path):
+    # Tests if concurrent writing processes lose no index entries
+    nr_processes, nr_entries = 4, 20
+    processes = [multiprocessing.Process(
+        target=_put_entries, args=(str(tmp_path), process, nr_entries))
+        for process in range(nr_processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    with open(os.path.join(str(tmp_path), 'index.json')) as fp:
+        index = json.load(fp)
+
+    assert len(index) == nr_processes * nr_entries
+
+
+def test_load_rdsr_warm_cache(tmp_path, monkeypatch):
+    # Tests if a warm cache returns the normalized data without reading the
+    # RDSR file with pydicom
+    cache = RDSRCache(str(tmp_path))
+    data_norm = load_rdsr(RDSR_PATH, cache=cache)
+
+    def read_rdsr(*args, **kwargs):
+        raise AssertionError('RDSR file read despite warm cache')
+
+    monkeypatch.setattr(parse_data, 'read_rdsr', read_rdsr)
+
+    pd.testing.assert_frame_equal(data_norm, load_rdsr(RDSR_PATH, cache=cache),
+                                  check_dtype=False)
+    entry = f"{hash_file(RDSR_PATH)}_v{parse_data.NORMALIZER_VERSION}.npz"
+    assert os.path.exists(os.path.join(str(tmp_path), entry))
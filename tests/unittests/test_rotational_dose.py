@@ -0,0 +1,164 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import sys
+from scipy.interpolate import CubicSpline
+
+from pyskindose.beam_class import Beam
+from pyskindose.corrections import calculate_k_isq
+from pyskindose.geom_calc import position_geometry
+from pyskindose.parse_data import rdsr_normalizer
+from pyskindose.phantom_class import Phantom
+from pyskindose.rotational_dose import calculate_rotational_dose
+from pyskindose.settings import PhantomDimensions
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+PHANTOM_DIM = PhantomDimensions(dict(
+    plane_length=120, plane_width=40, plane_resolution='sparse',
+    cylinder_length=150, cylinder_radii_a=20, cylinder_radii_b=10,
+    cylinder_resolution='sparse', table_thickness=5, table_length=210,
+    table_width=50, pad_thickness=4, pad_length=210, pad_width=50,
+    units='cm'))
+
+
+def _rotation() -> pd.DataFrame:
+    # Normalized procedure with a single, unsplit rotational acquisition
+    data_parsed = pd.DataFrame(dict(
+        model=['AXIOMArtis'],
+        IrradiationEventType=['Rotational Acquisition'],
+        AcquisitionPlane=['Single Plane'],
+        CollimatedFieldArea_m2=[0.04],
+        DistanceSourcetoDetector_mm=[1200.0],
+        DistanceSourcetoIsocenter_mm=[785.0],
+        DoseRP_Gy=[0.1],
+        KVP_kV=[80.0],
+        PositionerPrimaryAngle_deg=[-100.0],
+        PositionerSecondaryAngle_deg=[0.0],
+        PositionerPrimaryEndAngle_deg=[100.0],
+        PositionerSecondaryEndAngle_deg=[10.0],
+        TableLateralPosition_mm=[1000.0],
+        TableLongitudinalPosition_mm=[0.0],
+        TableHeightPosition_mm=[200.0],
+        XRayFilterType=['Strip filter'],
+        XRayFilterThicknessMaximum_mm=[0.1]))
+
+    return rdsr_normalizer(data_parsed, split_rotations=False)
+
+
+def _phantoms():
+    patient = Phantom(phantom_model='cylinder', phantom_dim=PHANTOM_DIM)
+    table = Phantom(phantom_model='table', phantom_dim=PHANTOM_DIM)
+    pad = Phantom(phantom_model='pad', phantom_dim=PHANTOM_DIM)
+    position_geometry(patient=patient, table=table, pad=pad,
+                      pad_thickness=PHANTOM_DIM.pad_thickness,
+                      patient_offset=[0, 0, -15])
+    return patient, table
+
+
+def test_calculate_rotational_dose_matches_fine_discretization():
+    # Tests if the beam sweep dose is within 2% of the rotation split into
+    # 720 stationary beams, at each skin cell
+    data_norm = _rotation()
+    bs_interp = CubicSpline([0, 50, 100], [1.3, 1.5, 1.6])
+    nr_steps = 720
+
+    patient, table = _phantoms()
+    hits, dose, _ = calculate_rotational_dose(
+        data_norm, 0, patient=patient, table=table, bs_interp=bs_interp,
+        k_tab=1.0)
+
+    test = np.zeros(len(patient.r))
+    test[hits] = dose
+
+    # Stationary beams at the midpoint of each rotation step
+    t = (np.arange(nr_steps) + 0.5) / nr_steps
+    data_split = data_norm.loc[data_norm.index.repeat(nr_steps)]\
+        .reset_index(drop=True)
+    data_split['PPA'] = -100.0 + 200.0 * t
+    data_split['PSA'] = 10.0 * t
+
+    patient, table = _phantoms()
+    expected = np.zeros(len(patient.r))
+
+    for event in range(nr_steps):
+        beam = Beam(data_split, event=event, plot_setup=False)
+        patient.position(data_split, event)
+        hits = beam.check_hit(patient)
+
+        distance = np.linalg.norm(patient.r[hits] - beam.r[0, :], axis=1)
+        field_area = data_norm.FS_lat[0] * data_norm.FS_long[0] * \
+            np.square(distance / data_norm.DSD[0])
+        k_isq = calculate_k_isq(source=beam.r[0, :], cells=patient.r[hits],
+                                dref=data_norm.DSIRP[0])
+
+        expected[hits] += data_norm.K_IRP[0] / nr_steps * k_isq * \
+            bs_interp(np.sqrt(field_area))
+
+    assert np.abs(test - expected).max() < 0.02 * expected.max()
+    assert abs(test.sum() - expected.sum()) < 0.001 * expected.sum()
+
+
+def test_calculate_rotational_dose_table_correction():
+    # Tests if the table correction is applied only to cells irradiated
+    # through the table
+    data_norm = _rotation()
+    bs_interp = CubicSpline([0, 50, 100], [1.3, 1.5, 1.6])
+
+    patient, table = _phantoms()
+    hits, dose, _ = calculate_rotational_dose(
+        data_norm, 0, patient=patient, table=table, bs_interp=bs_interp,
+        k_tab=1.0)
+    hits_tab, dose_tab, _ = calculate_rotational_dose(
+        data_norm, 0, patient=patient, table=table, bs_interp=bs_interp,
+        k_tab=0.5)
+
+    np.testing.assert_array_equal(hits, hits_tab)
+    assert (dose_tab <= dose + 1e-12).all()
+    assert (dose_tab < 0.9 * dose).any()
+    assert np.isclose(dose_tab, dose).any()
+
+
+def test_calculate_rotational_dose_double_crossing():
+    # Tests if a cell that enters and leaves the beam between two coarse
+    # samples of the sweep is found, and gets the dose of the rotation
+    # split at the angle where the cell is in the beam
+    data_norm = _rotation()
+    data_norm['PSA'] = data_norm['PSA_end'] = 0.0
+    data_norm['PPA'], data_norm['PPA_end'] = -30.0, 30.0
+
+    # Cell 10 cm beyond the isocenter at PPA = -1.2, i.e. between the coarse
+    # samples at PPA = -2.3 and 0. The beam diverges by 10 cm over the 120
+    # cm from the source to the detector on each side, so that the cell is
+    # inside the longitudinal edge of the beam within 0.5 degrees of that
+    # PPA only.
+    angle, depth = np.deg2rad(-1.2), 10.0
+    dsi = data_norm.DSI[0]
+    cell = np.array([depth * np.sin(angle), -depth * np.cos(angle),
+                     (dsi + depth * np.cos(np.deg2rad(0.5))) / 12])
+    offset = np.array([data_norm.dLONG[0], data_norm.dVERT[0],
+                       data_norm.dLAT[0]])
+
+    patient, table = _phantoms()
+    patient.r_ref = (cell - offset)[np.newaxis, :]
+    patient.n = np.array([[-np.sin(angle), np.cos(angle), 0.0]])
+    bs_interp = CubicSpline([0, 50, 100], [1.3, 1.5, 1.6])
+
+    hits, dose, _ = calculate_rotational_dose(
+        data_norm, 0, patient=patient, table=table, bs_interp=bs_interp,
+        k_tab=1.0)
+
+    expected = 0.0
+    for start, stop in [(-30.0, -1.2), (-1.2, 30.0)]:
+        data_split = data_norm.copy()
+        data_split['PPA'], data_split['PPA_end'] = start, stop
+        data_split['K_IRP'] = data_norm.K_IRP * (stop - start) / 60
+        _, dose_split, _ = calculate_rotational_dose(
+            data_split, 0, patient=patient, table=table,
+            bs_interp=bs_interp, k_tab=1.0)
+        expected += dose_split.sum()
+
+    assert hits.tolist() == [0]
+    assert expected > 0
+    np.testing.assert_allclose(dose, expected, rtol=1e-2)
@@ -0,0 +1,52 @@
+from pathlib import Path
+import numpy as np
+import sys
+
+from pyskindose.spatial_index import CellGrid
+
+P = Path(__file__).parent.parent.parent
+sys.path.insert(1, str(P.absolute()))
+
+
+def test_cell_grid_cull():
+    # Tests if culled voxels hold no cells inside the beam, and accepted
+    # voxels only cells inside the beam, after translating the cells
+    rng = np.random.default_rng(3)
+    r = rng.normal(size=(5000, 3)) * [20, 5, 60]
+    grid = CellGrid(r)
+
+    for _ in range(20):
+        offset = rng.uniform(-30, 30, 3)
+        source = rng.uniform(-80, 80, 3)
+        normals = rng.normal(size=(4, 3))
+        inside = np.flatnonzero(((r + offset - source) @ normals.T <= 0)
+                                .all(axis=1))
+
+        accepted, edge = grid.cull(source, normals,
+                                   grid.offset(r + offset))
+
+        assert np.isin(accepted, inside).all()
+        assert np.isin(inside, np.concatenate([accepted, edge])).all()
+        assert len(np.intersect1d(accepted, edge)) == 0
+
+
+def test_cell_grid_offset():
+    # Tests if the grid recognizes a translated phantom, but not a rotated
+    r = np.column_stack([np.arange(100.0), np.zeros(100), np.zeros(100)])
+    grid = CellGrid(r)
+
+    np.testing.assert_allclose(grid.offset(r + [1, 2, 3]), [1, 2, 3])
+    assert grid.offset(r[:, [1, 0, 2]]) is None
+    assert grid.offset(r[:50]) is None
+
+    # Rotation by 180 degrees about the y axis, through the first, middle and
+    # last cell, which stay in place
+    cells = np.column_stack([np.tile([0.0, 1.0], 50), np.arange(100.0),
+                             np.zeros(100)])
+    cells[[0, 50, 99], 0] = 0
+    grid = CellGrid(cells)
+    rotated = cells * [-1, 1, -1]
+
+    np.testing.assert_array_equal(rotated[[0, 50, 99]], cells[[0, 50, 99]])
+    assert grid.offset(rotated) is None
+    np.testing.assert_allclose(grid.offset(cells - [0, 5, 0]), [0, -5, 0])